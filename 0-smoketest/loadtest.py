@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Load-test vector_collection
+Runs a concurrent mix of kNN, filtered kNN, faceted, random-sample and update
+requests and reports latency histograms and error rates, open-loop or closed-loop
+"""
+
+import argparse
+import itertools
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from solrir.filters import VectorFilter, cache_usage, days_ago
+from solrir.indexdocs import IndexDocs
+from solrir.loadgen import SCHEDULES, LoadGenerator, Operation, format_report
+from solrir.serialize import UpdateEncoder, format_vectors
+from smoketest import (CATEGORIES, DEFAULT_SEED, SOLR_URL, TAGS_BY_CATEGORY, generate_chunk,
+                       generate_vectors)
+
+# Documents written during a load test get ids far above the smoketest corpus
+WRITE_ID_START = 100_000_000
+# Random-sort samples draw from a few fixed sort keys, as a UI would, so Solr can cache them
+SAMPLE_SORTS = 8
+# Date filters look back over these windows, in days
+FILTER_WINDOWS = (7, 30, 90, 365)
+# Operations --mix can weight, as build_operations() names them
+OPERATIONS = ("knn", "filtered", "facet", "sample", "write")
+
+
+def build_operations(knn: float = 0.4, facet: float = 0.3, sample: float = 0.2, write: float = 0.1,
+                     filtered: float = 0.0, top_k: int = 10, write_batch: int = 10,
+                     commit_within_ms: int = 10000, seed: int = DEFAULT_SEED):
+    """The weighted request mix against vector_collection"""
+    encoder = UpdateEncoder(vector_fields=["content_vector"])
+    next_write_id = itertools.count(WRITE_ID_START, write_batch)
+    # Query vectors are drawn like the corpus vectors, from another seed
+    query_vectors = generate_vectors(range(1024), seed=seed + 1)
+
+    def knn_query(rng):
+        vector = query_vectors[rng.integers(len(query_vectors))]
+        return {
+            "method": "POST",
+            "path": "select",
+            "data": {
+                "q": f"{{!knn f=content_vector topK={top_k}}}{format_vectors(vector)[0]}",
+                "rows": top_k,
+                "fl": "id,score"
+            }
+        }
+
+    def filtered_knn_query(rng):
+        # Many category/tag/window combinations, written as canonical per-dimension fq clauses
+        categories = rng.choice(CATEGORIES, size=rng.integers(1, 3), replace=False).tolist()
+        tags = TAGS_BY_CATEGORY[categories[0]]
+        filters = VectorFilter(categories=categories,
+                               tags=rng.choice(tags, size=rng.integers(0, 3), replace=False).tolist(),
+                               since=days_ago(FILTER_WINDOWS[rng.integers(len(FILTER_WINDOWS))]))
+        request = knn_query(rng)
+        request["data"]["fq"] = filters.clauses()
+        return request
+
+    def facet_query(rng):
+        return {
+            "method": "GET",
+            "path": "select",
+            "params": {
+                "q": "*:*",
+                "fq": f"category:{CATEGORIES[rng.integers(len(CATEGORIES))]}",
+                "rows": 0,
+                "facet": "true",
+                "facet.field": "tags"
+            }
+        }
+
+    def sample_query(rng):
+        return {
+            "method": "GET",
+            "path": "select",
+            "params": {
+                "q": "*:*",
+                "rows": 5,
+                "fl": "id,title,category,tags",
+                "sort": f"random_{seed + rng.integers(SAMPLE_SORTS)} desc"
+            }
+        }
+
+    def write_docs(rng):
+        return {
+            "method": "POST",
+            "path": "update/json/docs",
+            "params": {"commitWithin": str(commit_within_ms)},
+            "headers": {"Content-Type": "application/json", **encoder.headers},
+            "data": encoder.encode(generate_chunk(next(next_write_id), write_batch, seed=seed))
+        }
+
+    return [
+        Operation("knn", knn, knn_query),
+        Operation("filtered", filtered, filtered_knn_query),
+        Operation("facet", facet, facet_query),
+        Operation("sample", sample, sample_query),
+        Operation("write", write, write_docs)
+    ]
+
+def parse_mix(text: str) -> dict:
+    """Parse --mix, e.g. knn=0.7,facet=0.3, into operation weights"""
+    mix = {}
+    for item in text.split(","):
+        name, sep, weight = item.partition("=")
+        name = name.strip()
+        if not sep or not name:
+            raise ValueError(f"'{item}' is not name=weight")
+        if name not in OPERATIONS:
+            raise ValueError(f"unknown operation '{name}', choose from {', '.join(OPERATIONS)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise ValueError(f"weight of '{name}' is not a number: '{weight}'") from None
+        if mix[name] < 0:
+            raise ValueError(f"weight of '{name}' is negative")
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test vector_collection with a concurrent query mix")
+    parser.add_argument("--schedule", default="closed", choices=SCHEDULES,
+                        help="open: fixed arrival rate; closed: fixed number of concurrent clients")
+    parser.add_argument("--rates", default="50",
+                        help="Open loop: comma-separated request rates to step through, e.g. 50,100,200,400")
+    parser.add_argument("--concurrency", default="8",
+                        help="Closed loop: comma-separated client counts to step through, e.g. 4,8,16,32")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per step")
+    parser.add_argument("--mix", default="knn=0.4,facet=0.3,sample=0.2,write=0.1",
+                        help="Operation weights; set one to 0 to leave it out (also filtered: "
+                             "kNN with category, tag and date filters)")
+    parser.add_argument("--write-batch", type=int, default=10, help="Documents per update request")
+    parser.add_argument("--max-connections", type=int, default=64, help="Requests in flight at most")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", default=None, help="Write all step reports to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(f"--mix: {e}")
+    operations = build_operations(**mix, write_batch=args.write_batch, seed=args.seed)
+    steps = args.rates if args.schedule == "open" else args.concurrency
+    reports = []
+    solr_url, core_name = SOLR_URL.rsplit("/", 1)
+    core = IndexDocs(solr_url=solr_url, core_name=core_name)
+
+    with LoadGenerator(SOLR_URL, operations, seed=args.seed, max_connections=args.max_connections) as load:
+        for step in (float(s) for s in steps.split(",")):
+            print(f"\n{'='*78}")
+            before = core.cache_metrics("filterCache")
+            report = load.run(args.schedule, duration=args.duration, rate=step, concurrency=int(step))
+            print(format_report(report, load.histograms))
+            report["filter_cache"] = cache_usage(before, core.cache_metrics("filterCache"))
+            if report["filter_cache"] is not None:
+                usage = report["filter_cache"]
+                print(f"filterCache: {usage['hits']:.0f}/{usage['lookups']:.0f} hits ({usage['hit_rate']:.0%}), "
+                      f"{usage['inserts']:.0f} inserts, {usage['evictions']:.0f} evictions, "
+                      f"{usage['size']:.0f} entries")
+            reports.append(report)
+
+    if len(reports) > 1:
+        # Where achieved QPS stops following the load and tail latency or errors climb
+        print(f"\n{'='*78}\n{'step':>8} {'QPS':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for report in reports:
+            step = report["offered_qps"] if args.schedule == "open" else report["concurrency"]
+            overall = report["overall"]
+            print(f"{step:8g} {overall['qps']:8.1f} {overall['latency']['p50_ms']:8.1f} "
+                  f"{overall['latency']['p99_ms']:8.1f} {overall['error_rate']:7.1%}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(reports, indent=2))
+        print(f"\n✓ Reports written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,43 @@ Index Random Data into Solr
 Generates and indexes sample documents with vectors for testing
 """
 
+import argparse
+import contextlib
+import sys
 import requests
-import json
 import numpy as np
-from datetime import datetime, timedelta
-import random
-from typing import List
+from datetime import datetime
+from pathlib import Path
+import threading
+import time
+from typing import Iterable, Iterator, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from solrir.bulk import BulkIndexer, BulkIndexError
+from solrir.commit import MODES as COMMIT_MODES, CommitPolicy
+from solrir.filters import FilteredKnnSearch, VectorFilter, days_ago
+from solrir.indexdocs import IndexDocs
+from solrir.instrument import PROFILERS, Tracer, record, set_tracer, stage
+from solrir.serialize import UpdateEncoder
+from solrir.sharding import ShardedIndex
+from solrir.store import EmbeddingStore
+from solrir.vectors import get_profile
 
 # Configuration
 SOLR_URL = "http://localhost:8983/solr/vector_collection"
 
+# Fields vector_collection gets from docker/configsets; shard cores created from
+# _default have no vector field type, so they are added through the Schema API
+SHARD_FIELD_TYPES = [{**get_profile("default").field_type(384), "name": "knn_vector_384"}]
+SHARD_FIELDS = [
+    {"name": "title", "type": "text_general", "indexed": True, "stored": True},
+    {"name": "content", "type": "text_general", "indexed": True, "stored": True},
+    {"name": "category", "type": "string", "indexed": True, "stored": True},
+    {"name": "tags", "type": "strings", "indexed": True, "stored": True},
+    {"name": "created_date", "type": "pdate", "indexed": True, "stored": True},
+    {"name": "content_vector", "type": "knn_vector_384", "indexed": True, "stored": True}
+]
+
 # Sample data for random document generation
 CATEGORIES = ["Technology", "Science", "Health", "Business", "Entertainment", "Sports", "Education", "Travel"]
 
@@ -162,129 +189,225 @@ TAGS_BY_CATEGORY = {
     "Travel": ["adventure", "culture", "tourism", "destinations", "vacation", "exploration", "backpacking", "leisure"]
 }
 
-def generate_vector(dimension: int = 384, seed: int = None) -> List[float]:
-    """Generate a normalized random vector"""
-    if seed:
-        np.random.seed(seed)
-    vector = np.random.randn(dimension)
-    # Normalize the vector
-    norm = np.linalg.norm(vector)
-    if norm > 0:
-        vector = vector / norm
-    return vector.tolist()
+# Documents are generated in fixed blocks of ids; every block draws from its own
+# np.random.Generator stream, so a doc_id always gets the same document no matter
+# how the corpus is chunked.
+BLOCK_SIZE = 1024
+DEFAULT_SEED = 42
+EXTRA_CONTENT = " Additionally, this approach emphasizes practical implementation and real-world scenarios. Many professionals have found success by applying these principles consistently over time."
 
-def generate_document(doc_id: int) -> dict:
-    """Generate a random document with metadata and vector"""
-    category = random.choice(CATEGORIES)
-    title = random.choice(TITLES[category])
-    content_template = random.choice(CONTENT_TEMPLATES[category])
-    
-    # Create content by filling template
-    topic = title.lower()
-    content = content_template.format(topic)
-    
-    # Add some variety to content length
-    if random.random() > 0.5:
-        additional_content = f" Additionally, this approach emphasizes practical implementation and real-world scenarios. Many professionals have found success by applying these principles consistently over time."
-        content += additional_content
-    
-    # Select random tags
-    available_tags = TAGS_BY_CATEGORY[category]
-    num_tags = random.randint(2, 4)
-    tags = random.sample(available_tags, num_tags)
-    
-    # Generate date within last year
-    days_ago = random.randint(0, 365)
-    created_date = (datetime.now() - timedelta(days=days_ago)).isoformat() + "Z"
-    
-    # Generate vector with seed based on doc_id for consistency
-    vector = generate_vector(384, seed=doc_id)
-    
+def _block_rngs(seed: int, block: int):
+    """Independent vector and metadata generators for one block of doc ids"""
+    vector_seq, meta_seq = np.random.SeedSequence(seed, spawn_key=(int(block),)).spawn(2)
+    return np.random.default_rng(vector_seq), np.random.default_rng(meta_seq)
+
+def generate_vectors(doc_ids, dimension: int = 384, seed: int = DEFAULT_SEED) -> np.ndarray:
+    """Generate an (N, dimension) float32 matrix of unit vectors, one row per doc_id"""
+    ids = np.asarray(doc_ids, dtype=np.int64)
+    vectors = np.empty((len(ids), dimension), dtype=np.float32)
+    blocks = ids // BLOCK_SIZE
+    for block in np.unique(blocks):
+        rows = np.flatnonzero(blocks == block)
+        vector_rng, _ = _block_rngs(seed, block)
+        block_vectors = vector_rng.standard_normal((BLOCK_SIZE, dimension), dtype=np.float32)
+        vectors[rows] = block_vectors[ids[rows] % BLOCK_SIZE]
+    # Normalize the whole chunk at once
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.maximum(norms, np.finfo(np.float32).tiny)
+    return vectors
+
+def _block_metadata(seed: int, block: int) -> dict:
+    """Draw the random choices behind every document of one block of ids"""
+    _, meta_rng = _block_rngs(seed, block)
     return {
-        "id": f"doc{doc_id}",
-        "title": title,
-        "content": content,
-        "category": category,
-        "tags": tags,
-        "content_vector": vector,
-        "created_date": created_date
+        "category": meta_rng.integers(0, len(CATEGORIES), BLOCK_SIZE),
+        "title": meta_rng.integers(0, 8, BLOCK_SIZE),
+        "template": meta_rng.integers(0, 4, BLOCK_SIZE),
+        "extra": meta_rng.random(BLOCK_SIZE) > 0.5,
+        "num_tags": meta_rng.integers(2, 5, BLOCK_SIZE),
+        "tag_order": meta_rng.random((BLOCK_SIZE, 8)).argsort(axis=1),
+        "days_ago": meta_rng.integers(0, 366, BLOCK_SIZE)
     }
 
-def index_documents(documents: List[dict], batch_size: int = 100) -> None:
-    """Index documents in batches"""
-    total = len(documents)
+def generate_chunk(start: int, count: int, seed: int = DEFAULT_SEED, reference_date=None,
+                   store: EmbeddingStore = None) -> List[dict]:
+    """
+    Generate documents doc{start} .. doc{start + count - 1}
+
+    Args:
+        start: First numeric doc id
+        count: Number of documents
+        seed: Corpus seed; the same seed and doc id always give the same document
+        reference_date: np.datetime64 that created dates count back from (default: now)
+        store: Optional embedding store to reuse vectors from
+    """
+    ids = np.arange(start, start + count, dtype=np.int64)
+    if store is None:
+        vectors = generate_vectors(ids, seed=seed)
+    else:
+        keys = [str(i) for i in ids]
+        vectors = store.embed(keys, keys, lambda missing: generate_vectors([int(k) for k in missing], seed=seed))
+    if reference_date is None:
+        reference_date = np.datetime64(datetime.now(), "s")
+
+    meta = {key: np.empty((count,) + values.shape[1:], dtype=values.dtype)
+            for key, values in _block_metadata(seed, 0).items()}
+    blocks = ids // BLOCK_SIZE
+    for block in np.unique(blocks):
+        rows = np.flatnonzero(blocks == block)
+        for key, values in _block_metadata(seed, block).items():
+            meta[key][rows] = values[ids[rows] % BLOCK_SIZE]
+    created_dates = np.datetime_as_string(reference_date - meta["days_ago"].astype("timedelta64[D]"), unit="s")
+
+    documents = []
+    for row, doc_id in enumerate(ids.tolist()):
+        category = CATEGORIES[meta["category"][row]]
+        title = TITLES[category][meta["title"][row]]
+        content = CONTENT_TEMPLATES[category][meta["template"][row]].format(title.lower())
+        if meta["extra"][row]:
+            content += EXTRA_CONTENT
+        available_tags = TAGS_BY_CATEGORY[category]
+        documents.append({
+            "id": f"doc{doc_id}",
+            "title": title,
+            "content": content,
+            "category": category,
+            "tags": [available_tags[t] for t in meta["tag_order"][row][:meta["num_tags"][row]]],
+            "content_vector": vectors[row],
+            "created_date": created_dates[row] + "Z"
+        })
+    return documents
+
+def generate_chunks(num_docs: int, chunk_size: int = 1000, seed: int = DEFAULT_SEED, start: int = 1,
+                    store: EmbeddingStore = None) -> Iterator[List[dict]]:
+    """Lazily yield the corpus chunk by chunk; only one chunk is held in memory"""
+    reference_date = np.datetime64(datetime.now(), "s")
+    for offset in range(0, num_docs, chunk_size):
+        yield generate_chunk(start + offset, min(chunk_size, num_docs - offset), seed=seed,
+                             reference_date=reference_date, store=store)
+
+def batch_progress(first: int, last: int, total: int, parts: int = 1):
+    """Build a callback that reports a finished batch once all of its parts (one per shard) are done"""
+    remaining = [parts]
+    lock = threading.Lock()
+    def done(future):
+        if future.exception() is None:
+            with lock:
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if finished:
+                print(f"✓ Indexed documents {first} to {last} of {total}")
+    return done
+
+def index_chunks(chunks: Iterable[List[dict]], total: int, workers: int = 4,
+                 commit_policy: CommitPolicy = None, shards: ShardedIndex = None) -> None:
+    """Index chunks of documents in parallel batches with retries, as they are produced"""
+    encoder = UpdateEncoder(vector_fields=["content_vector"])
+    first = 1
     
-    for i in range(0, total, batch_size):
-        batch = documents[i:i+batch_size]
-        
-        response = requests.post(
-            f"{SOLR_URL}/update/json/docs",
-            json=batch,
-            params={"commit": "true" if (i + batch_size >= total) else "false"}
-        )
-        
-        if response.status_code == 200:
-            print(f"✓ Indexed documents {i+1} to {min(i+batch_size, total)} of {total}")
+    try:
+        if shards is not None:
+            # Every chunk is split by id hash; each shard has its own workers
+            commit_policy = commit_policy or shards.commit_policy()
+            indexer = shards.bulk_indexer(encoder, commit_policy, workers=workers)
         else:
-            print(f"✗ Error indexing batch {i//batch_size + 1}: {response.text}")
-            return
+            commit_policy = commit_policy or CommitPolicy(SOLR_URL)
+            indexer = BulkIndexer(f"{SOLR_URL}/update/json/docs", workers=workers, headers=encoder.headers,
+                                  params=commit_policy.batch_params())
+        with indexer:
+            chunks = iter(chunks)
+            while True:
+                # Generation is lazy, so pulling the next chunk is the generate stage
+                generate_start = time.perf_counter()
+                batch = next(chunks, None)
+                if batch is None:
+                    break
+                record("generate", time.perf_counter() - generate_start, len(batch), start=generate_start)
+                with stage("submit.wait", len(batch)):
+                    if shards is not None:
+                        futures = indexer.submit(batch)
+                    else:
+                        futures = [indexer.submit(encoder.encode(batch), len(batch))]
+                done = batch_progress(first, first + len(batch) - 1, total, parts=len(futures))
+                for future in futures:
+                    future.add_done_callback(done)
+                commit_policy.tick()
+                first += len(batch)
+    except BulkIndexError as e:
+        print(f"✗ Error indexing documents: {e}")
+        return
     
-    # Final commit
-    requests.post(f"{SOLR_URL}/update", params={"commit": "true"})
+    # Final commit (or none, depending on the policy)
+    with stage("commit"):
+        commit_policy.finish()
     print(f"\n✓ Successfully indexed all {total} documents!")
+    print(f"  {indexer.report()}")
+    print(f"  {encoder.report()}")
+    print(f"  {commit_policy.report()}")
+
+def select(params: dict, shards: ShardedIndex = None) -> dict:
+    """Query vector_collection, or every shard with the results merged"""
+    if shards is not None:
+        return shards.select(params)
+    response = requests.get(f"{SOLR_URL}/select", params=params)
+    response.raise_for_status()
+    return response.json()
 
-def verify_index():
+def verify_index(shards: ShardedIndex = None):
     """Verify documents were indexed correctly"""
-    response = requests.get(
-        f"{SOLR_URL}/select",
-        params={"q": "*:*", "rows": 0}
-    )
+    try:
+        result = select({"q": "*:*", "rows": 0}, shards)
+    except requests.exceptions.RequestException as e:
+        print(f"✗ Error verifying index: {e}")
+        return 0
     
-    if response.status_code == 200:
-        result = response.json()
-        num_docs = result['response']['numFound']
-        print(f"\n{'='*60}")
-        print(f"Index Status: {num_docs} documents indexed")
-        print(f"{'='*60}")
-        
-        # Get category breakdown
-        facet_response = requests.get(
-            f"{SOLR_URL}/select",
-            params={
-                "q": "*:*",
-                "rows": 0,
-                "facet": "true",
-                "facet.field": "category"
-            }
-        )
-        
-        if facet_response.status_code == 200:
-            facets = facet_response.json().get('facet_counts', {}).get('facet_fields', {}).get('category', [])
-            print("\nDocuments by Category:")
-            print("-" * 60)
-            for i in range(0, len(facets), 2):
-                if i+1 < len(facets):
-                    print(f"  {facets[i]}: {facets[i+1]} documents")
-        
+    num_docs = result['response']['numFound']
+    print(f"\n{'='*60}")
+    print(f"Index Status: {num_docs} documents indexed")
+    print(f"{'='*60}")
+    
+    # Get category breakdown
+    try:
+        facet_result = select({
+            "q": "*:*",
+            "rows": 0,
+            "facet": "true",
+            "facet.field": "category"
+        }, shards)
+    except requests.exceptions.RequestException:
         return num_docs
-    else:
-        print(f"✗ Error verifying index: {response.text}")
-        return 0
+    
+    facets = facet_result.get('facet_counts', {}).get('facet_fields', {}).get('category', [])
+    print("\nDocuments by Category:")
+    print("-" * 60)
+    for i in range(0, len(facets), 2):
+        if i+1 < len(facets):
+            print(f"  {facets[i]}: {facets[i+1]} documents")
+    if shards is not None:
+        print("\nDocuments by Shard:")
+        print("-" * 60)
+        for shard in shards.shards:
+            shard_docs = shard.select({"q": "*:*", "rows": 0})['response']['numFound']
+            print(f"  {shard.core_url}: {shard_docs} documents")
+    
+    return num_docs
 
-def show_sample_documents(num_samples: int = 5):
+def show_sample_documents(num_samples: int = 5, shards: ShardedIndex = None, seed: int = DEFAULT_SEED):
     """Display sample documents from the index"""
-    response = requests.get(
-        f"{SOLR_URL}/select",
-        params={
-            "q": "*:*",
-            "rows": num_samples,
-            "fl": "id,title,category,tags",
-            "sort": "random_" + str(random.randint(1000, 9999)) + " desc"
-        }
-    )
+    # A fixed random sort key gives the same sample (and a queryResultCache hit) until the next commit;
+    # a fresh key per call would never be reused
+    params = {
+        "q": "*:*",
+        "rows": num_samples,
+        "fl": "id,title,category,tags",
+        "sort": f"random_{seed} desc"
+    }
+    try:
+        docs = select(params, shards)['response']['docs']
+    except requests.exceptions.RequestException:
+        docs = None
     
-    if response.status_code == 200:
-        docs = response.json()['response']['docs']
+    if docs is not None:
         print(f"\n{'='*60}")
         print(f"Sample Documents ({num_samples} random documents):")
         print(f"{'='*60}\n")
@@ -295,7 +418,31 @@ def show_sample_documents(num_samples: int = 5):
             print(f"   Tags: {', '.join(doc['tags'])}")
             print()
 
-def main():
+def show_filtered_search(k: int = 5, shards: ShardedIndex = None, seed: int = DEFAULT_SEED):
+    """Run one filtered kNN query pre- and post-filtered and compare the hits"""
+    index = shards or IndexDocs(solr_url=SOLR_URL.rsplit("/", 1)[0], core_name=SOLR_URL.rsplit("/", 1)[1])
+    search = FilteredKnnSearch(index, vector_field="content_vector", fl="id,title,category,tags,score")
+    filters = VectorFilter(categories=CATEGORIES[:2], tags=[TAGS_BY_CATEGORY[CATEGORIES[0]][0]],
+                           tags_mode="any", since=days_ago(180))
+    vector = generate_vectors([0], seed=seed + 1)[0]
+    print(f"\n{'='*60}")
+    print(f"Filtered kNN ({k} nearest):")
+    print(f"{'='*60}")
+    print("  fq: " + "\n      ".join(filters.clauses()))
+    try:
+        for strategy in ("pre", "post"):
+            hits, qtime = search.search(vector, filters, k=k, strategy=strategy)
+            print(f"\n  {strategy}-filtered ({len(hits)} hits, QTime {qtime} ms):")
+            for doc in hits:
+                print(f"    {doc['score']:.4f} {doc['id']} [{doc['category']}] {doc['title']}")
+        print(f"\n  {search.report()}")
+    except requests.exceptions.RequestException as e:
+        print(f"✗ Error running the filtered search: {e}")
+    finally:
+        search.close()
+
+def main(store: EmbeddingStore = None, chunk_size: int = 1000, seed: int = DEFAULT_SEED,
+         commit_policy: CommitPolicy = None, tracer: Tracer = None, shards: ShardedIndex = None):
     print("="*60)
     print("Solr Random Data Indexer")
     print("="*60)
@@ -306,36 +453,31 @@ def main():
     except ValueError:
         num_docs = 100
     
-    if num_docs < 1 or num_docs > 10000:
-        print("⚠ Number must be between 1 and 10000. Using default: 100")
+    if num_docs < 1:
+        print("⚠ Number must be at least 1. Using default: 100")
         num_docs = 100
     
     print(f"\n{'='*60}")
-    print(f"Generating {num_docs} random documents...")
-    print(f"{'='*60}\n")
-    
-    # Generate documents
-    documents = []
-    for i in range(1, num_docs + 1):
-        doc = generate_document(i)
-        documents.append(doc)
-        if i % 20 == 0:
-            print(f"Generated {i}/{num_docs} documents...")
-    
-    print(f"\n✓ Generated {len(documents)} documents")
-    
-    # Index documents
-    print(f"\n{'='*60}")
-    print("Indexing documents to Solr...")
+    print(f"Generating and indexing {num_docs} random documents in chunks of {chunk_size}...")
     print(f"{'='*60}\n")
     
-    index_documents(documents)
+    # Documents are generated lazily, one chunk at a time, while earlier chunks are indexed
+    # (the tracer only times this part, not the prompt above)
+    with tracer or contextlib.nullcontext():
+        index_chunks(generate_chunks(num_docs, chunk_size=chunk_size, seed=seed, store=store), num_docs,
+                     commit_policy=commit_policy, shards=shards)
+        if store is not None:
+            with stage("store.save"):
+                store.save()
+    if tracer is not None:
+        print(tracer.summary())
     
     # Verify indexing
-    verify_index()
+    verify_index(shards)
     
     # Show samples
-    show_sample_documents(5)
+    show_sample_documents(5, shards, seed=seed)
+    show_filtered_search(5, shards, seed=seed)
     
     print(f"\n{'='*60}")
     print("Indexing Complete!")
@@ -346,4 +488,40 @@ def main():
     print()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate and index random documents into Solr")
+    parser.add_argument("--vector-store", default=None,
+                        help="Directory of an embedding store to reuse generated vectors from")
+    parser.add_argument("--chunk-size", type=int, default=1000,
+                        help="Documents generated and posted per batch")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED,
+                        help="Corpus seed; a doc id always gets the same document for a given seed")
+    parser.add_argument("--commit", default="soft", choices=COMMIT_MODES,
+                        help="Commit policy: hard, soft (periodic soft + final hard), within, auto")
+    parser.add_argument("--optimize", type=int, default=None, metavar="SEGMENTS",
+                        help="Merge the index down to SEGMENTS segments after loading")
+    parser.add_argument("--shards", default=None, metavar="URL,URL,...",
+                        help="Spread documents over these core URLs by id hash instead of vector_collection")
+    parser.add_argument("--trace", default=None, metavar="FILE",
+                        help="Write per-stage timings, counters and trace events to FILE as JSON")
+    parser.add_argument("--profiler", default=None, choices=PROFILERS,
+                        help="Also profile the run: cprofile (main thread) or sample (all threads)")
+    args = parser.parse_args()
+    # Vectors depend on the seed, so every seed gets its own store
+    store = EmbeddingStore(args.vector_store, f"random-normal-seed{args.seed}", 384) if args.vector_store else None
+    shards = ShardedIndex.from_urls(args.shards.split(",")) if args.shards else None
+    if shards is not None:
+        shards.create_core()
+        if not shards.add_schema(SHARD_FIELD_TYPES, SHARD_FIELDS):
+            sys.exit("✗ Could not define the shard schema")
+        policy = shards.commit_policy(args.commit, optimize_segments=args.optimize)
+    else:
+        policy = CommitPolicy(SOLR_URL, mode=args.commit, optimize_segments=args.optimize)
+    tracer = Tracer("smoketest", profile=args.profiler)
+    set_tracer(tracer)
+    main(store=store, chunk_size=args.chunk_size, seed=args.seed, commit_policy=policy, tracer=tracer,
+         shards=shards)
+    if shards is not None:
+        shards.close()
+    if args.trace:
+        profile_path = tracer.export(args.trace)
+        print(f"✓ Trace written to {args.trace}" + (f", profile to {profile_path}" if profile_path else ""))
\ No newline at end of file
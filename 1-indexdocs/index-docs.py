@@ -1,224 +1,398 @@
-import requests
-import torch
-import json
-import ir_datasets
-from typing import List, Dict, Any
-from transformers import AutoTokenizer, AutoModel
+import argparse
+import itertools
+import sys
+from pathlib import Path
+from typing import Union
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from solrir.commit import MODES as COMMIT_MODES, CommitPolicy
+from solrir.embedding import (DEFAULT_MAX_LENGTH, INFERENCE_MODES, BatchEmbedder, ShardedEmbedder,
+                              fidelity_check, inference_key, load_model)
+from solrir.embedserver import EmbeddingClient
+from solrir.indexdocs import IndexDocs
+from solrir.instrument import PROFILERS, Tracer, set_tracer, stage
+from solrir.manifest import IndexManifest
+from solrir.pipeline import StreamingPipeline, embed_stage, project_stage, quantize_stage
+from solrir.serialize import UpdateEncoder
+from solrir.sharding import ShardedIndex
+from solrir.store import CachedEmbedder, EmbeddingStore
+from solrir.vectors import PROFILES, Int8Quantizer, PCAProjection, get_profile
 
+MODEL_NAME = "bert-base-uncased"
+DEFAULT_STORE_DIR = Path(__file__).resolve().parent / ".embeddings"
 
-class IndexDocs:
+
+
+def load_embedder(batch_size: int = 32, processes: int = 1, embed_server: str = None,
+                  inference: str = "fp32", max_length: int = DEFAULT_MAX_LENGTH):
     """
-    Index documents in Solr.
+    Load bert-base-uncased once and wrap it in a batch embedder.
+
+    Args:
+        batch_size: Documents per BERT forward pass
+        processes: Worker processes; above 1 every worker loads its own model copy
+            and embeds contiguous shards of each chunk
+        embed_server: Unix socket of a running ``solrir.embedserver``; the model
+            is then not loaded in this process at all (start the server with the
+            same inference mode and max length)
+        inference: fp32, int8 (dynamic quantization of the linear layers) or bf16
+        max_length: Tokens per document at most
     """
-    def __init__(self, solr_url: str, core_name: str):
-        self.solr_url = solr_url
-        self.core_name = core_name
-        self.core_url = f"{solr_url}/{core_name}"
-    
-    def create_core(self, config_set: str = "_default"):
-        """
-        Create a new Solr core.
-        
-        Args:
-            config_set: Configuration set to use (e.g., '_default', 'sample_techproducts_configs')
-        """
-        url = f"{self.solr_url}/admin/cores"
-        params = {
-            "action": "CREATE",
-            "name": self.core_name,
-            "configSet": config_set
-        }
-        
-        try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            print(f"✓ Core '{self.core_name}' created successfully")
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"✗ Error creating core: {e}")
-            if "already exists" in str(e).lower():
-                print(f"  Core '{self.core_name}' already exists, continuing...")
-            return None
-    
+    if embed_server:
+        return EmbeddingClient(embed_server)
+    if processes > 1:
+        return ShardedEmbedder(MODEL_NAME, processes=processes, batch_size=batch_size,
+                               max_length=max_length, mode=inference)
+    tokenizer, model = load_model(MODEL_NAME, inference)
+    return BatchEmbedder(tokenizer, model, batch_size=batch_size, max_length=max_length)
 
-    def define_schema(self, vector_dimension: int = 768):
-        """
-        Define the schema with text and vector fields.
-        
-        Args:
-            vector_dimension: Dimension of the embedding vectors (e.g., 768 for BERT)
-        """
-        schema_url = f"{self.core_url}/schema"
-        #doc_id, title, text, author, bib
-        fields = [
-            {
-                "name": "doc_id",
-                "type": "text_general",
-                "indexed": True,
-                "stored": True,
-                "multiValued": False 
-
-            },
-            {
-                "name": "title",
-                "type": "text_general",
-                "indexed": True,
-                "stored": True,
-                "multiValued": False 
-
-            },
-            {
-                "name": "text",
-                "type": "text_general",
-                "indexed": True,
-                "stored": True,
-                "multiValued": False 
-
-            },
-            {
-                "name": "author",
-                "type": "text_general",
-                "indexed": True,
-                "stored": True,
-                "multiValued": False 
-
-            },
-            {
-                "name": "bib",
-                "type": "text_general",
-                "indexed": True,
-                "stored": True,
-                "multiValued": False 
-
-            },
-             {
-                "name": "vector",
-                "type": "knn_vector",
-                "indexed": True,
-                "stored": True,
-                "multiValued": False
-            }
-        ]
-        
-        # First, add the field type for dense vectors with HNSW
-        field_type = {
-            "name": "knn_vector",
-            "class": "solr.DenseVectorField",
-            "vectorDimension": vector_dimension,
-            "similarityFunction": "cosine",
-            "knnAlgorithm": "hnsw",
-            "hnswMaxConnections": 16,
-            "hnswBeamWidth": 100
-        }
-        
-        try:
-            response = requests.post(
-                schema_url,
-                json={"add-field-type": field_type},
-                headers={"Content-Type": "application/json"}
-            )
-            if response.status_code == 200 or "already exists" in response.text.lower():
-                print(f"✓ Field type 'vector' configured with HNSW indexing")
-            else:
-                print(f"✗ Failed to add field type: {response.text}")
-        except requests.exceptions.RequestException as e:
-            print(f"✗ Error adding field type: {e}")
-
-        for field in fields:
-            try:
-                response = requests.post(
-                    schema_url,
-                    json={"add-field": field},
-                    headers={"Content-Type": "application/json"}
-                )
-                if response.status_code == 200 or "already exists" in response.text.lower():
-                    print(f"✓ Added field: {field['name']}")
-                else:
-                    print(f"✗ Failed to add field {field['name']}: {response.text}")
-            except requests.exceptions.RequestException as e:
-                print(f"✗ Error adding field {field['name']}: {e}")
-    
 
-    def index_documents(self, documents: List[Dict[str, Any]]):
-        """
-        Index documents into Solr.
-        
-        Args:
-            documents: List of documents
-        """
-        update_url = f"{self.core_url}/update/json/docs"
-        
-        try:
-            response = requests.post(
-                update_url,
-                json=documents,
-                params={"commit": "true"},
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            print(f"✓ Indexed {len(documents)} documents successfully")
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"✗ Error indexing documents: {e}")
-            return None
-
-
-
-def embed_text(text: str, tokenizer, model) -> list:
-    """Tokenize & run through BERT, then mean-pool the last hidden state."""
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-    with torch.no_grad():
-        outputs = model(**inputs)
-    last_hidden = outputs.last_hidden_state        # (1, seq_len, hidden_size)
-    mask = inputs.attention_mask.unsqueeze(-1)     # (1, seq_len, 1)
-    masked = last_hidden * mask
-    summed = masked.sum(dim=1)                     # (1, hidden_size)
-    counts = mask.sum(dim=1).clamp(min=1e-9)       # avoid div zero
-    mean_pooled = (summed / counts).squeeze().tolist()
-    return mean_pooled
-
-
-def prepare_cranfiled():
-    """Load and prepare Cranfield documents."""
-    tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased")
-    model     = AutoModel.from_pretrained("bert-base-uncased")
-    model.eval()
+def iter_cranfield():
+    """Yield Cranfield documents (without vectors) one at a time."""
+    import ir_datasets
 
     dataset = ir_datasets.load("cranfield")
-    docs = []
     for doc in dataset.docs_iter():
-        docs.append({
+        yield {
+            # A stable unique key, so re-indexing a document replaces it
+            "id": doc.doc_id,
             "doc_id": doc.doc_id,
             "title": doc.title,
             "text": doc.text,
             "author": doc.author,
-            "bib": doc.bib,
-            "vector": embed_text(doc.text, tokenizer, model)
-        })
-    return docs
+            "bib": doc.bib
+        }
 
 
+def open_store(store_dir=DEFAULT_STORE_DIR, inference: str = "fp32",
+               max_length: int = DEFAULT_MAX_LENGTH) -> EmbeddingStore:
+    """Open the on-disk embedding store for bert-base-uncased in one inference mode."""
+    return EmbeddingStore(store_dir, inference_key(MODEL_NAME, inference, max_length), dimension=768)
+
+
+def open_embedder(store: EmbeddingStore = None, batch_size: int = 32, processes: int = 1,
+                  embed_server: str = None, inference: str = "fp32", max_length: int = DEFAULT_MAX_LENGTH):
+    """
+    The run's one embedder, shared by PCA fitting and indexing.
+
+    With a store it is a CachedEmbedder, which loads the model on the first miss only.
+    Arguments are those of load_embedder().
+    """
+    def load():
+        return load_embedder(batch_size, processes, embed_server, inference, max_length)
+    return load() if store is None else CachedEmbedder(store, load)
 
-if __name__ == "__main__":
-    # Initialize the index creator for standalone Solr
-    cran_docs = prepare_cranfiled()
 
-    creator = IndexDocs(
-        solr_url="http://localhost:8983/solr",
-        core_name="cranfiled_docs"
+def fit_projection(dimension: int, embedder, sample_size: int = 5000,
+                   store: EmbeddingStore = None) -> PCAProjection:
+    """
+    Fit a PCA projection on the embeddings of the first ``sample_size`` Cranfield documents.
+
+    Args:
+        dimension: Dimensions kept
+        embedder: The embedder from open_embedder(); it is left open for indexing
+        sample_size: Documents the projection is fitted on
+        store: The embedder's store, if any; the sample's vectors are kept in it, so
+            indexing does not embed them again
+    """
+    docs = list(itertools.islice(iter_cranfield(), sample_size))
+    texts = [doc["text"] for doc in docs]
+    if store is None:
+        vectors = embedder.embed(texts)
+    else:
+        vectors = embedder.embed(texts, [doc["doc_id"] for doc in docs])
+        store.save()
+    projection = PCAProjection(dimension).fit(vectors)
+    print(f"✓ Fitted PCA to {dimension} dimensions on {len(docs)} documents "
+          f"({projection.explained_variance:.1%} of the variance kept)")
+    return projection
+
+
+def stream_cranfield(creator: Union[IndexDocs, ShardedIndex], embedder, chunk_size: int = 256,
+                     queue_size: int = 2, store: EmbeddingStore = None, workers: int = 4,
+                     encoder: UpdateEncoder = None, quantizer: Int8Quantizer = None, on_calibrated=None,
+                     commit_policy: CommitPolicy = None, manifest: IndexManifest = None,
+                     projection: PCAProjection = None) -> int:
+    """
+    Embed and index Cranfield chunk by chunk without holding the corpus in memory.
+
+    Args:
+        creator: IndexDocs instance for the target core, or a ShardedIndex to
+            spread the documents over several cores by id hash
+        embedder: The embedder from open_embedder(); the caller closes it
+        chunk_size: Documents per Solr update request
+        queue_size: Chunks buffered between pipeline stages
+        store: The embedder's store, if any; saved once the documents are embedded
+        workers: Update requests in flight at once (per shard)
+        encoder: Compact vector encoder for update bodies
+        quantizer: Int8 quantizer for byte-encoded vector profiles
+        on_calibrated: Called with the quantizer once it has been fitted on the first chunk
+        commit_policy: When and how to commit; defaults to periodic soft commits and
+            one final hard commit
+        manifest: Record of what the core already holds; when given only new or
+            changed documents are sent, every acknowledged batch is checkpointed and
+            documents no longer in the source are deleted
+        projection: Fitted dimensionality reduction applied to every vector
+            before quantization and indexing
+    """
+    encoder = encoder or UpdateEncoder()
+    commit_policy = commit_policy or creator.commit_policy()
+    embed = embed_stage(embedder) if store is None else embed_stage(embedder, id_field="doc_id")
+    indexer = creator.bulk_indexer(encoder, commit_policy, workers=workers)
+
+    sharded = isinstance(creator, ShardedIndex)
+
+    def encode(docs):
+        # Keep each body's ids next to it so the manifest can checkpoint them;
+        # a sharded index gets one body per shard
+        parts = enumerate(creator.route(docs)) if sharded else [(None, docs)]
+        return [(shard, [doc["doc_id"] for doc in part], encoder.encode(part))
+                for shard, part in parts if part]
+
+    def checkpoint(doc_ids):
+        def done(future):
+            if future.exception() is None:
+                manifest.acknowledge(doc_ids)
+        return done
+
+    def post(batch, num_docs: int):
+        for shard, doc_ids, payload in batch:
+            target = indexer if shard is None else indexer.indexers[shard]
+            future = target.submit(payload, len(doc_ids))
+            if manifest is not None:
+                future.add_done_callback(checkpoint(doc_ids))
+        commit_policy.tick()
+
+    stages = [embed]
+    if projection is not None:
+        stages.append(project_stage(projection))
+    if quantizer is not None:
+        stages.append(quantize_stage(quantizer, on_fit=on_calibrated))
+    stages.append(encode)
+    pipeline = StreamingPipeline(
+        stages=stages,
+        sink=post,
+        chunk_size=chunk_size,
+        queue_size=queue_size
     )
+    docs = iter_cranfield() if manifest is None else manifest.changed(iter_cranfield())
+    try:
+        with indexer:
+            total = pipeline.run(docs)
+    finally:
+        if store is not None:
+            store.save()
+    if manifest is not None:
+        # The whole source was read, so anything indexed but unseen is gone from it
+        removed = manifest.removed()
+        if removed:
+            with stage("delete", len(removed)):
+                creator.delete_documents(removed, commit_policy=commit_policy)
+            manifest.forget(removed)
+    with stage("commit"):
+        commit_policy.finish()
+    if manifest is not None:
+        manifest.save()
+        print(f"✓ {manifest.report()}")
+    print(f"✓ Indexed {total} documents successfully ({pipeline.docs_per_sec:.1f} docs/sec)")
+    print(f"✓ Posted {indexer.report()}")
+    print(f"✓ Encoded {encoder.report()}")
+    print(f"✓ {commit_policy.report()}")
+    print(f"✓ Embedded {embedder.report()}")
+    return total
+
+
+def print_fidelity(rows):
+    """Print fidelity_check() results as a table."""
+    print(f"{'mode':<6} {'max_len':>7} {'docs/sec':>9} {'speedup':>8} {'truncated':>9} "
+          f"{'cos mean':>9} {'cos p05':>8} {'cos min':>8}")
+    for row in rows:
+        print(f"{row['mode']:<6} {row['max_length']:>7} {row['docs_per_sec']:>9.1f} {row['speedup']:>7.2f}x "
+              f"{row['truncated']:>9.1%} {row['cosine_mean']:>9.4f} {row['cosine_p05']:>8.4f} "
+              f"{row['cosine_min']:>8.4f}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Index Cranfield documents with BERT vectors into Solr")
+    parser.add_argument("--batch-size", type=int, default=32,
+                        help="Documents per BERT forward pass (tune per machine)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Embedding worker processes, each with its own model copy")
+    parser.add_argument("--chunk-size", type=int, default=256,
+                        help="Documents per Solr update request")
+    parser.add_argument("--queue-size", type=int, default=2,
+                        help="Chunks buffered between pipeline stages")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Update requests sent to Solr concurrently")
+    parser.add_argument("--profile", default="default", choices=sorted(PROFILES),
+                        help="Vector field profile: HNSW parameters, similarity and float/byte encoding")
+    parser.add_argument("--precision", type=int, default=7,
+                        help="Significant digits per vector component in update bodies")
+    parser.add_argument("--gzip", action="store_true",
+                        help="Gzip update bodies (requires request inflation in Solr's Jetty)")
+    parser.add_argument("--commit", default="soft", choices=COMMIT_MODES,
+                        help="Commit policy: hard, soft (periodic soft + final hard), within, auto")
+    parser.add_argument("--commit-within", type=int, default=10000,
+                        help="commitWithin in ms for --commit within")
+    parser.add_argument("--soft-commit-every", type=float, default=30.0,
+                        help="Seconds between soft commits for --commit soft (0 disables)")
+    parser.add_argument("--optimize", type=int, default=None, metavar="SEGMENTS",
+                        help="Merge the index down to SEGMENTS segments after loading")
+    parser.add_argument("--inference", default="fp32", choices=INFERENCE_MODES,
+                        help="Model inference mode: fp32, int8 (dynamic quantization of the linear "
+                             "layers) or bf16")
+    parser.add_argument("--max-length", type=int, default=DEFAULT_MAX_LENGTH,
+                        help="Tokens per document at most; longer documents are truncated")
+    parser.add_argument("--fidelity-check", type=int, default=None, metavar="DOCS",
+                        help="Embed the first DOCS documents in every inference mode, report throughput "
+                             "and cosine similarity to fp32 at 512 tokens, then stop")
+    parser.add_argument("--embed-server", default=None, metavar="SOCKET",
+                        help="Embed through a running `python -m solrir.embedserver` instead of "
+                             "loading BERT in this process")
+    parser.add_argument("--core", default="cranfiled_docs",
+                        help="Core to create and index (ignored with --shards)")
+    parser.add_argument("--reduce-dim", type=int, default=None, metavar="DIM",
+                        help="Index PCA-reduced vectors of this dimension instead of 768; the "
+                             "projection is fitted once and saved for search.py")
+    parser.add_argument("--pca-sample", type=int, default=5000,
+                        help="Documents the PCA projection is fitted on")
+    parser.add_argument("--shards", default=None, metavar="URL,URL,...",
+                        help="Spread the documents over these core URLs by id hash instead of "
+                             "indexing one core")
+    parser.add_argument("--schema-only", action="store_true",
+                        help="Create the core and define the schema, then stop")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the index manifest and send every document again")
+    parser.add_argument("--trace", default=None, metavar="FILE",
+                        help="Write per-stage timings, counters and trace events to FILE as JSON")
+    parser.add_argument("--profiler", default=None, choices=PROFILERS,
+                        help="Also profile the run: cprofile (main thread) or sample (all threads)")
+    parser.add_argument("--store-dir", default=str(DEFAULT_STORE_DIR),
+                        help="Directory of the persistent embedding store")
+    parser.add_argument("--no-store", action="store_true",
+                        help="Recompute every embedding instead of using the store")
+    parser.add_argument("--compact-store", action="store_true",
+                        help="Drop superseded vectors from the store after indexing")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+
+    if args.fidelity_check:
+        print(f"\n=== Inference Fidelity ({args.fidelity_check} documents) ===")
+        lengths = sorted({DEFAULT_MAX_LENGTH, args.max_length}, reverse=True)
+        sample = [doc["text"] for doc in itertools.islice(iter_cranfield(), args.fidelity_check)]
+        print_fidelity(fidelity_check(sample, MODEL_NAME, [(mode, length) for length in lengths
+                                                           for mode in INFERENCE_MODES],
+                                      batch_size=args.batch_size))
+        sys.exit(0)
+
+    # Vectors of every inference mode are stored apart, so switching modes never mixes them
+    store = None if args.no_store else open_store(args.store_dir, args.inference, args.max_length)
+    profile = get_profile(args.profile)
+
+    # Initialize the index creator for standalone Solr
+    if args.shards:
+        creator = ShardedIndex.from_urls(args.shards.split(","))
+    else:
+        creator = IndexDocs(
+            solr_url="http://localhost:8983/solr",
+            core_name=args.core
+        )
     
+    # What the core already holds; reruns only send the delta
+    manifest = IndexManifest(Path(args.store_dir) / f"{creator.core_name}.manifest.json")
+    if args.full:
+        # Send everything again, but keep the indexed ids so vanished documents are still deleted
+        manifest.invalidate()
+
     # Step 1: Create core
     print("\n=== Creating Core ===")
-    creator.create_core()
+    if creator.core_exists():
+        print(f"✓ Core '{creator.core_name}' already exists, skipping")
+    else:
+        # A new core holds none of the documents the manifest remembers
+        manifest.reset()
+        creator.create_core()
 
-    # Step 2: Define schema with vector dimension (e.g., 768 for BERT embeddings)
+    # Step 2: Define schema with vector dimension (768 for BERT embeddings, less when reduced)
     print("\n=== Defining Schema ===")
-    creator.define_schema(vector_dimension=768)
+    dimension = args.reduce_dim or 768
+    # A different inference mode changes every vector, so the manifest treats it like a new model
+    schema = {"dimension": dimension, "profile": args.profile,
+              "model": inference_key(MODEL_NAME, args.inference, args.max_length)}
+    previous = manifest.setup.get("schema")
+    if previous == schema:
+        print(f"✓ Schema already defined (profile '{args.profile}'), skipping")
+    elif previous and previous["dimension"] != dimension:
+        # The existing field type keeps its vectorDimension; the Schema API cannot change it in place
+        print(f"✗ Core '{creator.core_name}' holds {previous['dimension']}-dim vectors; "
+              f"index {dimension}-dim vectors into a new core (--core)")
+        sys.exit(1)
+    else:
+        if previous:
+            # Indexed vectors no longer match the schema; send everything again
+            manifest.invalidate()
+        if creator.define_schema(vector_dimension=dimension, profile=args.profile):
+            manifest.mark_setup(schema=schema)
+    if args.schema_only:
+        sys.exit(0)
+
+    # Byte profiles index int8 vectors; the calibration is kept per core so
+    # re-indexing and query-time quantization use the same scale
+    quantizer = None
+    quantizer_path = Path(args.store_dir) / f"{creator.core_name}.int8.json"
+    if profile.is_byte:
+        quantizer = Int8Quantizer.load(quantizer_path) or Int8Quantizer()
+
+    # The projection is kept per core too; search.py projects query vectors with it
+    projection = None
+    projection_path = Path(args.store_dir) / f"{creator.core_name}.pca.npz"
+    if args.reduce_dim:
+        projection = PCAProjection.load(projection_path)
+    elif projection_path.exists():
+        projection_path.unlink()
     
-    # Step 3: Index documents
+    # Step 3: Embed and index documents as a stream of chunks
     print("\n=== Indexing Documents ===")
-    creator.index_documents(cran_docs)
+    tracer = Tracer("index-docs", profile=args.profiler)
+    set_tracer(tracer)
+    with tracer:
+        # One embedder for the whole run, so fitting PCA does not load BERT a second time
+        embedder = open_embedder(store, batch_size=args.batch_size, processes=args.processes,
+                                 embed_server=args.embed_server, inference=args.inference,
+                                 max_length=args.max_length)
+        try:
+            if args.reduce_dim and (projection is None or projection.dimension != args.reduce_dim):
+                with stage("pca.fit"):
+                    projection = fit_projection(args.reduce_dim, embedder, args.pca_sample, store=store)
+                projection.save(projection_path)
+                # Vectors indexed with an earlier projection (and their int8 scale) are void
+                manifest.invalidate()
+                if quantizer is not None:
+                    quantizer = Int8Quantizer()
+            stream_cranfield(creator, embedder, chunk_size=args.chunk_size,
+                             queue_size=args.queue_size, store=store, workers=args.workers,
+                             encoder=UpdateEncoder(precision=args.precision, compress=args.gzip),
+                             quantizer=quantizer, on_calibrated=lambda q: q.save(quantizer_path),
+                             commit_policy=creator.commit_policy(args.commit,
+                                                                 commit_within_ms=args.commit_within,
+                                                                 soft_commit_every=args.soft_commit_every,
+                                                                 optimize_segments=args.optimize),
+                             manifest=manifest, projection=projection)
+        finally:
+            embedder.close()
+
+        if store is not None and args.compact_store:
+            with stage("store.compact"):
+                print(f"✓ Compacted embedding store, dropped {store.compact()} stale vectors")
+
+    print(tracer.summary())
+    if args.trace:
+        profile_path = tracer.export(args.trace)
+        print(f"✓ Trace written to {args.trace}" + (f", profile to {profile_path}" if profile_path else ""))
 
+    if args.shards:
+        creator.close()
     print("\nAll done!")
\ No newline at end of file
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark keyword, kNN and hybrid retrieval on the Cranfield core
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import ir_datasets
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from solrir.benchmark import run_benchmark
+from solrir.embedding import DEFAULT_MAX_LENGTH, INFERENCE_MODES, inference_key
+from solrir.embedserver import EmbeddingClient
+from solrir.exact import ExactIndex
+from solrir.indexdocs import IndexDocs
+from solrir.search import SearchClient
+from solrir.sharding import ShardedIndex
+from solrir.store import EmbeddingStore
+from solrir.vectors import Int8Quantizer, PCAProjection
+
+MODEL_NAME = "bert-base-uncased"
+STORE_DIR = Path(__file__).resolve().parent.parent / "1-indexdocs" / ".embeddings"
+
+
+def cranfield_gain(relevance: int) -> float:
+    """Cranfield grades 1 (complete answer) to 4 (minimum interest); -1 is not relevant."""
+    return float(5 - relevance) if relevance > 0 else 0.0
+
+
+def load_cranfield():
+    """Return (queries, qrels) for Cranfield."""
+    dataset = ir_datasets.load("cranfield")
+    queries = {query.query_id: query.text for query in dataset.queries_iter()}
+    qrels = {}
+    for qrel in dataset.qrels_iter():
+        gain = cranfield_gain(qrel.relevance)
+        if gain > 0:
+            qrels.setdefault(qrel.query_id, {})[qrel.doc_id] = gain
+    return queries, qrels
+
+
+def load_exact_index(store_dir: Path, inference: str = "fp32", max_length: int = DEFAULT_MAX_LENGTH):
+    """Exact index over the indexer's embedding store (memory-mapped), if it exists."""
+    model_key = inference_key(MODEL_NAME, inference, max_length)
+    if not (store_dir / model_key / "index.json").exists():
+        return None
+    return ExactIndex.from_store(EmbeddingStore(store_dir, model_key, 768))
+
+
+def print_summary(report: dict, k: int):
+    print(f"\n{'='*78}")
+    print(f"{'mode':8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'QTime p50':>10} {'QPS':>8} "
+          f"{'nDCG':>7} {'MAP':>7} {'recall':>7}")
+    print(f"{'='*78}")
+    for mode, stats in report["modes"].items():
+        def metric(name):
+            value = stats.get(f"{name}@{k}")
+            return f"{value:7.3f}" if value is not None else f"{'-':>7}"
+        print(f"{mode:8} {stats['client_latency']['p50_ms']:8.1f} {stats['client_latency']['p95_ms']:8.1f} "
+              f"{stats['client_latency']['p99_ms']:8.1f} {stats['solr_qtime']['p50_ms']:10.1f} "
+              f"{stats['qps']:8.1f} {metric('ndcg')} {metric('map')} {metric('recall')}")
+
+    reduction = report.get("reduction")
+    if reduction:
+        full_mb = reduction["documents"] * reduction["dimension"] * 4 / (1024 * 1024)
+        print(f"\nExact-search recall@{k} after reducing {reduction['dimension']}-dim vectors "
+              f"({full_mb:.1f} MB as float32):")
+        print(f"{'method':9} {'dim':>5} {'recall':>7} {'variance':>9} {'vectors MB':>11} {'size':>6}")
+        for row in reduction["sweep"]:
+            variance = f"{row['explained_variance']:9.1%}" if row["explained_variance"] is not None else f"{'-':>9}"
+            print(f"{row['method']:9} {row['dimension']:5} {row[f'recall@{k}']:7.3f} {variance} "
+                  f"{row['vector_mb']:11.1f} {row['dimension'] / reduction['dimension']:6.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval on the Cranfield core")
+    parser.add_argument("--modes", default="bm25,knn,hybrid", help="Comma-separated modes to run (also knn-rerank, exact)")
+    parser.add_argument("-k", type=int, default=10, help="Results per query and metric cutoff")
+    parser.add_argument("--concurrency", type=int, default=8, help="Queries in flight for the QPS pass")
+    parser.add_argument("--solr-url", default="http://localhost:8983/solr")
+    parser.add_argument("--core", default="cranfiled_docs")
+    parser.add_argument("--shards", default=None, metavar="URL,URL,...",
+                        help="Query these core URLs concurrently and merge the results (instead of --core)")
+    parser.add_argument("--embed-server", default=None, metavar="SOCKET",
+                        help="Embed queries through a running `python -m solrir.embedserver`")
+    parser.add_argument("--inference", default="fp32", choices=INFERENCE_MODES,
+                        help="Inference mode of the query model: fp32, dynamic int8 or bf16")
+    parser.add_argument("--max-length", type=int, default=DEFAULT_MAX_LENGTH,
+                        help="Max token length index-docs.py embedded with; with --inference it selects "
+                             "the embedding store")
+    parser.add_argument("--store-dir", default=str(STORE_DIR),
+                        help="Embedding store written by index-docs.py, for exact kNN ground truth")
+    parser.add_argument("--reduce-dims", default=None, metavar="DIMS",
+                        help="Comma-separated dimensions, e.g. 64,128,256: report the exact-search recall@k "
+                             "left after PCA or truncation to each")
+    parser.add_argument("--output", default="benchmark.json", help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    queries, qrels = load_cranfield()
+    exact_index = load_exact_index(Path(args.store_dir), args.inference, args.max_length)
+    if exact_index is None:
+        print("⚠ No embedding store found; kNN recall@k and the knn-rerank/exact modes are unavailable")
+
+    if args.shards:
+        index = ShardedIndex.from_urls(args.shards.split(","))
+    else:
+        index = IndexDocs(solr_url=args.solr_url, core_name=args.core)
+    quantizer = Int8Quantizer.load(Path(args.store_dir) / f"{index.core_name}.int8.json")
+    projection = PCAProjection.load(Path(args.store_dir) / f"{index.core_name}.pca.npz")
+    client = SearchClient(index, quantizer=quantizer, exact_index=exact_index, projection=projection,
+                          embedder=EmbeddingClient(args.embed_server) if args.embed_server else None,
+                          inference=args.inference, concurrency=args.concurrency)
+    try:
+        print(f"Running {len(queries)} Cranfield queries against '{index.core_name}'...")
+        report = run_benchmark(client, queries, modes=args.modes.split(","), k=args.k, qrels=qrels,
+                               concurrency=args.concurrency,
+                               reduce_dims=[int(d) for d in args.reduce_dims.split(",")] if args.reduce_dims else ())
+    finally:
+        client.close()
+
+    print_summary(report, args.k)
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"\n✓ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
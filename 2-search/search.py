@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Search the Cranfield core with kNN, BM25 or hybrid (RRF) queries, optionally
+re-ranking kNN candidates (or searching outright) with exact cosine similarity
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from solrir.embedding import DEFAULT_MAX_LENGTH, INFERENCE_MODES, inference_key
+from solrir.embedserver import EmbeddingClient
+from solrir.exact import ExactIndex
+from solrir.indexdocs import IndexDocs
+from solrir.resultcache import ResultCache
+from solrir.search import MODES, SearchClient
+from solrir.sharding import ShardedIndex
+from solrir.store import EmbeddingStore
+from solrir.vectors import Int8Quantizer, PCAProjection
+
+MODEL_NAME = "bert-base-uncased"
+STORE_DIR = Path(__file__).resolve().parent.parent / "1-indexdocs" / ".embeddings"
+
+
+def print_results(query: str, mode: str, docs: list):
+    print(f"\n{'='*60}")
+    print(f"[{mode}] {query}")
+    print(f"{'='*60}")
+    for rank, doc in enumerate(docs, 1):
+        score = doc.get("rrf_score", doc.get("score", 0.0))
+        title = " ".join(str(doc.get("title", "")).split())
+        print(f"{rank:2}. ({score:.4f}) [{doc.get('doc_id')}] {title}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the Cranfield core")
+    parser.add_argument("queries", nargs="*", help="Query texts; read from stdin when omitted")
+    parser.add_argument("--mode", default="hybrid", choices=MODES,
+                        help="knn-rerank and exact need the embedding store written by index-docs.py")
+    parser.add_argument("-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--solr-url", default="http://localhost:8983/solr")
+    parser.add_argument("--core", default="cranfiled_docs")
+    parser.add_argument("--shards", default=None, metavar="URL,URL,...",
+                        help="Query these core URLs concurrently and merge the results (instead of --core)")
+    parser.add_argument("--embed-server", default=None, metavar="SOCKET",
+                        help="Embed queries through a running `python -m solrir.embedserver`")
+    parser.add_argument("--inference", default="fp32", choices=INFERENCE_MODES,
+                        help="Inference mode of the query model: fp32, dynamic int8 or bf16")
+    parser.add_argument("--max-length", type=int, default=DEFAULT_MAX_LENGTH,
+                        help="Max token length index-docs.py embedded with; with --inference it selects "
+                             "the embedding store")
+    parser.add_argument("--cache-size", type=int, default=1024,
+                        help="Query embeddings kept in the LRU cache")
+    parser.add_argument("--result-cache-mb", type=float, default=64,
+                        help="Memory budget of the client-side result cache (0 disables it)")
+    parser.add_argument("--result-ttl", type=float, default=300.0,
+                        help="Seconds a cached result is reused while the index version is unchanged")
+    args = parser.parse_args()
+
+    exact_index = None
+    if args.mode in ("knn-rerank", "exact"):
+        # Memory-maps the indexer's vectors; nothing is copied into RAM up front
+        exact_index = ExactIndex.from_store(EmbeddingStore(STORE_DIR, inference_key(MODEL_NAME, args.inference, args.max_length), 768))
+        print(f"Exact index over {len(exact_index)} stored document vectors")
+
+    if args.shards:
+        index = ShardedIndex.from_urls(args.shards.split(","))
+    else:
+        index = IndexDocs(solr_url=args.solr_url, core_name=args.core)
+    # Reduced or byte-encoded cores need query vectors projected and quantized like the documents were
+    quantizer = Int8Quantizer.load(STORE_DIR / f"{index.core_name}.int8.json")
+    projection = PCAProjection.load(STORE_DIR / f"{index.core_name}.pca.npz")
+    result_cache = None
+    if args.result_cache_mb > 0:
+        result_cache = ResultCache(index.index_version, max_bytes=int(args.result_cache_mb * 1024 * 1024),
+                                   ttl=args.result_ttl)
+    client = SearchClient(index, cache_size=args.cache_size, quantizer=quantizer,
+                          exact_index=exact_index,
+                          embedder=EmbeddingClient(args.embed_server) if args.embed_server else None,
+                          result_cache=result_cache, projection=projection, inference=args.inference)
+
+    queries = args.queries or (line.strip() for line in sys.stdin)
+    try:
+        for query in queries:
+            if query:
+                print_results(query, args.mode, client.search(query, mode=args.mode, k=args.k))
+    finally:
+        client.close()
+
+    cache = client.embedding_cache
+    print(f"\nQuery embedding cache: {cache.hits} hits, {cache.misses} misses "
+          f"({cache.hit_rate:.0%} hit rate)")
+    if result_cache is not None:
+        print(f"Result cache: {result_cache.report()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""
+Shared helpers for the Solr IR tutorial scripts.
+
+The numbered tutorial directories put the repository root on ``sys.path``
+and import from here, so each script stays short and focused on Solr.
+"""
@@ -0,0 +1,240 @@
+"""
+Retrieval benchmark: latency percentiles, QPS, ranking quality and kNN recall.
+
+Every query is run once to warm the query embedding cache, so the timed
+passes measure retrieval rather than the BERT forward pass; the warmup's
+embedding time is reported separately. Results are plain dicts ready to be
+dumped as JSON and compared across HNSW settings, batch sizes and hardware.
+
+``dimension_sweep`` measures how much exact-search recall survives reducing
+the stored vectors to smaller dimensions, to pick the cheapest dimension that
+still meets the quality bar before re-indexing.
+"""
+import math
+import os
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from solrir.exact import ExactIndex
+from solrir.search import SearchClient
+from solrir.vectors import PCAProjection
+
+Qrels = Dict[str, Dict[str, float]]
+
+# Modes whose rankings are compared against the exact nearest neighbours
+VECTOR_MODES = ("knn", "knn-rerank", "exact")
+
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, float]:
+    """Mean and p50/p95/p99 of a list of durations, in milliseconds."""
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    if ms.size == 0:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"mean_ms": float(ms.mean()), "p50_ms": float(p50), "p95_ms": float(p95),
+            "p99_ms": float(p99), "max_ms": float(ms.max())}
+
+
+def ndcg_at_k(ranked: Sequence[str], gains: Dict[str, float], k: int) -> float:
+    """nDCG@k of a ranked list of doc ids given graded gains."""
+    dcg = sum(gains.get(doc_id, 0.0) / math.log2(rank + 1) for rank, doc_id in enumerate(ranked[:k], 1))
+    ideal = sorted(gains.values(), reverse=True)[:k]
+    idcg = sum(gain / math.log2(rank + 1) for rank, gain in enumerate(ideal, 1))
+    return dcg / idcg if idcg > 0 else 0.0
+
+
+def average_precision(ranked: Sequence[str], relevant: set, k: int) -> float:
+    """AP@k of a ranked list against a set of relevant doc ids."""
+    if not relevant:
+        return 0.0
+    hits, total = 0, 0.0
+    for rank, doc_id in enumerate(ranked[:k], 1):
+        if doc_id in relevant:
+            hits += 1
+            total += hits / rank
+    return total / min(len(relevant), k)
+
+
+def recall_at_k(ranked: Sequence[str], truth: Sequence[str], k: int) -> float:
+    """Fraction of the true top-k neighbours found in the first k results."""
+    truth = list(truth)[:k]
+    return len(set(ranked[:k]) & set(truth)) / len(truth) if truth else 0.0
+
+
+def exact_neighbors(query_vectors: np.ndarray, doc_vectors: np.ndarray, doc_ids: Sequence[str],
+                    k: int) -> List[List[str]]:
+    """Exact cosine top-k doc ids for every query."""
+    return ExactIndex(doc_vectors, doc_ids).search(query_vectors, k)[0]
+
+
+def dimension_sweep(exact_index: ExactIndex, query_vectors: np.ndarray, dimensions: Sequence[int],
+                    k: int = 10, sample_size: int = 5000, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Recall@k of exact search on reduced vectors against exact search on the full vectors.
+
+    One PCA is fitted on a sample of the indexed vectors (its leading components
+    serve every smaller dimension); plain truncation is measured for comparison.
+
+    Args:
+        exact_index: Index of the full-dimension document vectors
+        query_vectors: (queries, dimension) query embeddings
+        dimensions: Target dimensions to measure
+        k: Cutoff for recall
+        sample_size: Document vectors the PCA is fitted on
+        seed: Seed for drawing the sample
+    """
+    rows = exact_index.rows
+    full_dimension = exact_index.vectors.shape[1]
+    dimensions = sorted(d for d in set(dimensions) if d < full_dimension)
+    if not dimensions:
+        return []
+    truth = exact_index.search(query_vectors, k)[0]
+    sample = np.sort(np.random.default_rng(seed).choice(rows, min(sample_size, len(rows)), replace=False))
+    pca = PCAProjection(max(dimensions)).fit(np.asarray(exact_index.vectors[sample], dtype=np.float32))
+
+    def project(projection: PCAProjection) -> np.ndarray:
+        block = exact_index.block_size
+        return np.concatenate([
+            projection.project(np.asarray(exact_index.vectors[rows[start:start + block]], dtype=np.float32))
+            for start in range(0, len(rows), block)
+        ])
+
+    sweep = []
+    for method in ("pca", "truncate"):
+        for dimension in dimensions:
+            if method == "pca":
+                projection = pca.truncated(dimension)
+            else:
+                projection = PCAProjection.truncation(full_dimension, dimension)
+            found = ExactIndex(project(projection), exact_index.ids).search(projection.project(query_vectors), k)[0]
+            sweep.append({
+                "method": method,
+                "dimension": dimension,
+                f"recall@{k}": float(np.mean([recall_at_k(f, t, k) for f, t in zip(found, truth)])),
+                "explained_variance": projection.explained_variance,
+                "vector_mb": len(rows) * dimension * 4 / (1024 * 1024)
+            })
+    return sweep
+
+
+def _run_query(client: SearchClient, query: str, mode: str, k: int) -> Tuple[List[str], float, int]:
+    start = time.perf_counter()
+    docs, qtime = client.search_with_qtime(query, mode=mode, k=k)
+    elapsed = time.perf_counter() - start
+    return [str(doc.get("doc_id")) for doc in docs], elapsed, qtime
+
+
+def benchmark_mode(client: SearchClient, queries: Dict[str, str], mode: str, k: int = 10,
+                   qrels: Qrels = None, truth: Dict[str, List[str]] = None,
+                   concurrency: int = 8) -> Dict[str, Any]:
+    """
+    Benchmark one search mode over all queries.
+
+    Latency comes from a sequential pass; sustained QPS from a second pass with
+    ``concurrency`` queries in flight.
+
+    Args:
+        client: Search client for the core under test
+        queries: query_id -> query text
+        mode: One of solrir.search.MODES
+        k: Results per query and cutoff for all metrics
+        qrels: query_id -> {doc_id: gain} for nDCG/MAP
+        truth: query_id -> exact nearest doc ids for recall@k (vector modes only)
+        concurrency: Queries in flight during the throughput pass
+    """
+    results: Dict[str, List[str]] = {}
+    client_seconds, qtimes = [], []
+    for query_id, text in queries.items():
+        ranked, elapsed, qtime = _run_query(client, text, mode, k)
+        results[query_id] = ranked
+        client_seconds.append(elapsed)
+        qtimes.append(qtime)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda text: _run_query(client, text, mode, k), queries.values()))
+    throughput_seconds = time.perf_counter() - start
+
+    report: Dict[str, Any] = {
+        "queries": len(queries),
+        "client_latency": latency_summary(client_seconds),
+        "solr_qtime": latency_summary(np.asarray(qtimes, dtype=np.float64) / 1000),
+        "qps": len(queries) / throughput_seconds if throughput_seconds else 0.0,
+        "concurrency": concurrency
+    }
+    if qrels:
+        judged = [query_id for query_id in results if query_id in qrels]
+        report[f"ndcg@{k}"] = float(np.mean([ndcg_at_k(results[q], qrels[q], k) for q in judged])) if judged else None
+        report[f"map@{k}"] = float(np.mean([
+            average_precision(results[q], {d for d, gain in qrels[q].items() if gain > 0}, k) for q in judged
+        ])) if judged else None
+        report["judged_queries"] = len(judged)
+    if truth:
+        report[f"recall@{k}"] = float(np.mean([recall_at_k(results[q], truth[q], k) for q in results if q in truth]))
+    return report
+
+
+def run_benchmark(client: SearchClient, queries: Dict[str, str], modes: Sequence[str] = ("bm25", "knn", "hybrid"),
+                  k: int = 10, qrels: Qrels = None, exact_index: Optional[ExactIndex] = None,
+                  concurrency: int = 8, reduce_dims: Sequence[int] = ()) -> Dict[str, Any]:
+    """
+    Benchmark several modes and return a JSON-serializable report.
+
+    Args:
+        client: Search client for the core under test
+        queries: query_id -> query text
+        modes: Modes to run
+        k: Results per query and metric cutoff
+        qrels: query_id -> {doc_id: gain}
+        exact_index: Index of the indexed document vectors; enables exact-neighbour
+            recall@k for the vector modes (default: the client's own exact index)
+        concurrency: Queries in flight during the throughput pass
+        reduce_dims: Dimensions for a recall-vs-size sweep of the exact index
+            (see dimension_sweep); needs an exact index
+    """
+    start = time.perf_counter()
+    query_vectors = np.stack([client.embed_query(text) for text in queries.values()])
+    embed_seconds = time.perf_counter() - start
+
+    truth = None
+    exact_index = exact_index if exact_index is not None else client.exact_index
+    if exact_index is not None:
+        start = time.perf_counter()
+        truth = dict(zip(queries, exact_index.search(query_vectors, k)[0]))
+        truth_seconds = time.perf_counter() - start
+
+    report = {
+        "config": {
+            "core": client.index.core_name,
+            "k": k,
+            "concurrency": concurrency,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "host": platform.node(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version()
+        },
+        "query_embedding": {
+            "queries": len(queries),
+            "seconds": embed_seconds,
+            "per_query_ms": embed_seconds / len(queries) * 1000 if queries else 0.0
+        },
+        "modes": {}
+    }
+    if truth is not None:
+        report["ground_truth"] = {"documents": len(exact_index), "seconds": truth_seconds}
+    for mode in modes:
+        report["modes"][mode] = benchmark_mode(
+            client, queries, mode, k=k, qrels=qrels,
+            truth=truth if mode in VECTOR_MODES else None, concurrency=concurrency
+        )
+    if reduce_dims and exact_index is not None:
+        report["reduction"] = {
+            "documents": len(exact_index),
+            "dimension": int(exact_index.vectors.shape[1]),
+            "sweep": dimension_sweep(exact_index, query_vectors, reduce_dims, k)
+        }
+    return report
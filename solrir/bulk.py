@@ -0,0 +1,206 @@
+"""
+Concurrent bulk indexing client for Solr's JSON update handler.
+
+Batches are sent by a pool of worker threads over one keep-alive session.
+``submit`` blocks once ``max_in_flight`` batches are queued or sending, which
+gives producers natural backpressure. Connection errors and 5xx responses are
+retried with exponential backoff; anything else fails the batch.
+"""
+import json
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from solrir.instrument import count, record
+
+Payload = Union[bytes, List[Dict[str, Any]]]
+
+
+class BulkIndexError(RuntimeError):
+    """A batch could not be indexed after all retries."""
+
+
+class BulkIndexer:
+    """
+    Send update batches to Solr in parallel with retries and latency stats.
+    """
+    def __init__(self, update_url: str, workers: int = 4, max_in_flight: int = None,
+                 max_retries: int = 5, backoff: float = 0.5, timeout: float = 120,
+                 params: Dict[str, str] = None, headers: Dict[str, str] = None):
+        """
+        Args:
+            update_url: Update endpoint, e.g. http://localhost:8983/solr/core/update/json/docs
+            workers: Threads sending batches concurrently
+            max_in_flight: Batches queued or sending before ``submit`` blocks (default 2 x workers)
+            max_retries: Retries per batch on connection errors and 5xx responses
+            backoff: Initial retry delay in seconds, doubled on each attempt
+            timeout: Per-request timeout in seconds
+            params: Extra query parameters sent with every batch
+            headers: Extra HTTP headers, e.g. ``UpdateEncoder.headers`` for gzipped bodies
+        """
+        self.update_url = update_url
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.params = dict(params or {})
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Content-Type"] = "application/json"
+        self.session.headers.update(headers or {})
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-index")
+        self._slots = threading.BoundedSemaphore(max_in_flight or 2 * workers)
+        self._lock = threading.Lock()
+        self._futures: List[Future] = []
+        self._error: Optional[BaseException] = None
+
+        self.batches = 0
+        self.docs = 0
+        self.bytes_sent = 0
+        self.retries = 0
+        self.failures = 0
+        self.latencies: List[float] = []
+        self._started = None
+        self._finished = None
+
+    def submit(self, payload: Payload, num_docs: int = None) -> Future:
+        """
+        Queue a batch for sending, blocking while the in-flight limit is reached.
+
+        Args:
+            payload: List of documents, or an already serialized JSON body
+            num_docs: Documents in the batch; required for stats when payload is bytes
+
+        Raises:
+            BulkIndexError: if an earlier batch has already failed permanently
+        """
+        if self._error is not None:
+            raise BulkIndexError(f"Bulk indexing aborted: {self._error}") from self._error
+        if num_docs is None:
+            num_docs = 0 if isinstance(payload, bytes) else len(payload)
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        if self._started is None:
+            self._started = time.perf_counter()
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._send, body, num_docs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def _send(self, body: bytes, num_docs: int) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.session.post(self.update_url, data=body, params=self.params,
+                                             timeout=self.timeout)
+                if response.status_code < 500:
+                    response.raise_for_status()
+                    break
+                error = requests.exceptions.HTTPError(
+                    f"{response.status_code} Server Error: {response.text[:200]}", response=response
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            except requests.exceptions.RequestException as e:
+                self._fail(e)
+                raise
+            if attempt >= self.max_retries:
+                self._fail(error)
+                raise error
+            attempt += 1
+            count("http.retries")
+            with self._lock:
+                self.retries += 1
+            delay = self.backoff * 2 ** (attempt - 1)
+            time.sleep(delay + random.uniform(0, delay / 2))
+
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.batches += 1
+            self.docs += num_docs
+            self.bytes_sent += len(body)
+            self.latencies.append(latency)
+            self._finished = time.perf_counter()
+        result = response.json()
+        # The round trip includes Solr's own update time, reported as QTime
+        record("http.update", latency, num_docs, start=start)
+        record("solr.update", result.get("responseHeader", {}).get("QTime", 0) / 1000, num_docs)
+        count("http.bytes_sent", len(body))
+        return result
+
+    def _fail(self, error: BaseException):
+        with self._lock:
+            self.failures += 1
+            if self._error is None:
+                self._error = error
+
+    def flush(self):
+        """
+        Wait for every submitted batch.
+
+        Raises:
+            BulkIndexError: if any batch failed after all retries
+        """
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.exception()
+        if self._error is not None:
+            raise BulkIndexError(f"{self.failures} batch(es) failed: {self._error}") from self._error
+
+    def close(self):
+        """Wait for outstanding batches, then release threads and connections."""
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown(wait=True)
+            self.session.close()
+
+    def stats(self) -> Dict[str, float]:
+        """Batch, retry and latency statistics for everything sent so far."""
+        elapsed = (self._finished - self._started) if self._started and self._finished else 0.0
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            "batches": self.batches,
+            "docs": self.docs,
+            "bytes_sent": self.bytes_sent,
+            "retries": self.retries,
+            "failures": self.failures,
+            "seconds": elapsed,
+            "docs_per_sec": self.docs / elapsed if elapsed else 0.0,
+            "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "latency_p95_ms": float(np.percentile(latencies, 95) * 1000),
+            "latency_max_ms": float(latencies.max() * 1000)
+        }
+
+    def report(self) -> str:
+        s = self.stats()
+        return (f"{s['docs']} docs in {s['batches']} batches, {s['docs_per_sec']:.1f} docs/sec, "
+                f"latency p50 {s['latency_p50_ms']:.0f} ms / p95 {s['latency_p95_ms']:.0f} ms, "
+                f"{s['retries']} retries, {s['failures']} failures")
@@ -0,0 +1,133 @@
+"""
+Commit policies for bulk loads.
+
+Hard commits flush segments and open a new searcher, which throws away the
+query caches; forcing one per update request makes a bulk load fight the
+``autoCommit``/``autoSoftCommit`` settings in solrconfig.xml. A policy decides
+which commit parameters go on each update batch and which commits to issue
+during and after the load, and records how long each commit took together
+with the new searcher's warmup time.
+
+Modes:
+    hard    one hard commit after the load (nothing during it)
+    soft    soft commits every ``soft_commit_every`` seconds, one final hard commit
+    within  ``commitWithin`` on every batch; Solr schedules the commits
+    auto    no commit parameters at all; rely on autoCommit/autoSoftCommit
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+
+MODES = ("hard", "soft", "within", "auto")
+
+
+class CommitPolicy:
+    """
+    Decide and time the commits issued around a bulk load.
+    """
+    def __init__(self, core_url: str, mode: str = "soft", commit_within_ms: int = 10000,
+                 soft_commit_every: float = 30.0, optimize_segments: int = None):
+        """
+        Args:
+            core_url: Core URL, e.g. http://localhost:8983/solr/cranfiled_docs
+            mode: One of hard, soft, within, auto
+            commit_within_ms: commitWithin sent with every batch in "within" mode
+            soft_commit_every: Seconds between soft commits in "soft" mode (0 disables them)
+            optimize_segments: Merge down to this many segments after the load (None skips)
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown commit mode '{mode}', choose from {', '.join(MODES)}")
+        self.core_url = core_url
+        self.solr_url, self.core_name = core_url.rstrip("/").rsplit("/", 1)
+        self.mode = mode
+        self.commit_within_ms = commit_within_ms
+        self.soft_commit_every = soft_commit_every
+        self.optimize_segments = optimize_segments
+        self.timings: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._last_soft_commit = time.monotonic()
+
+    def batch_params(self) -> Dict[str, str]:
+        """Query parameters to send with every update batch."""
+        if self.mode == "within":
+            return {"commitWithin": str(self.commit_within_ms)}
+        if self.mode == "auto":
+            return {}
+        return {"commit": "false"}
+
+    def tick(self):
+        """Call after each submitted batch; issues a soft commit when one is due."""
+        if self.mode != "soft" or not self.soft_commit_every:
+            return
+        with self._lock:
+            if time.monotonic() - self._last_soft_commit < self.soft_commit_every:
+                return
+            self._last_soft_commit = time.monotonic()
+        self.commit(soft=True)
+
+    def finish(self):
+        """Call once after the last batch was acknowledged."""
+        if self.mode in ("hard", "soft"):
+            self.commit()
+        if self.optimize_segments:
+            self.optimize(self.optimize_segments)
+
+    def commit(self, soft: bool = False) -> Optional[Dict[str, Any]]:
+        """Issue a hard or soft commit that opens a new searcher, and time it."""
+        params = {"softCommit": "true"} if soft else {"commit": "true"}
+        return self._timed("soft-commit" if soft else "hard-commit", params)
+
+    def optimize(self, max_segments: int = 1) -> Optional[Dict[str, Any]]:
+        """Merge the index down to ``max_segments`` segments, and time it."""
+        return self._timed("optimize", {"optimize": "true", "maxSegments": str(max_segments)})
+
+    def _timed(self, kind: str, params: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        start = time.perf_counter()
+        try:
+            # waitSearcher (the default) makes the request return only once the
+            # new searcher is registered, so the round trip includes opening it
+            response = requests.post(f"{self.core_url}/update", params={**params, "waitSearcher": "true"})
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Error during {kind}: {e}")
+            return None
+        timing = {
+            "kind": kind,
+            "seconds": time.perf_counter() - start,
+            "searcher_warmup_ms": self.searcher_warmup_ms()
+        }
+        with self._lock:
+            self.timings.append(timing)
+        return timing
+
+    def searcher_warmup_ms(self) -> Optional[float]:
+        """Warmup time of the core's current searcher from the metrics API, if available."""
+        key = "SEARCHER.searcher.warmupTime"
+        try:
+            response = requests.get(
+                f"{self.solr_url}/admin/metrics",
+                params={"group": "core", "prefix": key, "wt": "json"}
+            )
+            response.raise_for_status()
+            return response.json()["metrics"][f"solr.core.{self.core_name}"][key]
+        except (requests.exceptions.RequestException, KeyError, ValueError):
+            return None
+
+    def report(self) -> str:
+        if not self.timings:
+            return f"commit mode '{self.mode}', no explicit commits"
+        parts = []
+        for kind in ("soft-commit", "hard-commit", "optimize"):
+            timings = [t for t in self.timings if t["kind"] == kind]
+            if not timings:
+                continue
+            seconds = [t["seconds"] for t in timings]
+            warmups = [t["searcher_warmup_ms"] for t in timings if t["searcher_warmup_ms"] is not None]
+            part = (f"{len(timings)} {kind} (avg {sum(seconds) / len(seconds) * 1000:.0f} ms, "
+                    f"max {max(seconds) * 1000:.0f} ms")
+            if warmups:
+                part += f", searcher warmup max {max(warmups)} ms"
+            parts.append(part + ")")
+        return f"commit mode '{self.mode}': " + ", ".join(parts)
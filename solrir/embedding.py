@@ -0,0 +1,357 @@
+"""
+Batched BERT embeddings for indexing.
+
+Documents are tokenized once, sorted by token length and fed to the model in
+fixed-size batches, so each batch only pads up to its own longest member.
+Results are written back in the caller's original order.
+
+``ShardedEmbedder`` spreads the same work over a pool of processes that each
+load the model once; workers write their rows straight into a shared-memory
+float32 matrix instead of pickling vectors back to the parent.
+
+Models can run in a cheaper inference mode than fp32: ``int8`` applies
+dynamic int8 quantization to every linear layer (weights stored as int8,
+activations quantized per batch), ``bf16`` casts the weights to bfloat16.
+Together with a shorter ``max_length`` this trades a little accuracy for CPU
+throughput; ``fidelity_check`` measures both against the fp32 baseline.
+
+torch and transformers are imported on first use, so importing this module
+(and everything that depends on it) stays cheap for schema and admin runs.
+"""
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from solrir.instrument import stage
+
+if TYPE_CHECKING:
+    import torch
+
+
+INFERENCE_MODES = ("fp32", "int8", "bf16")
+DEFAULT_MAX_LENGTH = 512
+
+
+def inference_key(model_name: str, mode: str = "fp32", max_length: int = DEFAULT_MAX_LENGTH) -> str:
+    """
+    Name for the vectors a model produces in an inference mode.
+
+    The fp32 baseline at the full length is the plain model name, so stores and
+    manifests written before inference modes existed stay valid.
+    """
+    if mode == "fp32" and max_length == DEFAULT_MAX_LENGTH:
+        return model_name
+    return f"{model_name}@{mode}-{max_length}"
+
+
+def with_inference_mode(model, mode: str = "fp32"):
+    """
+    Return the model prepared for CPU inference in ``mode``.
+
+    ``int8`` returns a dynamically quantized copy; ``bf16`` casts in place.
+    """
+    import torch
+
+    if mode == "fp32":
+        return model
+    if mode == "int8":
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if mode == "bf16":
+        return model.to(torch.bfloat16)
+    raise ValueError(f"Unknown inference mode '{mode}', expected one of {', '.join(INFERENCE_MODES)}")
+
+
+def load_model(model_name: str, mode: str = "fp32"):
+    """Load a tokenizer and an eval-mode model prepared for ``mode``."""
+    from transformers import AutoModel, AutoTokenizer
+
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Unknown inference mode '{mode}', expected one of {', '.join(INFERENCE_MODES)}")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+    return tokenizer, with_inference_mode(model, mode)
+
+
+def mean_pool(last_hidden: "torch.Tensor", attention_mask: "torch.Tensor") -> "torch.Tensor":
+    """Mean-pool the last hidden state over the non-padding tokens of each row, in float32."""
+    last_hidden = last_hidden.float()                          # bf16 sums lose too many digits
+    mask = attention_mask.unsqueeze(-1).to(last_hidden.dtype)  # (batch, seq_len, 1)
+    summed = (last_hidden * mask).sum(dim=1)                   # (batch, hidden_size)
+    counts = mask.sum(dim=1).clamp(min=1e-9)                   # avoid div zero
+    return summed / counts
+
+
+def embed_text(text: str, tokenizer, model, max_length: int = DEFAULT_MAX_LENGTH) -> list:
+    """Tokenize & run through BERT (at most ``max_length`` tokens), then mean-pool the last hidden state."""
+    import torch
+
+    with stage("embed.tokenize", 1):
+        inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=max_length)
+    with stage("embed.forward", 1), torch.no_grad():
+        outputs = model(**inputs)
+    with stage("embed.pool", 1):
+        pooled = mean_pool(outputs.last_hidden_state, inputs.attention_mask).squeeze()
+    with stage("embed.tolist", 1):
+        return pooled.tolist()
+
+
+class BatchEmbedder:
+    """
+    Embed many texts with length-bucketed batches.
+    """
+    def __init__(self, tokenizer, model, batch_size: int = 32, max_length: int = DEFAULT_MAX_LENGTH):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.docs_embedded = 0
+        self.seconds = 0.0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+
+    @property
+    def dimension(self) -> int:
+        return self.model.config.hidden_size
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.docs_embedded / self.seconds if self.seconds else 0.0
+
+    @property
+    def padding_efficiency(self) -> float:
+        """Fraction of the tokens sent to the model that were not padding."""
+        return self.real_tokens / self.padded_tokens if self.padded_tokens else 1.0
+
+    def _pad(self, encodings: Dict[str, List[List[int]]], rows: np.ndarray) -> Dict[str, "torch.Tensor"]:
+        """Pad the selected rows of a tokenizer output into a batch of tensors."""
+        import torch
+
+        width = max(len(encodings["input_ids"][i]) for i in rows)
+        batch = {}
+        for key, sequences in encodings.items():
+            pad_value = self.tokenizer.pad_token_id if key == "input_ids" else 0
+            values = np.full((len(rows), width), pad_value, dtype=np.int64)
+            for r, i in enumerate(rows):
+                values[r, :len(sequences[i])] = sequences[i]
+            batch[key] = torch.from_numpy(values)
+        return batch
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed texts and return a float32 matrix of shape (len(texts), hidden_size).
+
+        Args:
+            texts: Texts to embed; row i of the result belongs to texts[i]
+        """
+        import torch
+
+        start = time.perf_counter()
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        if not texts:
+            return vectors
+
+        with stage("embed.tokenize", len(texts)):
+            encodings = dict(self.tokenizer(
+                list(texts), truncation=True, max_length=self.max_length
+            ))
+        lengths = np.fromiter((len(ids) for ids in encodings["input_ids"]), dtype=np.int64)
+        order = np.argsort(lengths, kind="stable")
+
+        for offset in range(0, len(order), self.batch_size):
+            rows = order[offset:offset + self.batch_size]
+            with stage("embed.pad", len(rows)):
+                inputs = self._pad(encodings, rows)
+            with stage("embed.forward", len(rows)), torch.no_grad():
+                outputs = self.model(**inputs)
+            with stage("embed.pool", len(rows)):
+                pooled = mean_pool(outputs.last_hidden_state, inputs["attention_mask"])
+                vectors[rows] = pooled.float().numpy()
+            self.real_tokens += int(lengths[rows].sum())
+            self.padded_tokens += int(inputs["input_ids"].numel())
+
+        self.docs_embedded += len(texts)
+        self.seconds += time.perf_counter() - start
+        return vectors
+
+    def close(self):
+        """Nothing to release; present so callers can treat all embedders alike."""
+
+    def report(self) -> str:
+        return (f"{self.docs_embedded} docs in {self.seconds:.1f}s "
+                f"({self.docs_per_sec:.1f} docs/sec, batch_size={self.batch_size}, "
+                f"padding efficiency {self.padding_efficiency:.0%})")
+
+
+def fidelity_check(texts: Sequence[str], model_name: str,
+                   configs: Sequence[Tuple[str, int]] = None, batch_size: int = 32) -> List[Dict[str, Any]]:
+    """
+    Embed a sample in several inference configurations and compare with fp32 at the full length.
+
+    Args:
+        texts: Sample texts, e.g. a few hundred documents of the corpus
+        model_name: Hugging Face model to load
+        configs: (mode, max_length) pairs to measure (default: every mode at full length)
+        batch_size: Documents per forward pass
+
+    Returns:
+        One row per configuration, baseline first: docs/sec, speedup over the
+        baseline, share of the sample truncated at max_length, and the mean,
+        5th percentile and minimum cosine similarity to the baseline vectors
+    """
+    texts = list(texts)
+    if configs is None:
+        configs = [(mode, DEFAULT_MAX_LENGTH) for mode in INFERENCE_MODES]
+
+    def run(mode: str, max_length: int) -> Tuple[np.ndarray, float, float]:
+        tokenizer, model = load_model(model_name, mode)
+        embedder = BatchEmbedder(tokenizer, model, batch_size=batch_size, max_length=max_length)
+        embedder.embed(texts[:batch_size])  # warm up, so one-off allocations are not timed
+        start = time.perf_counter()
+        vectors = embedder.embed(texts)
+        seconds = time.perf_counter() - start
+        lengths = np.fromiter((len(ids) for ids in tokenizer(texts)["input_ids"]), dtype=np.int64)
+        return vectors, len(texts) / seconds, float((lengths > max_length).mean())
+
+    def unit(vectors: np.ndarray) -> np.ndarray:
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    baseline = ("fp32", DEFAULT_MAX_LENGTH)
+    results = {baseline: run(*baseline)}
+    for config in configs:
+        if config not in results:
+            results[config] = run(*config)
+    reference, reference_rate, _ = results[baseline]
+    rows = []
+    for (mode, max_length), (vectors, rate, truncated) in results.items():
+        cosines = (unit(vectors) * unit(reference)).sum(axis=1)
+        rows.append({
+            "mode": mode,
+            "max_length": max_length,
+            "docs_per_sec": rate,
+            "speedup": rate / reference_rate,
+            "truncated": truncated,
+            "cosine_mean": float(cosines.mean()),
+            "cosine_p05": float(np.percentile(cosines, 5)),
+            "cosine_min": float(cosines.min())
+        })
+    return rows
+
+
+# Per-process state of ShardedEmbedder workers, set up once by _init_worker.
+_worker: Dict[str, BatchEmbedder] = {}
+
+
+def _init_worker(model_name: str, batch_size: int, max_length: int, num_threads: int, mode: str):
+    import torch
+
+    torch.set_num_threads(num_threads)
+    tokenizer, model = load_model(model_name, mode)
+    _worker["embedder"] = BatchEmbedder(tokenizer, model, batch_size=batch_size, max_length=max_length)
+
+
+def _embed_shard(shm_name: str, shape: tuple, start: int, texts: List[str]) -> int:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        out[start:start + len(texts)] = _worker["embedder"].embed(texts)
+        del out
+    finally:
+        shm.close()
+    return len(texts)
+
+
+class ShardedEmbedder:
+    """
+    Embed texts with a pool of processes, each holding its own copy of the model.
+    """
+    def __init__(self, model_name: str, processes: int = None, threads_per_process: int = None,
+                 batch_size: int = 32, max_length: int = DEFAULT_MAX_LENGTH, shards_per_process: int = 4,
+                 mode: str = "fp32"):
+        """
+        Args:
+            model_name: Hugging Face model to load in every worker
+            processes: Worker processes (default: one per CPU core)
+            threads_per_process: torch intra-op threads per worker (default: cores / processes)
+            batch_size: Documents per forward pass inside a worker
+            max_length: Maximum tokens per document
+            shards_per_process: Contiguous shards per worker and call, for load balancing
+            mode: Inference mode of every worker's model (see INFERENCE_MODES)
+        """
+        from transformers import AutoConfig
+
+        cores = os.cpu_count() or 1
+        self.processes = processes or cores
+        self.threads_per_process = threads_per_process or max(1, cores // self.processes)
+        self.batch_size = batch_size
+        self.shards_per_process = shards_per_process
+        self.dimension = AutoConfig.from_pretrained(model_name).hidden_size
+        self.docs_embedded = 0
+        self.seconds = 0.0
+        self._pool = multiprocessing.get_context("spawn").Pool(
+            self.processes,
+            initializer=_init_worker,
+            initargs=(model_name, batch_size, max_length, self.threads_per_process, mode)
+        )
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.docs_embedded / self.seconds if self.seconds else 0.0
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed texts and return a float32 matrix in the same order as the input.
+
+        Args:
+            texts: Texts to embed; row i of the result belongs to texts[i]
+        """
+        start = time.perf_counter()
+        shape = (len(texts), self.dimension)
+        if not texts:
+            return np.empty(shape, dtype=np.float32)
+
+        texts = list(texts)
+        num_shards = min(self.processes * self.shards_per_process,
+                         -(-len(texts) // self.batch_size))
+        bounds = np.linspace(0, len(texts), num_shards + 1).astype(int)
+        shm = shared_memory.SharedMemory(create=True, size=len(texts) * self.dimension * 4)
+        try:
+            jobs = [
+                self._pool.apply_async(_embed_shard, (shm.name, shape, lo, texts[lo:hi]))
+                for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo
+            ]
+            for job in jobs:
+                job.get()
+            out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+            vectors = out.copy()
+            del out
+        finally:
+            shm.close()
+            shm.unlink()
+
+        self.docs_embedded += len(texts)
+        self.seconds += time.perf_counter() - start
+        return vectors
+
+    def close(self):
+        """Stop the worker processes."""
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.terminate()
+
+    def report(self) -> str:
+        return (f"{self.docs_embedded} docs in {self.seconds:.1f}s "
+                f"({self.docs_per_sec:.1f} docs/sec, {self.processes} processes x "
+                f"{self.threads_per_process} threads, batch_size={self.batch_size})")
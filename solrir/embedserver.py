@@ -0,0 +1,294 @@
+"""
+Persistent embedding worker on a Unix socket.
+
+Loading torch, transformers and BERT takes seconds; a long-running worker pays
+that once. Concurrent requests from any number of clients are merged into
+micro-batches: the batcher takes the first waiting request, then keeps
+collecting until ``max_batch`` texts are queued or ``max_wait_ms`` has passed
+since that first request, embeds everything in one ``BatchEmbedder`` call and
+hands each client its own rows. Under load that gives batched throughput; an
+isolated query waits at most ``max_wait_ms`` extra.
+
+Wire format, both directions: a 4-byte big-endian length, a JSON header of
+that length, then for vector responses ``rows x dimension`` float32 values.
+Requests are ``{"texts": [...]}`` or ``{"info": true}``.
+
+Run it with::
+
+    python -m solrir.embedserver --socket /tmp/solrir-embed.sock
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from solrir.embedding import DEFAULT_MAX_LENGTH, INFERENCE_MODES, BatchEmbedder, load_model
+
+DEFAULT_SOCKET = "/tmp/solrir-embed.sock"
+
+_HEADER = struct.Struct(">I")
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("embedding socket closed mid-message")
+        buf += chunk
+    return bytes(buf)
+
+
+def send_message(sock: socket.socket, header: Dict[str, Any], body: bytes = b""):
+    data = json.dumps(header).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data + body)
+
+
+def recv_header(sock: socket.socket) -> Dict[str, Any]:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size))
+
+
+class MicroBatcher:
+    """
+    Merge concurrent embed() calls into batches for one underlying embedder.
+    """
+    def __init__(self, embedder, max_batch: int = 64, max_wait_ms: float = 5.0):
+        """
+        Args:
+            embedder: Anything with ``embed(texts) -> ndarray`` and ``dimension``
+            max_batch: Texts per model call at most (one oversized request still goes alone)
+            max_wait_ms: How long the first request of a batch waits for company
+        """
+        self.embedder = embedder
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self._pending: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._carry = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def dimension(self) -> int:
+        return self.embedder.dimension
+
+    def submit(self, texts: Sequence[str]) -> Future:
+        future = Future()
+        self._pending.put((list(texts), future))
+        return future
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def _collect(self) -> List[Tuple[List[str], Future]]:
+        first = self._carry or self._pending.get()
+        self._carry = None
+        if first is None:
+            return [None]
+        batch, size = [first], len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._pending.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None or size + len(item[0]) > self.max_batch:
+                # Keep the batch under max_batch; the overflow starts the next one
+                self._carry = item
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if batch[0] is None:
+                break
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = self.embedder.embed(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for item_texts, future in batch:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+            self.batches += 1
+            self.requests += len(batch)
+            self.texts += len(texts)
+
+    def close(self):
+        self._stopped.set()
+        self._pending.put(None)
+        self._thread.join()
+
+    def report(self) -> str:
+        mean = self.texts / self.batches if self.batches else 0.0
+        return (f"{self.requests} requests, {self.texts} texts in {self.batches} batches "
+                f"({mean:.1f} texts/batch, max {self.max_batch}, max wait {self.max_wait * 1000:g} ms)")
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        batcher: MicroBatcher = self.server.batcher
+        while True:
+            try:
+                request = recv_header(self.request)
+            except ConnectionError:
+                return
+            if request.get("info"):
+                send_message(self.request, {"dimension": batcher.dimension, "report": batcher.report()})
+                continue
+            try:
+                vectors = np.ascontiguousarray(batcher.embed(request["texts"]), dtype=np.float32)
+            except Exception as e:
+                send_message(self.request, {"error": f"{type(e).__name__}: {e}"})
+                continue
+            send_message(self.request, {"shape": list(vectors.shape)}, vectors.tobytes())
+
+
+class EmbeddingServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Serve a MicroBatcher on a Unix socket; one thread per client connection.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, embedder, max_batch: int = 64, max_wait_ms: float = 5.0):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.socket_path = socket_path
+        self.batcher = MicroBatcher(embedder, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        super().__init__(socket_path, _Handler)
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class EmbeddingClient:
+    """
+    Embedder backed by a running EmbeddingServer.
+
+    Drop-in for BatchEmbedder in the pipeline, CachedEmbedder and SearchClient.
+    Each thread gets its own connection, so concurrent callers are batched
+    together by the server.
+    """
+    def __init__(self, socket_path: str = DEFAULT_SOCKET):
+        self.socket_path = socket_path
+        self.docs_embedded = 0
+        self.seconds = 0.0
+        self._local = threading.local()
+        self._sockets: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self._dimension = None
+
+    def _socket(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+            with self._lock:
+                self._sockets.append(sock)
+        return sock
+
+    def _info(self) -> Dict[str, Any]:
+        sock = self._socket()
+        send_message(sock, {"info": True})
+        return recv_header(sock)
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = self._info()["dimension"]
+        return self._dimension
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.docs_embedded / self.seconds if self.seconds else 0.0
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts on the server; row i of the result belongs to texts[i]."""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        start = time.perf_counter()
+        sock = self._socket()
+        send_message(sock, {"texts": list(texts)})
+        header = recv_header(sock)
+        if "error" in header:
+            raise RuntimeError(f"Embedding server error: {header['error']}")
+        rows, dimension = header["shape"]
+        vectors = np.frombuffer(_recv_exact(sock, rows * dimension * 4), dtype=np.float32)
+        vectors = vectors.reshape(rows, dimension).copy()
+        with self._lock:
+            self.docs_embedded += rows
+            self.seconds += time.perf_counter() - start
+        return vectors
+
+    def close(self):
+        with self._lock:
+            for sock in self._sockets:
+                sock.close()
+            self._sockets.clear()
+        self._local = threading.local()
+
+    def report(self) -> str:
+        return (f"{self.docs_embedded} docs in {self.seconds:.1f}s "
+                f"({self.docs_per_sec:.1f} docs/sec via {self.socket_path})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve BERT embeddings on a Unix socket")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket path")
+    parser.add_argument("--model", default="bert-base-uncased", help="Hugging Face model to load")
+    parser.add_argument("--max-batch", type=int, default=64, help="Texts per forward pass at most")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="How long a request waits for others to share its batch")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--inference", default="fp32", choices=INFERENCE_MODES,
+                        help="Inference mode: fp32, dynamic int8 or bf16 (see solrir.embedding)")
+    parser.add_argument("--max-length", type=int, default=DEFAULT_MAX_LENGTH,
+                        help="Tokens per text at most; longer texts are truncated")
+    args = parser.parse_args()
+
+    import torch
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    tokenizer, model = load_model(args.model, args.inference)
+    embedder = BatchEmbedder(tokenizer, model, batch_size=args.max_batch, max_length=args.max_length)
+
+    with EmbeddingServer(args.socket, embedder, max_batch=args.max_batch,
+                         max_wait_ms=args.max_wait_ms) as server:
+        print(f"✓ Serving {args.model} embeddings ({args.inference}, max {args.max_length} tokens) "
+              f"on {args.socket}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        print(f"✓ {server.batcher.report()}")
+
+
+if __name__ == "__main__":
+    main()
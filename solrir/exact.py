@@ -0,0 +1,109 @@
+"""
+Exact cosine top-k search over a local float32 document matrix.
+
+HNSW results from Solr are approximate; this gives the exact reference. The
+matrix may be a read-only ``np.memmap`` (e.g. ``EmbeddingStore.matrix``): it is
+never copied or normalized in place. Rows are scored in blocks with one
+matrix-matrix product per block, the best k of each block are picked with
+``argpartition`` and merged into a running top-k, so memory stays bounded by
+``queries x block_size`` however large the corpus is.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+class ExactIndex:
+    """
+    Brute-force cosine similarity index over a document matrix.
+    """
+    def __init__(self, vectors: np.ndarray, ids: Sequence[str], rows: np.ndarray = None,
+                 block_size: int = 65536):
+        """
+        Args:
+            vectors: (N, d) float32 matrix, possibly memory-mapped and larger than ``ids``
+            ids: Document id of each indexed row
+            rows: Row of ``vectors`` holding each id (default: rows 0..len(ids)-1)
+            block_size: Rows scored per matrix product
+        """
+        self.vectors = vectors
+        self.ids = list(ids)
+        self.rows = np.arange(len(self.ids)) if rows is None else np.asarray(rows, dtype=np.int64)
+        self.block_size = block_size
+        self.positions: Dict[str, int] = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self.inv_norms = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.rows), block_size):
+            block = self._block(start)
+            self.inv_norms[start:start + len(block)] = 1.0 / np.maximum(np.linalg.norm(block, axis=1), 1e-12)
+
+    @classmethod
+    def from_store(cls, store, block_size: int = 65536) -> "ExactIndex":
+        """Index every live document of an EmbeddingStore, reading its memory map in place."""
+        ids = list(store.index)
+        rows = np.fromiter((store.index[doc_id][0] for doc_id in ids), dtype=np.int64, count=len(ids))
+        return cls(store.matrix, ids, rows, block_size=block_size)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _block(self, start: int) -> np.ndarray:
+        rows = self.rows[start:start + self.block_size]
+        # Contiguous rows can be sliced straight out of the memory map
+        if len(rows) and rows[-1] - rows[0] == len(rows) - 1 and np.all(np.diff(rows) == 1):
+            return np.asarray(self.vectors[rows[0]:rows[-1] + 1], dtype=np.float32)
+        return np.asarray(self.vectors[rows], dtype=np.float32)
+
+    @staticmethod
+    def _normalize(queries: np.ndarray) -> np.ndarray:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        return queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+    def search(self, queries: np.ndarray, k: int = 10) -> Tuple[List[List[str]], np.ndarray]:
+        """
+        Exact cosine top-k for one query vector or a (Q, d) batch of them.
+
+        Returns:
+            (ids, scores): per query the k best doc ids, and a (Q, k) score matrix,
+            both sorted best first
+        """
+        queries = self._normalize(queries)
+        k = min(k, len(self.ids))
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_positions = np.empty((len(queries), 0), dtype=np.int64)
+
+        for start in range(0, len(self.rows), self.block_size):
+            block = self._block(start)
+            scores = (queries @ block.T) * self.inv_norms[start:start + len(block)]
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_positions = np.concatenate([best_positions, top + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_positions = np.take_along_axis(best_positions, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_positions = np.take_along_axis(best_positions, order, axis=1)
+        return [[self.ids[p] for p in row] for row in best_positions], best_scores
+
+    def score(self, query: np.ndarray, ids: Sequence[str]) -> np.ndarray:
+        """Exact cosine of one query against the given doc ids; unknown ids score -inf."""
+        query = self._normalize(query)[0]
+        positions = np.array([self.positions.get(doc_id, -1) for doc_id in ids], dtype=np.int64)
+        scores = np.full(len(ids), -np.inf, dtype=np.float32)
+        known = positions >= 0
+        if known.any():
+            vectors = np.asarray(self.vectors[self.rows[positions[known]]], dtype=np.float32)
+            scores[known] = (vectors @ query) * self.inv_norms[positions[known]]
+        return scores
+
+    def rerank(self, query: np.ndarray, ids: Sequence[str], k: int = None) -> List[Tuple[str, float]]:
+        """Re-order candidate ids (e.g. Solr's kNN top-N) by exact cosine, best first."""
+        scores = self.score(query, ids)
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [(ids[i], float(scores[i])) for i in order]
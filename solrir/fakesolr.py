@@ -0,0 +1,812 @@
+"""
+In-process stand-in for a standalone Solr node, for offline benchmarks and tests.
+
+Implements just enough of Solr's HTTP API for the scripts in this repository:
+
+- ``/admin/cores`` CREATE, STATUS and UNLOAD, ``/admin/metrics`` (including
+  filterCache counters: ``fq`` clauses are cached per searcher like in Solr)
+- ``/schema`` add-field, add-field-type (and their replace- variants)
+- ``/update/json/docs`` and ``/update`` (add, delete by id or query, commit,
+  gzip and chunked bodies)
+- ``/select`` with ``q`` (``*:*``, ``field:value``, keywords over ``qf``/``df``
+  scored with BM25, or ``{!knn}`` by brute force), ``fq``, ``rows``, ``start``,
+  ``fl``, ``sort`` and ``facet.field``
+- ``/admin/luke`` (index version) and ``/admin/ping``
+
+Updates become visible on the next commit, soft commit, ``commitWithin`` or
+automatic soft commit, like with the configset's ``autoSoftCommit``; every
+visible change bumps the index version. Every request can be delayed
+(``latency_ms`` plus random ``jitter_ms``, plus ``per_doc_ms`` per updated
+document) and can fail at ``failure_rate`` with ``failure_status`` (0 drops
+the connection instead), so the clients' maximum ingest rate, retries and
+backpressure can be measured without a container. ``max_concurrency`` bounds
+the requests processed at once, like a server's thread pool.
+
+It is not a search engine: matching is a linear scan and the query syntax is a
+small subset. Run it with::
+
+    python -m solrir.fakesolr --port 8983 --core vector_collection
+"""
+import argparse
+import gzip
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+_KNN = re.compile(r"^\{!knn\s+(?P<local>[^}]*)\}\s*(?P<vector>\[.*\])\s*$", re.S)
+_LOCAL_PARAMS = re.compile(r"^\{![^}]*\}")
+_TERMS = re.compile(r"^\{!(?P<parser>terms?)\s+(?P<local>[^}]*)\}(?P<value>.*)$", re.S)
+_CLAUSE = re.compile(r"^(?P<neg>-)?(?P<field>[\w.]+):(?P<value>.+)$", re.S)
+_RANGE = re.compile(r"^[\[{]\s*(?P<low>\S+)\s+TO\s+(?P<high>\S+)\s*[\]}]$")
+_TOKEN = re.compile(r"\w+")
+
+
+class SolrError(Exception):
+    """An error answered with an HTTP status and a Solr-style error body."""
+    def __init__(self, code: int, msg: str):
+        super().__init__(msg)
+        self.code = code
+        self.msg = msg
+
+
+def _tokens(value: Any) -> List[str]:
+    return _TOKEN.findall(str(value).lower())
+
+
+def _values(doc: Dict[str, Any], field: str) -> List[Any]:
+    value = doc.get(field)
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _compare_key(value: Any):
+    try:
+        return 0, float(value)
+    except (TypeError, ValueError):
+        return 1, str(value)
+
+
+def _term_matches(value: Any, term: str) -> bool:
+    if isinstance(value, str):
+        # Exact for string fields, every term present for text fields
+        terms = _tokens(term)
+        return value.lower() == term.lower() or bool(terms) and set(terms) <= set(_tokens(value))
+    return str(value).lower() == term.lower() or _compare_key(value) == _compare_key(term)
+
+
+def parse_filter(clause: str) -> Callable[[Dict[str, Any]], bool]:
+    """
+    Turn a filter clause into a document predicate.
+
+    Supports ``*:*``, ``field:value``, ``field:"a phrase"``, ``field:*``,
+    ``field:(a OR b)``, ``field:[low TO high]`` (``*`` for open ends), a
+    leading ``-`` for negation and the ``{!term f=field}`` and
+    ``{!terms f=field}a,b`` parsers; other local params such as ``{!tag=x}``
+    are ignored.
+    """
+    terms_match = _TERMS.match(clause.strip())
+    if terms_match is not None:
+        local = dict(re.findall(r"(\w+)=\"?([^\s\"]+)\"?", terms_match.group("local")))
+        field, value = local.get("f"), terms_match.group("value")
+        if not field:
+            raise SolrError(400, f"Missing 'f' in {clause}")
+        values = {value} if terms_match.group("parser") == "term" else set(value.split(local.get("separator", ",")))
+        return lambda doc: any(str(v) in values for v in _values(doc, field))
+    clause = _LOCAL_PARAMS.sub("", clause.strip()).strip()
+    if clause in ("", "*:*", "*"):
+        return lambda doc: True
+    match = _CLAUSE.match(clause)
+    if match is None:
+        raise SolrError(400, f"Unsupported filter clause: {clause}")
+    field, value = match.group("field"), match.group("value").strip()
+    range_match = _RANGE.match(value)
+    if value == "*":
+        def test(doc):
+            return bool(_values(doc, field))
+    elif range_match:
+        low, high = range_match.group("low"), range_match.group("high")
+        include_low, include_high = value[0] == "[", value[-1] == "]"
+
+        def in_range(v):
+            key = _compare_key(v)
+            if low != "*":
+                bound = _compare_key(low.strip('"'))
+                if key < bound or (key == bound and not include_low):
+                    return False
+            if high != "*":
+                bound = _compare_key(high.strip('"'))
+                if key > bound or (key == bound and not include_high):
+                    return False
+            return True
+
+        def test(doc):
+            return any(in_range(v) for v in _values(doc, field))
+    else:
+        if value.startswith("(") and value.endswith(")"):
+            terms = [t.strip().strip('"') for t in re.split(r"\s+OR\s+", value[1:-1]) if t.strip()]
+        else:
+            terms = [value.strip('"')]
+
+        def test(doc):
+            return any(_term_matches(v, t) for v in _values(doc, field) for t in terms)
+    if match.group("neg"):
+        return lambda doc: not test(doc)
+    return test
+
+
+class _FilterCache:
+    """LRU cache of fq clause -> matching document ids, with Solr's filterCache counters."""
+    def __init__(self, size: int):
+        self.size = size
+        self.entries: "OrderedDict[str, frozenset]" = OrderedDict()
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, clause: str, compute: Callable[[], frozenset]) -> frozenset:
+        with self.lock:
+            self.counters["lookups"] += 1
+            ids = self.entries.get(clause)
+            if ids is not None:
+                self.entries.move_to_end(clause)
+                self.counters["hits"] += 1
+                return ids
+        ids = compute()
+        with self.lock:
+            self.entries[clause] = ids
+            self.counters["inserts"] += 1
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                self.counters["evictions"] += 1
+        return ids
+
+    def clear(self):
+        with self.lock:
+            for name in ("lookups", "hits", "inserts", "evictions"):
+                self.counters[f"cumulative_{name}"] += self.counters.pop(name, 0)
+            self.entries.clear()
+
+    def metrics(self) -> Dict[str, float]:
+        with self.lock:
+            metrics = {"size": len(self.entries), "maxSize": self.size}
+            for name in ("lookups", "hits", "inserts", "evictions"):
+                metrics[name] = self.counters[name]
+                metrics[f"cumulative_{name}"] = self.counters[f"cumulative_{name}"] + self.counters[name]
+            for prefix in ("", "cumulative_"):
+                lookups = metrics[f"{prefix}lookups"]
+                metrics[f"{prefix}hitratio"] = metrics[f"{prefix}hits"] / lookups if lookups else 0.0
+            return metrics
+
+
+class _Core:
+    """Documents, schema and commit state of one core."""
+    def __init__(self, name: str, auto_soft_commit_ms: Optional[int], filter_cache_size: int = 512):
+        self.name = name
+        self.auto_soft_commit_ms = auto_soft_commit_ms
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.pending: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.pending_delete_all = False
+        self.version = 1
+        self.fields: Dict[str, Dict[str, Any]] = {}
+        self.field_types: Dict[str, Dict[str, Any]] = {}
+        self.commits = 0
+        self.lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+        self._timer_due = math.inf
+        self._vectors: Dict[str, Tuple[int, List[Dict[str, Any]], np.ndarray]] = {}
+        self.filter_cache = _FilterCache(filter_cache_size)
+
+    def vector_dimension(self, field: str) -> Optional[int]:
+        field_type = self.field_types.get(self.fields.get(field, {}).get("type"), {})
+        dimension = field_type.get("vectorDimension")
+        return int(dimension) if dimension is not None else None
+
+    def similarity(self, field: str) -> str:
+        field_type = self.field_types.get(self.fields.get(field, {}).get("type"), {})
+        return field_type.get("similarityFunction", "euclidean")
+
+    def vectors(self, field: str) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """Visible documents with a ``field`` vector and those vectors as one matrix, cached per version."""
+        with self.lock:
+            cached = self._vectors.get(field)
+            if cached is None or cached[0] != self.version:
+                docs = [doc for doc in self.docs.values() if doc.get(field) is not None]
+                matrix = np.asarray([doc[field] for doc in docs], dtype=np.float32).reshape(len(docs), -1)
+                cached = self._vectors[field] = (self.version, docs, matrix)
+            return cached[1], cached[2]
+
+    def matching_ids(self, clause: str) -> frozenset:
+        """Ids of the visible documents matching a filter clause."""
+        test = parse_filter(clause)
+        with self.lock:
+            return frozenset(doc_id for doc_id, doc in self.docs.items() if test(doc))
+
+    def add(self, doc: Dict[str, Any]):
+        if "id" not in doc:
+            raise SolrError(400, "Document is missing mandatory uniqueKey field: id")
+        for field, value in doc.items():
+            dimension = self.vector_dimension(field)
+            if dimension is not None and len(value) != dimension:
+                raise SolrError(400, f"incorrect vector dimension. The vector value has size {len(value)} "
+                                     f"while it is expected a vector with size {dimension}")
+        with self.lock:
+            self.pending[str(doc["id"])] = doc
+
+    def delete(self, doc_id: Any):
+        with self.lock:
+            self.pending[str(doc_id)] = None
+
+    def delete_by_query(self, query: str):
+        test = parse_filter(query)
+        with self.lock:
+            if query.strip() in ("*:*", "*"):
+                self.pending.clear()
+                self.pending_delete_all = True
+                return
+            for doc_id, doc in list(self.docs.items()) + list(self.pending.items()):
+                if doc is not None and test(doc):
+                    self.pending[doc_id] = None
+
+    def commit(self):
+        """Make pending changes visible, as a hard or soft commit would."""
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer, self._timer_due = None, math.inf
+            self.commits += 1
+            if not self.pending and not self.pending_delete_all:
+                return
+            if self.pending_delete_all:
+                self.docs.clear()
+                self.pending_delete_all = False
+            for doc_id, doc in self.pending.items():
+                if doc is None:
+                    self.docs.pop(doc_id, None)
+                else:
+                    self.docs[doc_id] = doc
+            self.pending.clear()
+            self.version += 1
+            # A new searcher starts with an empty cache, like autowarmCount="0"
+            self.filter_cache.clear()
+
+    def schedule_commit(self, within_ms: Optional[float]):
+        """Commit after ``within_ms`` (or the auto soft commit interval) unless one is due sooner."""
+        if within_ms is None:
+            within_ms = self.auto_soft_commit_ms
+        if within_ms is None:
+            return
+        due = time.monotonic() + within_ms / 1000
+        with self.lock:
+            if due >= self._timer_due:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer, self._timer_due = threading.Timer(within_ms / 1000, self.commit), due
+            self._timer.daemon = True
+            self._timer.start()
+
+
+class FakeSolr(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering like a standalone Solr node.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, cores: Sequence[str] = (),
+                 latency_ms: float = 0.0, jitter_ms: float = 0.0, per_doc_ms: float = 0.0,
+                 failure_rate: float = 0.0, failure_status: int = 503,
+                 failure_handlers: Sequence[str] = None, max_concurrency: int = None,
+                 auto_soft_commit_ms: Optional[int] = 1000, filter_cache_size: int = 512, seed: int = None):
+        """
+        Args:
+            host: Interface to listen on
+            port: Port to listen on; 0 picks a free one (see ``url``)
+            cores: Cores that exist from the start, like ``solr-precreate``
+            latency_ms: Fixed delay added to every request
+            jitter_ms: Extra uniformly random delay of up to this much
+            per_doc_ms: Extra delay per document added by an update request
+            failure_rate: Share of requests answered with ``failure_status``
+            failure_status: HTTP status of injected failures; 0 closes the
+                connection without an answer
+            failure_handlers: Handlers failures are injected into, e.g.
+                ``("update/json/docs",)``; None means every handler
+            max_concurrency: Requests processed at once; the rest wait
+            auto_soft_commit_ms: Interval of the automatic soft commit after an
+                update (None: updates wait for an explicit commit)
+            filter_cache_size: Entries of every core's filterCache
+            seed: Seed for the injected latency and failures
+        """
+        super().__init__((host, port), _Handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.per_doc_ms = per_doc_ms
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.failure_handlers = None if failure_handlers is None else set(failure_handlers)
+        self.auto_soft_commit_ms = auto_soft_commit_ms
+        self.filter_cache_size = filter_cache_size
+        self.cores: Dict[str, _Core] = {}
+        self.requests: Counter = Counter()
+        self.failures: Counter = Counter()
+        self.docs_added = 0
+        self.docs_deleted = 0
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        for name in cores:
+            self.create_core(name)
+
+    @property
+    def url(self) -> str:
+        """Base URL to use instead of http://localhost:8983/solr."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/solr"
+
+    def create_core(self, name: str) -> _Core:
+        with self._lock:
+            if name in self.cores:
+                raise SolrError(500, f"Core with name '{name}' already exists.")
+            core = self.cores[name] = _Core(name, self.auto_soft_commit_ms, self.filter_cache_size)
+            return core
+
+    def core(self, name: str) -> _Core:
+        core = self.cores.get(name)
+        if core is None:
+            raise SolrError(404, f"Core '{name}' not found")
+        return core
+
+    def start(self) -> "FakeSolr":
+        """Serve from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-solr", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeSolr":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _delay_and_fail(self, handler: str, docs: int) -> Optional[int]:
+        """Sleep for the injected latency; return the failure status to answer with, if any."""
+        with self._lock:
+            self.requests[handler] += 1
+            delay = self.latency_ms + self._random.uniform(0, self.jitter_ms) + self.per_doc_ms * docs
+            fail = (self.failure_rate > 0 and self._random.random() < self.failure_rate
+                    and (self.failure_handlers is None or handler in self.failure_handlers))
+            if fail:
+                self.failures[handler] += 1
+        if delay > 0:
+            time.sleep(delay / 1000)
+        return self.failure_status if fail else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": dict(self.requests),
+            "failures": dict(self.failures),
+            "docs_added": self.docs_added,
+            "docs_deleted": self.docs_deleted,
+            "cores": {name: {"numDocs": len(core.docs), "version": core.version, "commits": core.commits}
+                      for name, core in self.cores.items()}
+        }
+
+    def report(self) -> str:
+        requests_total = sum(self.requests.values())
+        failures_total = sum(self.failures.values())
+        return (f"{requests_total} requests ({failures_total} failed by injection), "
+                f"{self.docs_added} docs added, {self.docs_deleted} deleted, "
+                + ", ".join(f"{name}: {len(core.docs)} docs" for name, core in self.cores.items()))
+
+    # --- handlers -----------------------------------------------------------
+
+    def handle_cores(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        action = _one(params, "action", "STATUS").upper()
+        if action == "CREATE":
+            name = _one(params, "name")
+            if not name:
+                raise SolrError(400, "Missing parameter 'name'")
+            self.create_core(name)
+            return {"core": name}
+        if action == "UNLOAD":
+            with self._lock:
+                self.cores.pop(_one(params, "core"), None)
+            return {}
+        if action == "STATUS":
+            names = [_one(params, "core")] if _one(params, "core") else list(self.cores)
+            status = {}
+            for name in names:
+                core = self.cores.get(name)
+                status[name] = {} if core is None else {
+                    "name": name,
+                    "index": {"numDocs": len(core.docs), "maxDoc": len(core.docs), "version": core.version}
+                }
+            return {"status": status}
+        raise SolrError(400, f"Unsupported core admin action: {action}")
+
+    def handle_metrics(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        metrics = {f"solr.core.{name}": {"SEARCHER.searcher.warmupTime": 0, "INDEX.sizeInBytes": 0,
+                                         "CACHE.searcher.filterCache": core.filter_cache.metrics()}
+                   for name, core in list(self.cores.items())}
+        prefixes = [p for value in params.get("prefix", []) for p in value.split(",")]
+        if prefixes:
+            metrics = {registry: {key: value for key, value in values.items()
+                                  if any(key.startswith(prefix) for prefix in prefixes)}
+                       for registry, values in metrics.items()}
+        return {"metrics": metrics}
+
+    def handle_schema(self, core: _Core, command: Dict[str, Any]) -> Dict[str, Any]:
+        errors = []
+        for name, specs in command.items():
+            for spec in specs if isinstance(specs, list) else [specs]:
+                kind = "fields" if name.endswith("-field") else "field_types" if name.endswith("-field-type") else None
+                if kind is None or not name.startswith(("add-", "replace-")):
+                    errors.append(f"Unsupported schema command: {name}")
+                    continue
+                registry = getattr(core, kind)
+                label = "Field" if kind == "fields" else "Field type"
+                with core.lock:
+                    if name.startswith("add-") and spec["name"] in registry:
+                        errors.append(f"{label} '{spec['name']}' already exists.")
+                    elif name.startswith("replace-") and spec["name"] not in registry:
+                        errors.append(f"{label} '{spec['name']}' does not exist.")
+                    else:
+                        registry[spec["name"]] = dict(spec)
+        if errors:
+            raise SolrError(400, "; ".join(errors))
+        return {}
+
+    def handle_update(self, core: _Core, params: Dict[str, List[str]], body: Any, json_docs: bool) -> int:
+        """Apply an update request; returns the number of documents added."""
+        added = 0
+        if json_docs:
+            docs = body if isinstance(body, list) else [body] if body else []
+            commands = {"add": docs}
+        elif isinstance(body, list):
+            commands = {"add": body}
+        else:
+            commands = body or {}
+        for name, value in commands.items():
+            if name == "add":
+                for item in value if isinstance(value, list) else [value]:
+                    core.add(item.get("doc", item) if not json_docs else item)
+                    added += 1
+            elif name == "delete":
+                for item in value if isinstance(value, list) else [value]:
+                    if isinstance(item, dict) and "query" in item:
+                        core.delete_by_query(item["query"])
+                    else:
+                        core.delete(item["id"] if isinstance(item, dict) else item)
+                        with self._lock:
+                            self.docs_deleted += 1
+            elif name in ("commit", "optimize"):
+                core.commit()
+            else:
+                raise SolrError(400, f"Unknown update command: {name}")
+        with self._lock:
+            self.docs_added += added
+        if any(_one(params, flag) == "true" for flag in ("commit", "softCommit", "optimize")):
+            core.commit()
+        elif "commitWithin" in params:
+            core.schedule_commit(float(_one(params, "commitWithin")))
+        else:
+            core.schedule_commit(None)
+        return added
+
+    def handle_select(self, core: _Core, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        q = _one(params, "q", "*:*").strip() or "*:*"
+        rows = int(_one(params, "rows", "10"))
+        start = int(_one(params, "start", "0"))
+        with core.lock:
+            docs = list(core.docs.values())
+        for clause in params.get("fq", []):
+            if _LOCAL_PARAMS.match(clause) and "cache=false" in _LOCAL_PARAMS.match(clause).group():
+                test = parse_filter(clause)
+                docs = [doc for doc in docs if test(doc)]
+            else:
+                ids = core.filter_cache.get_or_compute(clause, lambda: core.matching_ids(clause))
+                docs = [doc for doc in docs if str(doc["id"]) in ids]
+
+        knn = _KNN.match(q)
+        if knn is not None:
+            scored = self._knn(core, docs if params.get("fq") else None, knn)
+        elif q in ("*:*", "*") or _CLAUSE.match(q) and not params.get("defType"):
+            test = parse_filter(q)
+            scored = [(1.0, doc) for doc in docs if test(doc)]
+        else:
+            fields = (_one(params, "qf") or _one(params, "df") or "").split()
+            scored = _bm25(docs, _tokens(q), fields or None)
+
+        scored = _sort(scored, _one(params, "sort", "score desc"))
+        fl = [f for f in re.split(r"[,\s]+", _one(params, "fl", "*")) if f]
+        page = [_project(doc, fl, score) for score, doc in scored[start:start + rows]]
+        response = {
+            "response": {"numFound": len(scored), "start": start, "numFoundExact": True, "docs": page}
+        }
+        if "score" in fl:
+            response["response"]["maxScore"] = max((score for score, _ in scored), default=0.0)
+        if _one(params, "facet") == "true" and params.get("facet.field"):
+            limit = int(_one(params, "facet.limit", "100"))
+            mincount = int(_one(params, "facet.mincount", "1"))
+            facet_fields = {}
+            for field in params["facet.field"]:
+                field = _LOCAL_PARAMS.sub("", field)
+                counts = Counter(v for _, doc in scored for v in _values(doc, field))
+                ranked = sorted(((term, n) for term, n in counts.items() if n >= mincount),
+                                key=lambda item: (-item[1], str(item[0])))
+                if limit >= 0:
+                    ranked = ranked[:limit]
+                facet_fields[field] = [x for item in ranked for x in item]
+            response["facet_counts"] = {"facet_queries": {}, "facet_fields": facet_fields}
+        return response
+
+    def _knn(self, core: _Core, allowed: Optional[List[Dict[str, Any]]],
+             match) -> List[Tuple[float, Dict[str, Any]]]:
+        """Brute-force top-k over ``allowed`` (every visible document if None)."""
+        local = dict(re.findall(r"(\w+)=(\S+)", match.group("local")))
+        field = local.get("f")
+        if not field:
+            raise SolrError(400, "knn query parser needs the 'f' parameter")
+        top_k = int(local.get("topK", 10))
+        query = np.asarray(json.loads(match.group("vector")), dtype=np.float32)
+        dimension = core.vector_dimension(field)
+        if dimension is not None and len(query) != dimension:
+            raise SolrError(400, f"incorrect vector dimension. The vector value has size {len(query)} "
+                                 f"while it is expected a vector with size {dimension}")
+        docs, matrix = core.vectors(field)
+        if allowed is not None:
+            keep = {id(doc) for doc in allowed}
+            rows = [i for i, doc in enumerate(docs) if id(doc) in keep]
+            docs, matrix = [docs[i] for i in rows], matrix[rows]
+        if not docs:
+            return []
+        similarity = core.similarity(field)
+        # Lucene's scores for each similarity function, so they are comparable with Solr's
+        if similarity == "cosine":
+            norms = np.linalg.norm(matrix, axis=1) * max(float(np.linalg.norm(query)), 1e-12)
+            scores = (1 + matrix @ query / np.maximum(norms, 1e-12)) / 2
+        elif similarity == "dot_product":
+            scores = (1 + matrix @ query) / 2
+        elif similarity == "max_inner_product":
+            dots = matrix @ query
+            scores = np.where(dots < 0, 1 / (1 - dots), dots + 1)
+        else:
+            scores = 1 / (1 + ((matrix - query) ** 2).sum(axis=1))
+        best = np.argsort(-scores, kind="stable")[:top_k]
+        return [(float(scores[i]), docs[i]) for i in best]
+
+
+def _one(params: Dict[str, List[str]], name: str, default: str = None) -> Optional[str]:
+    values = params.get(name)
+    return values[-1] if values else default
+
+
+def _bm25(docs: List[Dict[str, Any]], terms: List[str], fields: Optional[Sequence[str]],
+          k1: float = 1.2, b: float = 0.75) -> List[Tuple[float, Dict[str, Any]]]:
+    """Score documents with BM25 over the concatenated text of ``fields`` (all string fields if None)."""
+    if not terms:
+        return []
+
+    def text(doc):
+        names = fields or [name for name, value in doc.items() if isinstance(value, str)]
+        return [t for name in names for v in _values(doc, name) for t in _tokens(v)]
+
+    tokenized = [text(doc) for doc in docs]
+    average = sum(map(len, tokenized)) / len(tokenized) if tokenized else 0.0
+    frequencies = [Counter(tokens) for tokens in tokenized]
+    scored = []
+    for term in set(terms):
+        df = sum(1 for tf in frequencies if term in tf)
+        if df:
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            for i, tf in enumerate(frequencies):
+                if term in tf:
+                    norm = k1 * (1 - b + b * len(tokenized[i]) / (average or 1))
+                    scored.append((i, idf * tf[term] * (k1 + 1) / (tf[term] + norm)))
+    totals: Dict[int, float] = {}
+    for i, score in scored:
+        totals[i] = totals.get(i, 0.0) + score
+    return [(score, docs[i]) for i, score in totals.items()]
+
+
+def _sort(scored: List[Tuple[float, Dict[str, Any]]], sort: str) -> List[Tuple[float, Dict[str, Any]]]:
+    keys = [part.split() for part in sort.split(",") if part.strip()]
+    for field, *direction in reversed(keys):
+        reverse = (direction or ["asc"])[0].lower() == "desc"
+        if field == "score":
+            scored = sorted(scored, key=lambda item: item[0], reverse=reverse)
+        elif field.startswith("random_"):
+            # Like RandomSortField: a fixed order per seed
+            seed = field[len("random_"):]
+            scored = sorted(scored, key=lambda item: zlib.crc32(f"{seed}:{item[1].get('id')}".encode()),
+                            reverse=reverse)
+        else:
+            def key(item, field=field):
+                values = _values(item[1], field)
+                return (0, _compare_key(values[0])) if values else (1, (0, 0))
+            scored = sorted(scored, key=key, reverse=reverse)
+    return scored
+
+
+def _project(doc: Dict[str, Any], fl: List[str], score: float) -> Dict[str, Any]:
+    if "*" in fl:
+        out = dict(doc)
+    else:
+        out = {field: doc[field] for field in fl if field in doc}
+    if "score" in fl:
+        out["score"] = score
+    return out
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeSolr
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            body = b"".join(chunks)
+        else:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+        return body
+
+    def _send(self, code: int, payload: Dict[str, Any]):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json;charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        params = parse_qs(url.query, keep_blank_values=True)
+        body = self._body()
+        parts = [part for part in url.path.split("/") if part]
+        if parts[:1] != ["solr"] or len(parts) < 2:
+            return self._send(404, {"error": {"msg": f"Not found: {url.path}", "code": 404}})
+        if parts[1] == "admin":
+            core_name, handler = None, "/".join(parts[1:])
+        else:
+            core_name, handler = parts[1], "/".join(parts[2:]) or "select"
+        if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+            for name, values in parse_qs(body.decode("utf-8"), keep_blank_values=True).items():
+                params.setdefault(name, []).extend(values)
+            body = b""
+
+        slots = self.server._slots
+        if slots is not None:
+            slots.acquire()
+        try:
+            try:
+                payload = json.loads(body) if body.strip() else None
+            except ValueError as e:
+                return self._send(400, _error(400, f"Cannot parse JSON: {e}", start))
+            docs = len(payload) if handler.startswith("update") and isinstance(payload, list) else 0
+            failure = self.server._delay_and_fail(handler, docs)
+            if failure == 0:
+                self.close_connection = True
+                self.connection.shutdown(2)
+                return
+            if failure is not None:
+                return self._send(failure, _error(failure, "Injected failure", start))
+            try:
+                result = self._dispatch(core_name, handler, params, payload)
+            except SolrError as e:
+                return self._send(e.code, _error(e.code, e.msg, start))
+            except (KeyError, TypeError, ValueError) as e:
+                return self._send(400, _error(400, f"{type(e).__name__}: {e}", start))
+            header = {"status": 0, "QTime": int((time.perf_counter() - start) * 1000)}
+            self._send(200, {"responseHeader": header, **result})
+        finally:
+            if slots is not None:
+                slots.release()
+
+    def _dispatch(self, core_name: Optional[str], handler: str, params: Dict[str, List[str]],
+                  payload: Any) -> Dict[str, Any]:
+        server = self.server
+        if core_name is None:
+            if handler == "admin/cores":
+                return server.handle_cores(params)
+            if handler == "admin/metrics":
+                return server.handle_metrics(params)
+            if handler == "admin/info/system":
+                return {"lucene": {"solr-spec-version": "9.9.0-fake"}}
+            raise SolrError(404, f"Unknown handler: /{handler}")
+        core = server.core(core_name)
+        if handler in ("update/json/docs", "update/json", "update"):
+            server.handle_update(core, params, payload, json_docs=handler == "update/json/docs")
+            return {}
+        if handler == "select":
+            return server.handle_select(core, params)
+        if handler == "schema":
+            if self.command == "GET":
+                return {"schema": {"fields": list(core.fields.values()),
+                                   "fieldTypes": list(core.field_types.values())}}
+            return server.handle_schema(core, payload or {})
+        if handler == "schema/fields":
+            return {"fields": list(core.fields.values())}
+        if handler == "admin/luke":
+            return {"index": {"numDocs": len(core.docs), "maxDoc": len(core.docs), "version": core.version}}
+        if handler == "admin/ping":
+            return {"status": "OK"}
+        raise SolrError(404, f"Unknown handler: /{handler}")
+
+    do_GET = do_POST = _handle
+
+
+def _error(code: int, msg: str, start: float) -> Dict[str, Any]:
+    return {
+        "responseHeader": {"status": code, "QTime": int((time.perf_counter() - start) * 1000)},
+        "error": {"msg": msg, "code": code}
+    }
+
+
+def main(argv: Iterable[str] = None):
+    parser = argparse.ArgumentParser(description="Serve an in-process Solr stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8983)
+    parser.add_argument("--core", action="append", default=[],
+                        help="Core to pre-create (repeatable), e.g. vector_collection")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra delay of up to this much")
+    parser.add_argument("--per-doc-ms", type=float, default=0.0, help="Extra delay per indexed document")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests that fail")
+    parser.add_argument("--failure-status", type=int, default=503,
+                        help="HTTP status of injected failures (0 drops the connection)")
+    parser.add_argument("--failure-handler", action="append", default=None, metavar="HANDLER",
+                        help="Only inject failures into this handler, e.g. update/json/docs (repeatable)")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="Requests processed at once")
+    parser.add_argument("--auto-soft-commit-ms", type=int, default=1000,
+                        help="Automatic soft commit interval after updates (negative disables it)")
+    parser.add_argument("--filter-cache-size", type=int, default=512, help="filterCache entries per core")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    server = FakeSolr(args.host, args.port, cores=args.core, latency_ms=args.latency_ms,
+                      jitter_ms=args.jitter_ms, per_doc_ms=args.per_doc_ms,
+                      failure_rate=args.failure_rate, failure_status=args.failure_status,
+                      failure_handlers=args.failure_handler, max_concurrency=args.max_concurrency,
+                      auto_soft_commit_ms=args.auto_soft_commit_ms if args.auto_soft_commit_ms >= 0 else None,
+                      filter_cache_size=args.filter_cache_size, seed=args.seed)
+    print(f"✓ Solr stand-in listening on {server.url} (cores: {', '.join(args.core) or 'none'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print(f"✓ {server.report()}")
+
+
+if __name__ == "__main__":
+    main()
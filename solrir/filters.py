@@ -0,0 +1,290 @@
+"""
+Filtered kNN search with canonical, cache-friendly filter queries.
+
+Solr caches every ``fq`` clause on its own in the filterCache, keyed by the
+clause's exact text. Structured filters are therefore turned into one clause
+per dimension, written the same way every time:
+
+- a category set becomes ``{!terms f=category}A,B`` with the values sorted
+- a tag set becomes one ``{!term f=tags}x`` clause per tag when all tags must
+  match, so ``{ai, cloud}`` and ``{ai, data-science}`` share the ``ai`` entry,
+  or one sorted ``{!terms}`` clause when any tag may match
+- a date range is rounded out to whole days (UTC), so "the last 30 days"
+  produces the same clause all day instead of a new one every second
+
+High-cardinality traffic (many category and tag combinations) then reuses a
+small set of entries instead of filling the cache with one-off combinations.
+
+Filtering can happen before or after the vector search. ``pre`` sends the
+clauses as ``fq`` with the ``{!knn}`` query; Solr restricts the HNSW search to
+matching documents and always returns k hits if k exist. ``post`` fetches
+``overfetch`` x k nearest neighbours without filters and drops non-matching
+ones on the client, doubling the over-fetch while too few survive. It never
+touches the filterCache, at the price of recall for selective filters.
+"""
+import threading
+from collections import Counter
+from datetime import date, datetime, time, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import requests
+
+from solrir.indexdocs import IndexDocs
+from solrir.resultcache import ResultCache
+from solrir.serialize import format_vectors
+
+if TYPE_CHECKING:
+    from solrir.sharding import ShardedIndex
+
+
+STRATEGIES = ("pre", "post")
+
+DateLike = Union[date, datetime, str]
+
+
+def _day(value: DateLike) -> date:
+    """The UTC calendar day of a date, datetime or ISO-8601 string."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.date()
+    return value
+
+
+def _solr_date(day: date) -> str:
+    return datetime.combine(day, time()).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def days_ago(days: int, today: date = None) -> date:
+    """The UTC day ``days`` before today, e.g. ``VectorFilter(since=days_ago(30))``."""
+    return (today or datetime.now(timezone.utc).date()) - timedelta(days=days)
+
+
+def _terms_clause(field: str, values: Sequence[str]) -> str:
+    if len(values) == 1:
+        return f"{{!term f={field}}}{values[0]}"
+    separator = "," if not any("," in value for value in values) else "|"
+    local = f" separator={separator}" if separator != "," else ""
+    return f"{{!terms f={field}{local}}}{separator.join(values)}"
+
+
+class VectorFilter:
+    """
+    Structured filters for a kNN search, with their canonical ``fq`` clauses.
+    """
+    def __init__(self, categories: Iterable[str] = (), tags: Iterable[str] = (), tags_mode: str = "all",
+                 since: DateLike = None, until: DateLike = None, category_field: str = "category",
+                 tags_field: str = "tags", date_field: str = "created_date"):
+        """
+        Args:
+            categories: Documents must have one of these categories
+            tags: Tags to match
+            tags_mode: all (every tag must be present) or any (at least one)
+            since: First day included; times are rounded down to the start of the UTC day
+            until: Last day included; times are rounded up to the end of their UTC day
+            category_field: Single-valued string field holding the category
+            tags_field: Multi-valued string field holding the tags
+            date_field: Date field the range applies to
+        """
+        if tags_mode not in ("all", "any"):
+            raise ValueError(f"tags_mode must be 'all' or 'any', not '{tags_mode}'")
+        self.categories = tuple(sorted(set(categories)))
+        self.tags = tuple(sorted(set(tags)))
+        self.tags_mode = tags_mode if len(self.tags) > 1 else "all"
+        self.since = _day(since) if since is not None else None
+        self.until = _day(until) if until is not None else None
+        self.category_field = category_field
+        self.tags_field = tags_field
+        self.date_field = date_field
+
+    def __bool__(self) -> bool:
+        return bool(self.categories or self.tags or self.since or self.until)
+
+    def __repr__(self) -> str:
+        return f"VectorFilter({self.clauses()})"
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        """Fields post-filtering needs in every hit."""
+        return self.category_field, self.tags_field, self.date_field
+
+    def date_bounds(self) -> Tuple[Optional[str], Optional[str]]:
+        """Inclusive lower and exclusive upper bound of the date range, as Solr dates."""
+        low = _solr_date(self.since) if self.since is not None else None
+        high = _solr_date(self.until + timedelta(days=1)) if self.until is not None else None
+        return low, high
+
+    def clauses(self) -> List[str]:
+        """One canonical ``fq`` clause per filter dimension (per tag when all tags must match)."""
+        clauses = []
+        if self.categories:
+            clauses.append(_terms_clause(self.category_field, self.categories))
+        if self.tags and self.tags_mode == "all":
+            clauses.extend(_terms_clause(self.tags_field, [tag]) for tag in self.tags)
+        elif self.tags:
+            clauses.append(_terms_clause(self.tags_field, self.tags))
+        if self.since is not None or self.until is not None:
+            low, high = self.date_bounds()
+            clauses.append(f"{self.date_field}:[{low or '*'} TO {high or '*'}}}")
+        return clauses
+
+    def matches(self, doc: Dict[str, Any]) -> bool:
+        """Whether a returned document passes the filters, for post-filtering."""
+        if self.categories and doc.get(self.category_field) not in self.categories:
+            return False
+        if self.tags:
+            tags = set(doc.get(self.tags_field) or ())
+            if not (tags.issuperset(self.tags) if self.tags_mode == "all" else tags.intersection(self.tags)):
+                return False
+        if self.since is not None or self.until is not None:
+            value = doc.get(self.date_field)
+            if value is None:
+                return False
+            # Solr returns dates as ISO-8601 UTC strings, which compare like the instants they name
+            low, high = self.date_bounds()
+            if (low is not None and value < low) or (high is not None and value >= high):
+                return False
+        return True
+
+
+def cache_usage(before: Optional[Dict[str, float]], after: Optional[Dict[str, float]]) -> Optional[Dict[str, float]]:
+    """
+    Lookups, hits and evictions of a Solr cache between two metric snapshots.
+
+    Uses the ``cumulative_*`` counters, which survive the new searcher every commit opens.
+    """
+    if before is None or after is None:
+        return None
+    usage = {name: after.get(f"cumulative_{name}", 0) - before.get(f"cumulative_{name}", 0)
+             for name in ("lookups", "hits", "inserts", "evictions")}
+    usage["hit_rate"] = usage["hits"] / usage["lookups"] if usage["lookups"] else 0.0
+    usage["size"] = after.get("size", 0)
+    return usage
+
+
+class FilteredKnnSearch:
+    """
+    kNN search by query vector with structured filters, pre- or post-filtered.
+    """
+    def __init__(self, index: Union[IndexDocs, "ShardedIndex"], vector_field: str = "vector",
+                 fl: str = "id,score", strategy: str = "pre", overfetch: int = 4, max_overfetch: int = 64,
+                 result_cache: ResultCache = None):
+        """
+        Args:
+            index: IndexDocs for the core to query, or a ShardedIndex over several cores
+            vector_field: Dense vector field searched
+            fl: Fields returned for every hit
+            strategy: Default filtering strategy, pre or post
+            overfetch: Post-filtering fetches this many times k candidates first
+            max_overfetch: Post-filtering stops doubling the over-fetch here
+            result_cache: Client-side cache of Solr responses (see solrir.resultcache)
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown filter strategy '{strategy}', choose from {', '.join(STRATEGIES)}")
+        self.index = index
+        self.vector_field = vector_field
+        self.fl = fl
+        self.strategy = strategy
+        self.overfetch = overfetch
+        self.max_overfetch = max_overfetch
+        self.result_cache = result_cache
+        self.session = requests.Session()
+        self.searches: Counter = Counter()
+        self.refetches = 0
+        self.underfilled = 0
+        self.clause_uses: Counter = Counter()
+        self._lock = threading.Lock()
+        self._cache_baseline = index.cache_metrics("filterCache", session=self.session)
+
+    def _select(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        if self.result_cache is not None:
+            return self.result_cache.get_or_fetch(params, lambda p: self.index.select(p, session=self.session))
+        return self.index.select(params, session=self.session)
+
+    def _knn(self, vector: np.ndarray, top_k: int, rows: int, fl: str, fq: List[str]) -> Dict[str, Any]:
+        return self._select({
+            "q": f"{{!knn f={self.vector_field} topK={top_k}}}{format_vectors(vector)[0]}",
+            "rows": rows,
+            "fl": fl,
+            "fq": fq
+        })
+
+    def search(self, vector, filters: VectorFilter = None, k: int = 10,
+               strategy: str = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Return the k nearest documents passing ``filters`` and Solr's total QTime.
+
+        Args:
+            vector: Query vector
+            filters: Structured filters (none: plain kNN)
+            k: Results returned
+            strategy: pre or post (default: the client's strategy)
+        """
+        strategy = strategy or self.strategy
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown filter strategy '{strategy}', choose from {', '.join(STRATEGIES)}")
+        vector = np.asarray(vector, dtype=np.float32)
+        filters = filters or VectorFilter()
+        with self._lock:
+            self.searches[strategy] += 1
+
+        if strategy == "pre" or not filters:
+            clauses = filters.clauses()
+            with self._lock:
+                self.clause_uses.update(clauses)
+            response = self._knn(vector, k, k, self.fl, clauses)
+            return response["response"]["docs"], response["responseHeader"].get("QTime", 0)
+
+        fl = ",".join(dict.fromkeys(self.fl.split(",") + list(filters.fields)))
+        overfetch, qtime = self.overfetch, 0
+        while True:
+            top_k = k * overfetch
+            response = self._knn(vector, top_k, top_k, fl, [])
+            qtime += response["responseHeader"].get("QTime", 0)
+            candidates = response["response"]["docs"]
+            hits = [doc for doc in candidates if filters.matches(doc)]
+            # Stop once k survive, the over-fetch is at its limit or the index has no more documents
+            if len(hits) >= k or overfetch >= self.max_overfetch or len(candidates) < top_k:
+                break
+            overfetch *= 2
+            with self._lock:
+                self.refetches += 1
+        if len(hits) < k:
+            with self._lock:
+                self.underfilled += 1
+        return hits[:k], qtime
+
+    def filter_cache(self) -> Optional[Dict[str, float]]:
+        """Solr filterCache lookups, hits and evictions since this client was created."""
+        return cache_usage(self._cache_baseline, self.index.cache_metrics("filterCache", session=self.session))
+
+    def stats(self) -> Dict[str, Any]:
+        uses = sum(self.clause_uses.values())
+        return {
+            "searches": dict(self.searches),
+            "refetches": self.refetches,
+            "underfilled": self.underfilled,
+            "clause_uses": uses,
+            "distinct_clauses": len(self.clause_uses),
+            # What a filterCache large enough for every distinct clause would hit at best
+            "reusable_clause_rate": 1 - len(self.clause_uses) / uses if uses else 0.0,
+            "filter_cache": self.filter_cache()
+        }
+
+    def report(self) -> str:
+        stats = self.stats()
+        searches = ", ".join(f"{n} {strategy}-filtered" for strategy, n in stats["searches"].items()) or "0"
+        line = (f"{searches} searches, {stats['distinct_clauses']} distinct fq clauses in "
+                f"{stats['clause_uses']} uses ({stats['reusable_clause_rate']:.0%} reusable), "
+                f"{stats['refetches']} post-filter refetches, {stats['underfilled']} underfilled")
+        cache = stats["filter_cache"]
+        if cache is not None:
+            line += (f"; Solr filterCache {cache['hits']:.0f}/{cache['lookups']:.0f} hits "
+                     f"({cache['hit_rate']:.0%}), {cache['evictions']:.0f} evictions, {cache['size']:.0f} entries")
+        return line
+
+    def close(self):
+        self.session.close()
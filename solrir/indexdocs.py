@@ -0,0 +1,334 @@
+"""
+Solr core administration and indexing client.
+"""
+import requests
+from typing import List, Dict, Any, Iterable, Optional, Sequence
+
+from solrir.bulk import BulkIndexer, BulkIndexError
+from solrir.commit import CommitPolicy
+from solrir.instrument import stage
+from solrir.pipeline import chunked, quantize_stage
+from solrir.serialize import UpdateEncoder
+from solrir.vectors import Int8Quantizer, get_profile
+
+
+class IndexDocs:
+    """
+    Index documents in Solr.
+    """
+    def __init__(self, solr_url: str, core_name: str):
+        self.solr_url = solr_url
+        self.core_name = core_name
+        self.core_url = f"{solr_url}/{core_name}"
+    
+    def create_core(self, config_set: str = "_default"):
+        """
+        Create a new Solr core.
+        
+        Args:
+            config_set: Configuration set to use (e.g., '_default', 'sample_techproducts_configs')
+        """
+        url = f"{self.solr_url}/admin/cores"
+        params = {
+            "action": "CREATE",
+            "name": self.core_name,
+            "configSet": config_set
+        }
+        
+        try:
+            response = requests.get(url, params=params)
+            response.raise_for_status()
+            print(f"✓ Core '{self.core_name}' created successfully")
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Error creating core: {e}")
+            if "already exists" in str(e).lower():
+                print(f"  Core '{self.core_name}' already exists, continuing...")
+            return None
+    
+
+    def core_exists(self) -> bool:
+        """Whether the core is loaded in Solr, from the CoreAdmin STATUS action."""
+        try:
+            response = requests.get(
+                f"{self.solr_url}/admin/cores",
+                params={"action": "STATUS", "core": self.core_name, "wt": "json"}
+            )
+            response.raise_for_status()
+            return bool(response.json().get("status", {}).get(self.core_name))
+        except (requests.exceptions.RequestException, ValueError):
+            return False
+
+    def define_schema(self, vector_dimension: int = 768, profile: str = "default"):
+        """
+        Define the schema with text and vector fields.
+        
+        Args:
+            vector_dimension: Dimension of the embedding vectors (e.g., 768 for BERT)
+            profile: Vector field profile (HNSW parameters, similarity, float or byte encoding)
+
+        Returns:
+            True if the field type and every field were added (or already existed)
+        """
+        vector_profile = get_profile(profile)
+        #doc_id, title, text, author, bib
+        fields = [
+            {
+                "name": "doc_id",
+                "type": "text_general",
+                "indexed": True,
+                "stored": True,
+                "multiValued": False 
+
+            },
+            {
+                "name": "title",
+                "type": "text_general",
+                "indexed": True,
+                "stored": True,
+                "multiValued": False 
+
+            },
+            {
+                "name": "text",
+                "type": "text_general",
+                "indexed": True,
+                "stored": True,
+                "multiValued": False 
+
+            },
+            {
+                "name": "author",
+                "type": "text_general",
+                "indexed": True,
+                "stored": True,
+                "multiValued": False 
+
+            },
+            {
+                "name": "bib",
+                "type": "text_general",
+                "indexed": True,
+                "stored": True,
+                "multiValued": False 
+
+            },
+             {
+                "name": "vector",
+                "type": vector_profile.field_type_name,
+                "indexed": True,
+                "stored": True,
+                "multiValued": False
+            }
+        ]
+        
+        # First, add the field type for dense vectors with HNSW
+        field_type = vector_profile.field_type(vector_dimension)
+        ok = self._schema_command("add-field-type", field_type)
+        if ok:
+            print(f"✓ Field type '{field_type['name']}' configured with HNSW indexing "
+                  f"(profile '{profile}', {vector_profile.encoding}, M={vector_profile.max_connections}, "
+                  f"beamWidth={vector_profile.beam_width})")
+
+        for field in fields:
+            if self._schema_command("add-field", field):
+                print(f"✓ Added field: {field['name']}")
+            else:
+                ok = False
+        return ok
+
+    def add_schema(self, field_types: Sequence[Dict[str, Any]] = (), fields: Sequence[Dict[str, Any]] = ()) -> bool:
+        """
+        Add field types, then fields, through the Schema API.
+
+        Args:
+            field_types: Schema API field type definitions
+            fields: Schema API field definitions
+
+        Returns:
+            True if every field type and field was added (or already existed)
+        """
+        ok = True
+        for field_type in field_types:
+            ok = self._schema_command("add-field-type", field_type) and ok
+        for field in fields:
+            ok = self._schema_command("add-field", field) and ok
+        return ok
+
+    def _schema_command(self, command: str, definition: Dict[str, Any]) -> bool:
+        label = "field type" if command == "add-field-type" else "field"
+        try:
+            response = requests.post(
+                f"{self.core_url}/schema",
+                json={command: definition},
+                headers={"Content-Type": "application/json"}
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Error adding {label} {definition['name']}: {e}")
+            return False
+        if response.status_code == 200 or "already exists" in response.text.lower():
+            return True
+        print(f"✗ Failed to add {label} {definition['name']}: {response.text}")
+        return False
+    
+
+    def commit_policy(self, mode: str = "soft", **kwargs) -> CommitPolicy:
+        """
+        Create a commit policy for a bulk load into this core.
+
+        Args:
+            mode: hard, soft, within or auto (see solrir/commit.py)
+            **kwargs: Passed to CommitPolicy (commit_within_ms, soft_commit_every, optimize_segments)
+        """
+        return CommitPolicy(self.core_url, mode=mode, **kwargs)
+
+    def bulk_indexer(self, encoder: UpdateEncoder = None, commit_policy: CommitPolicy = None,
+                     **kwargs) -> BulkIndexer:
+        """
+        Create a concurrent bulk indexer for this core's JSON update handler.
+
+        Args:
+            encoder: Encoder whose bodies will be submitted; sets matching headers
+            commit_policy: Policy whose per-batch commit parameters are sent with every batch
+            **kwargs: Passed to BulkIndexer (workers, max_in_flight, max_retries, ...)
+        """
+        if encoder is not None:
+            kwargs.setdefault("headers", encoder.headers)
+        if commit_policy is not None:
+            kwargs.setdefault("params", commit_policy.batch_params())
+        return BulkIndexer(f"{self.core_url}/update/json/docs", **kwargs)
+
+    def select(self, params: Dict[str, Any], session: requests.Session = None) -> Dict[str, Any]:
+        """
+        Run a /select request and return the JSON response.
+
+        Parameters are POSTed as a form, which keeps long kNN vector literals out of the URL.
+        """
+        response = (session or requests).post(f"{self.core_url}/select", data={**params, "wt": "json"})
+        response.raise_for_status()
+        return response.json()
+
+    def index_version(self, session: requests.Session = None) -> int:
+        """
+        Version of the index the core's current searcher sees, from the Luke handler.
+
+        It changes with every commit (soft commits included) that opens a new searcher.
+        """
+        response = (session or requests).get(
+            f"{self.core_url}/admin/luke",
+            params={"numTerms": "0", "show": "index", "wt": "json"}
+        )
+        response.raise_for_status()
+        return response.json()["index"]["version"]
+
+    def cache_metrics(self, cache: str = "filterCache", session: requests.Session = None) -> Optional[Dict[str, float]]:
+        """
+        Statistics of one of the core's searcher caches from the metrics API, if available.
+
+        Args:
+            cache: filterCache, queryResultCache or documentCache
+
+        Returns:
+            Solr's counters (lookups, hits, hitratio, evictions, size and their
+            cumulative_* totals across searchers), or None when unavailable
+        """
+        key = f"CACHE.searcher.{cache}"
+        try:
+            response = (session or requests).get(
+                f"{self.solr_url}/admin/metrics",
+                params={"group": "core", "prefix": key, "wt": "json"}
+            )
+            response.raise_for_status()
+            return response.json()["metrics"][f"solr.core.{self.core_name}"][key]
+        except (requests.exceptions.RequestException, KeyError, ValueError):
+            return None
+
+    def delete_documents(self, ids: List[str], batch_size: int = 1000,
+                         commit_policy: CommitPolicy = None) -> int:
+        """
+        Delete documents by unique key, in batches.
+
+        Args:
+            ids: Unique keys of the documents to delete
+            batch_size: Ids per delete request
+            commit_policy: Policy whose per-batch commit parameters are sent with every request
+
+        Returns:
+            Number of ids deleted
+        """
+        params = commit_policy.batch_params() if commit_policy is not None else {}
+        deleted = 0
+        for batch in chunked(ids, batch_size):
+            response = requests.post(f"{self.core_url}/update", json={"delete": batch}, params=params)
+            response.raise_for_status()
+            deleted += len(batch)
+        return deleted
+
+    def index_documents(self, documents: List[Dict[str, Any]], batch_size: int = 500,
+                        workers: int = 4, encoder: UpdateEncoder = None,
+                        quantizer: Int8Quantizer = None, commit_policy: CommitPolicy = None):
+        """
+        Index documents into Solr in parallel batches, then commit.
+        
+        Args:
+            documents: List of documents
+            batch_size: Documents per update request
+            workers: Update requests in flight at once
+            encoder: Compact vector encoder; defaults to 7 significant digits, uncompressed
+            quantizer: Int8 quantizer for byte-encoded vector profiles; calibrated on
+                the first batch if not fitted yet
+            commit_policy: When and how to commit; defaults to a single final hard commit
+                with periodic soft commits
+        """
+        encoder = encoder or UpdateEncoder()
+        commit_policy = commit_policy or self.commit_policy()
+        quantize = quantize_stage(quantizer) if quantizer is not None else None
+        try:
+            with stage("index_documents", len(documents)), \
+                    self.bulk_indexer(encoder, commit_policy, workers=workers) as indexer:
+                for batch in chunked(documents, batch_size):
+                    if quantize is not None:
+                        with stage("quantize", len(batch)):
+                            batch = quantize([dict(doc) for doc in batch])
+                    payload = encoder.encode(batch)
+                    # Time blocked on the in-flight limit, i.e. waiting for Solr
+                    with stage("submit.wait", len(batch)):
+                        indexer.submit(payload, len(batch))
+                    commit_policy.tick()
+        except BulkIndexError as e:
+            print(f"✗ Error indexing documents: {e}")
+            return None
+        with stage("commit"):
+            commit_policy.finish()
+        print(f"✓ Indexed {len(documents)} documents successfully")
+        print(f"  {indexer.report()}")
+        print(f"  {encoder.report()}")
+        print(f"  {commit_policy.report()}")
+        return indexer.stats()
+
+    def stream_documents(self, documents: Iterable[Dict[str, Any]], encoder: UpdateEncoder = None,
+                         chunk_size: int = 256):
+        """
+        Send any number of documents as one streamed update request.
+
+        The body is produced chunk by chunk while it is being sent, so the full
+        JSON never exists in memory. A failed stream is not retried.
+
+        Args:
+            documents: Iterable of documents, consumed lazily
+            encoder: Compact vector encoder; defaults to 7 significant digits, uncompressed
+            chunk_size: Documents encoded per body chunk
+        """
+        encoder = encoder or UpdateEncoder()
+        try:
+            response = requests.post(
+                f"{self.core_url}/update/json/docs",
+                data=encoder.iter_encode(documents, chunk_size),
+                headers=encoder.headers
+            )
+            response.raise_for_status()
+            print(f"✓ Streamed {encoder.report()}")
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Error streaming documents: {e}")
+            return None
@@ -0,0 +1,312 @@
+"""
+Per-stage timers, counters and memory high-water marks for ingest runs.
+
+Library code marks its stages with ``stage("embed.forward", items=n)``; that
+is a no-op until a script installs a ``Tracer`` with ``set_tracer``. The
+tracer then aggregates calls, time and items per stage, attributes growth of
+the process's peak RSS to the stage that caused it, keeps a Chrome trace event
+per call (open the exported JSON in chrome://tracing or Perfetto) and prints a
+summary table at the end of the run.
+
+Stages nest and may run on any thread, so inclusive times of nested or
+concurrent stages overlap; compare a stage with its siblings, not with the
+wall-clock total.
+
+Profiling is optional: ``profile="cprofile"`` runs cProfile on the thread that
+enters the tracer, ``profile="sample"`` samples the stacks of every thread
+(pipeline stages and bulk workers included) and writes them in the collapsed
+format read by flamegraph.pl and speedscope.
+"""
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+PROFILERS = ("cprofile", "sample")
+
+# Leaf frames of threads that are blocked waiting rather than working; left out
+# of the sampler's summary (but kept in the collapsed stacks)
+IDLE_LEAVES = {"threading:wait", "selectors:select", "thread:_worker", "queue:get",
+               "socketserver:serve_forever", "threading:_wait_for_tstate_lock"}
+
+
+def peak_rss_mb() -> float:
+    """High-water mark of this process's resident memory, in MiB (0 if unknown)."""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class _StageStats:
+    __slots__ = ("calls", "seconds", "max_seconds", "items", "rss_growth_mb")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.items = 0
+        self.rss_growth_mb = 0.0
+
+
+class _StackSampler:
+    """Sample every thread's Python stack at a fixed interval."""
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write(self, path):
+        Path(path).write_text("".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()))
+
+    def top(self, limit: int = 15) -> List[str]:
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaf = stack.rsplit(";", 1)[-1]
+            if leaf not in IDLE_LEAVES:
+                leaves[leaf] += count
+        total = sum(leaves.values()) or 1
+        return [f"{count / total:6.1%}  {leaf}" for leaf, count in leaves.most_common(limit)]
+
+
+class Tracer:
+    """
+    Collect stage timings, counters, memory and trace events for one run.
+    """
+    def __init__(self, name: str = "run", profile: str = None, sample_interval: float = 0.005,
+                 max_events: int = 100000):
+        """
+        Args:
+            name: Run name used in the report and trace
+            profile: None, "cprofile" or "sample"
+            sample_interval: Seconds between stack samples for profile="sample"
+            max_events: Trace events kept at most; stage stats are always complete
+        """
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(f"Unknown profiler '{profile}', choose from {', '.join(PROFILERS)}")
+        self.name = name
+        self.profile = profile
+        self.sample_interval = sample_interval
+        self.max_events = max_events
+        self.stages: Dict[str, _StageStats] = {}
+        self.counters: Counter = Counter()
+        self.events: List[Dict[str, Any]] = []
+        self.dropped_events = 0
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._started = None
+        self._finished = None
+        self._rss_start = peak_rss_mb()
+        self._profiler = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str, items: int = 0):
+        """Time the enclosed block as one call of stage ``name`` covering ``items`` items."""
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, items, start=start,
+                        rss_growth_mb=peak_rss_mb() - rss_before)
+
+    def record(self, name: str, seconds: float, items: int = 0, start: float = None,
+               rss_growth_mb: float = 0.0):
+        """Record a stage call timed elsewhere, e.g. Solr's QTime for an update."""
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = _StageStats()
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.items += items
+            stats.rss_growth_mb += rss_growth_mb
+            if start is None:
+                return
+            if len(self.events) >= self.max_events:
+                self.dropped_events += 1
+                return
+            self.events.append({
+                "name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                "ts": round((start - self._origin) * 1e6, 1), "dur": round(seconds * 1e6, 1),
+                "args": {"items": items} if items else {}
+            })
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def __enter__(self) -> "Tracer":
+        self._started = time.perf_counter()
+        if self.profile == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profile == "sample":
+            self._profiler = _StackSampler(self.sample_interval)
+            self._profiler.start()
+        return self
+
+    def __exit__(self, *exc):
+        if isinstance(self._profiler, cProfile.Profile):
+            self._profiler.disable()
+        elif self._profiler is not None:
+            self._profiler.stop()
+        self._finished = time.perf_counter()
+
+    @property
+    def wall_seconds(self) -> float:
+        if self._started is None:
+            return 0.0
+        return (self._finished or time.perf_counter()) - self._started
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "wall_seconds": self.wall_seconds,
+            "peak_rss_mb": peak_rss_mb(),
+            "rss_growth_mb": peak_rss_mb() - self._rss_start,
+            "stages": {
+                name: {
+                    "calls": s.calls,
+                    "seconds": s.seconds,
+                    "mean_ms": s.seconds / s.calls * 1000 if s.calls else 0.0,
+                    "max_ms": s.max_seconds * 1000,
+                    "items": s.items,
+                    "items_per_sec": s.items / s.seconds if s.items and s.seconds else None,
+                    "rss_growth_mb": s.rss_growth_mb
+                } for name, s in sorted(self.stages.items())
+            },
+            "counters": dict(self.counters),
+            "dropped_events": self.dropped_events
+        }
+
+    def _profile_lines(self, limit: int = 15) -> List[str]:
+        if isinstance(self._profiler, cProfile.Profile):
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+            return out.getvalue().strip().splitlines()
+        if self._profiler is not None:
+            return [f"{self._profiler.samples} stack samples, top leaf functions of busy threads:"] + \
+                self._profiler.top(limit)
+        return []
+
+    def summary(self) -> str:
+        """Per-stage table, counters, memory and (if enabled) the profile's hot spots."""
+        report = self.as_dict()
+        lines = [f"{'='*86}",
+                 f"{self.name}: {report['wall_seconds']:.2f}s wall, peak RSS {report['peak_rss_mb']:.0f} MiB "
+                 f"(+{report['rss_growth_mb']:.0f} MiB during the run)",
+                 f"{'stage':26} {'calls':>7} {'total s':>9} {'mean ms':>9} {'max ms':>9} "
+                 f"{'items/s':>10} {'RSS +MiB':>9}",
+                 f"{'-'*86}"]
+        for name, s in report["stages"].items():
+            rate = f"{s['items_per_sec']:10.1f}" if s["items_per_sec"] else f"{'-':>10}"
+            lines.append(f"{name:26} {s['calls']:7} {s['seconds']:9.3f} {s['mean_ms']:9.2f} "
+                         f"{s['max_ms']:9.1f} {rate} {s['rss_growth_mb']:9.1f}")
+        if report["counters"]:
+            lines.append("counters: " + ", ".join(f"{k}={v}" for k, v in sorted(report["counters"].items())))
+        profile = self._profile_lines()
+        if profile:
+            lines += [f"{'-'*86}", *profile]
+        return "\n".join(lines)
+
+    def export(self, path) -> Optional[Path]:
+        """
+        Write the report plus Chrome trace events to ``path`` as JSON.
+
+        The profile, if any, goes next to it: ``<stem>.prof`` (pstats) for
+        cProfile, ``<stem>.folded`` (collapsed stacks) for the sampler. Returns
+        the profile's path.
+        """
+        path = Path(path)
+        path.write_text(json.dumps({**self.as_dict(), "traceEvents": self.events}))
+        if isinstance(self._profiler, cProfile.Profile):
+            profile_path = path.with_suffix(".prof")
+            self._profiler.dump_stats(profile_path)
+            return profile_path
+        if self._profiler is not None:
+            profile_path = path.with_suffix(".folded")
+            self._profiler.write(profile_path)
+            return profile_path
+        return None
+
+
+class _NullTracer:
+    """Stand-in installed by default; every hook is a cheap no-op."""
+    _null = contextlib.nullcontext()
+
+    def stage(self, name: str, items: int = 0):
+        return self._null
+
+    def record(self, *args, **kwargs):
+        pass
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+
+_tracer = _NullTracer()
+
+
+def get_tracer():
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]):
+    """Install the process-wide tracer used by ``stage``/``record``/``count``; None disables it."""
+    global _tracer
+    _tracer = tracer if tracer is not None else _NullTracer()
+
+
+def stage(name: str, items: int = 0):
+    return _tracer.stage(name, items)
+
+
+def record(name: str, seconds: float, items: int = 0, start: float = None):
+    _tracer.record(name, seconds, items, start=start)
+
+
+def count(name: str, n: int = 1):
+    _tracer.count(name, n)
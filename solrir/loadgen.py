@@ -0,0 +1,260 @@
+"""
+Asyncio load generator for a Solr core.
+
+Requests are drawn from a weighted mix of operations and scheduled either
+open-loop (a fixed arrival rate, whether or not earlier requests finished) or
+closed-loop (a fixed number of clients, each sending its next request when the
+previous one returns). Open-loop latency is measured from each request's
+scheduled arrival, so queueing in front of a saturated server is counted
+instead of hidden (no coordinated omission). Running open-loop at increasing
+rates shows where latency and errors take off: the QPS knee.
+
+HTTP calls are blocking ``requests`` calls run on a thread pool from the event
+loop, so no extra async HTTP dependency is needed.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Sequence
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+SCHEDULES = ("open", "closed")
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+
+
+class Operation(NamedTuple):
+    """
+    One kind of request in the mix.
+
+    ``build`` gets the run's random generator and returns keyword arguments for
+    ``requests.Session.request`` with a ``path`` relative to the core URL
+    instead of a ``url``.
+    """
+    name: str
+    weight: float
+    build: Callable[[np.random.Generator], Dict[str, Any]]
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram that also keeps raw samples for percentiles.
+    """
+    def __init__(self, bounds_ms: Sequence[float] = HISTOGRAM_BOUNDS_MS):
+        self.bounds_ms = tuple(bounds_ms)
+        self.counts = [0] * len(self.bounds_ms)
+        self.samples: List[float] = []
+
+    def record(self, seconds: float):
+        ms = seconds * 1000
+        self.samples.append(ms)
+        self.counts[next(i for i, bound in enumerate(self.bounds_ms) if ms <= bound)] += 1
+
+    def summary(self) -> Dict[str, float]:
+        """Mean and p50/p95/p99/max latency in milliseconds."""
+        if not self.samples:
+            return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        ms = np.asarray(self.samples)
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        return {"mean_ms": float(ms.mean()), "p50_ms": float(p50), "p95_ms": float(p95),
+                "p99_ms": float(p99), "max_ms": float(ms.max())}
+
+    def buckets(self) -> List[Dict[str, Any]]:
+        return [{"le_ms": bound if bound != float("inf") else None, "count": count}
+                for bound, count in zip(self.bounds_ms, self.counts)]
+
+    def render(self, width: int = 40) -> str:
+        """ASCII bars, one line per non-empty bucket."""
+        peak = max(self.counts) or 1
+        lines, lower = [], 0
+        for bound, count in zip(self.bounds_ms, self.counts):
+            if count:
+                label = f"{lower:g}-{bound:g} ms" if bound != float("inf") else f">{lower:g} ms"
+                lines.append(f"  {label:>14} {'#' * max(1, round(count / peak * width)):<{width}} {count}")
+            lower = bound
+        return "\n".join(lines)
+
+
+class OperationStats:
+    """Counts, errors and latencies of one operation."""
+    def __init__(self):
+        self.requests = 0
+        self.errors: Dict[str, int] = {}
+        self.histogram = LatencyHistogram()
+
+    def record(self, seconds: float, error: str = None):
+        self.requests += 1
+        self.histogram.record(seconds)
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def merge(self, other: "OperationStats"):
+        self.requests += other.requests
+        for kind, count in other.errors.items():
+            self.errors[kind] = self.errors.get(kind, 0) + count
+        self.histogram.samples.extend(other.histogram.samples)
+        self.histogram.counts = [a + b for a, b in zip(self.histogram.counts, other.histogram.counts)]
+
+    def as_dict(self, elapsed: float) -> Dict[str, Any]:
+        failed = sum(self.errors.values())
+        return {
+            "requests": self.requests,
+            "errors": failed,
+            "error_rate": failed / self.requests if self.requests else 0.0,
+            "error_kinds": dict(self.errors),
+            "qps": self.requests / elapsed if elapsed else 0.0,
+            "latency": self.histogram.summary(),
+            "histogram": self.histogram.buckets()
+        }
+
+
+class LoadGenerator:
+    """
+    Drive a weighted mix of operations against a core and collect latency stats.
+    """
+    def __init__(self, core_url: str, operations: Sequence[Operation], seed: int = 0,
+                 max_connections: int = 64, timeout: float = 30):
+        """
+        Args:
+            core_url: Core URL, e.g. http://localhost:8983/solr/vector_collection
+            operations: The request mix; weights need not sum to 1
+            seed: Seed for the operation choice and the request builders
+            max_connections: Requests in flight at most (HTTP pool and thread pool size)
+            timeout: Per-request timeout in seconds
+        """
+        operations = [op for op in operations if op.weight > 0]
+        if not operations:
+            raise ValueError("LoadGenerator needs at least one operation with a positive weight")
+        self.core_url = core_url.rstrip("/")
+        self.operations = operations
+        weights = np.array([op.weight for op in operations], dtype=np.float64)
+        self.probabilities = weights / weights.sum()
+        self.rng = np.random.default_rng(seed)
+        self.max_connections = max_connections
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="loadgen")
+        # Histograms of the last run(), for rendering
+        self.histograms: Dict[str, LatencyHistogram] = {}
+
+    def _next_request(self):
+        op = self.operations[self.rng.choice(len(self.operations), p=self.probabilities)]
+        kwargs = op.build(self.rng)
+        kwargs["url"] = f"{self.core_url}/{kwargs.pop('path').lstrip('/')}"
+        kwargs.setdefault("timeout", self.timeout)
+        return op, kwargs
+
+    def _send(self, kwargs: Dict[str, Any]) -> str:
+        """Send one request; return an error kind, or None on success."""
+        try:
+            response = self.session.request(**kwargs)
+        except requests.exceptions.Timeout:
+            return "timeout"
+        except requests.exceptions.RequestException as e:
+            return type(e).__name__
+        return None if response.ok else f"HTTP {response.status_code}"
+
+    async def _issue(self, op: Operation, kwargs: Dict[str, Any], stats: Dict[str, OperationStats],
+                     started: float):
+        loop = asyncio.get_running_loop()
+        error = await loop.run_in_executor(self._executor, self._send, kwargs)
+        stats[op.name].record(time.perf_counter() - started, error)
+
+    async def _open_loop(self, rate: float, duration: float, stats: Dict[str, OperationStats]):
+        start = time.perf_counter()
+        tasks = []
+        for n in range(int(rate * duration)):
+            # Arrivals are on a fixed schedule; a late loop sends immediately,
+            # and latency still counts from the scheduled time
+            scheduled = start + n / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            op, kwargs = self._next_request()
+            tasks.append(asyncio.ensure_future(self._issue(op, kwargs, stats, scheduled)))
+        await asyncio.gather(*tasks)
+
+    async def _closed_loop(self, concurrency: int, duration: float, stats: Dict[str, OperationStats]):
+        deadline = time.perf_counter() + duration
+
+        async def client():
+            while time.perf_counter() < deadline:
+                op, kwargs = self._next_request()
+                await self._issue(op, kwargs, stats, time.perf_counter())
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    def run(self, schedule: str = "closed", duration: float = 30.0, rate: float = 100.0,
+            concurrency: int = 8) -> Dict[str, Any]:
+        """
+        Run one load phase and return a JSON-serializable report.
+
+        Args:
+            schedule: "open" (fixed arrival rate) or "closed" (fixed concurrency)
+            duration: Seconds of load; an open-loop run then waits for stragglers
+            rate: Requests per second offered in open-loop mode
+            concurrency: Clients in closed-loop mode (capped by max_connections)
+        """
+        if schedule not in SCHEDULES:
+            raise ValueError(f"Unknown schedule '{schedule}', choose from {', '.join(SCHEDULES)}")
+        stats = {op.name: OperationStats() for op in self.operations}
+        start = time.perf_counter()
+        if schedule == "open":
+            asyncio.run(self._open_loop(rate, duration, stats))
+        else:
+            asyncio.run(self._closed_loop(min(concurrency, self.max_connections), duration, stats))
+        elapsed = time.perf_counter() - start
+
+        overall = OperationStats()
+        for op_stats in stats.values():
+            overall.merge(op_stats)
+        self.histograms = {name: op_stats.histogram for name, op_stats in stats.items()}
+        self.histograms["overall"] = overall.histogram
+        return {
+            "schedule": schedule,
+            "offered_qps": rate if schedule == "open" else None,
+            "concurrency": concurrency if schedule == "closed" else None,
+            "seconds": elapsed,
+            "overall": overall.as_dict(elapsed),
+            "operations": {name: op_stats.as_dict(elapsed) for name, op_stats in stats.items()}
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self) -> "LoadGenerator":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def format_report(report: Dict[str, Any], histograms: Dict[str, LatencyHistogram] = None) -> str:
+    """Human-readable table of one run() report, optionally with LoadGenerator.histograms."""
+    if report["schedule"] == "open":
+        header = f"open loop, {report['offered_qps']:g} req/s offered"
+    else:
+        header = f"closed loop, {report['concurrency']} clients"
+    lines = [f"{header}, {report['seconds']:.1f} s",
+             f"{'operation':12} {'requests':>9} {'QPS':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} "
+             f"{'p99 ms':>8} {'max ms':>8}"]
+    for name, stats in [*report["operations"].items(), ("overall", report["overall"])]:
+        latency = stats["latency"]
+        lines.append(f"{name:12} {stats['requests']:9} {stats['qps']:8.1f} {stats['error_rate']:7.1%} "
+                     f"{latency['p50_ms']:8.1f} {latency['p95_ms']:8.1f} {latency['p99_ms']:8.1f} "
+                     f"{latency['max_ms']:8.1f}")
+        if stats["error_kinds"]:
+            lines.append("             errors: " + ", ".join(f"{k} x{v}" for k, v in stats["error_kinds"].items()))
+    for name, histogram in (histograms or {}).items():
+        if histogram.samples:
+            lines.append(f"\n{name} latency histogram:\n{histogram.render()}")
+    return "\n".join(lines)
@@ -0,0 +1,163 @@
+"""
+Durable record of what a core holds, for resumable and incremental indexing.
+
+The manifest maps each indexed doc_id to the hash of the document content it
+was indexed with. Only acknowledged batches enter it: after Solr accepts a
+batch its ids are appended to a journal and fsynced, so a run killed midway
+resumes from the last acknowledged batch. (Acknowledged updates survive a Solr
+restart through its update log even before they are committed.)
+
+A rerun passes the source through :meth:`IndexManifest.changed`, which only
+lets new or changed documents through, and afterwards :meth:`removed` lists
+the ids that vanished from the source so they can be deleted. When every
+document must be sent again (new vectors, ``--full``), :meth:`invalidate` marks
+them all as changed but keeps their ids, so removals are still found. ``save()`` folds
+the journal into a JSON snapshot at the end of a run. Setup steps (core
+creation, schema) are recorded as well so they can be skipped on reruns.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence
+
+from solrir.serialize import json_default
+
+# Hash of an invalidated document; never equal to a real one, so it is sent again
+STALE = ""
+
+
+def document_hash(doc: Dict[str, Any], exclude: Sequence[str] = ("vector",)) -> str:
+    """Stable hash of a document's fields, ignoring derived ones such as the vector."""
+    fields = {key: value for key, value in doc.items() if key not in exclude}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, default=json_default).encode("utf-8")).hexdigest()
+
+
+class IndexManifest:
+    """
+    doc_id -> content hash of every document indexed into one core.
+    """
+    def __init__(self, path, id_field: str = "doc_id",
+                 hash_fn: Callable[[Dict[str, Any]], str] = document_hash):
+        """
+        Args:
+            path: Snapshot file; the journal is kept next to it with a .log suffix
+            id_field: Field holding the document id
+            hash_fn: Hash of a source document; a changed hash means re-index
+        """
+        self.path = Path(path)
+        self.journal_path = self.path.with_suffix(".log")
+        self.id_field = id_field
+        self.hash_fn = hash_fn
+        self.setup: Dict[str, Any] = {}
+        self.docs: Dict[str, str] = {}
+        self.skipped = 0
+        self.acknowledged = 0
+        self.deleted = 0
+        self._pending: Dict[str, str] = {}
+        self._seen = set()
+        self._lock = threading.Lock()
+
+        if self.path.exists():
+            snapshot = json.loads(self.path.read_text())
+            self.setup, self.docs = snapshot["setup"], snapshot["docs"]
+        if self.journal_path.exists():
+            self._replay()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+    def _replay(self):
+        with open(self.journal_path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # torn last line of a killed run
+                if "reset" in entry:
+                    self.setup, self.docs = {}, {}
+                if "invalidate" in entry:
+                    self.docs = dict.fromkeys(self.docs, STALE)
+                self.setup.update(entry.get("setup", {}))
+                self.docs.update(entry.get("indexed", {}))
+                for doc_id in entry.get("deleted", []):
+                    self.docs.pop(doc_id, None)
+
+    def _append(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._journal.write(json.dumps(entry) + "\n")
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def reset(self):
+        """Forget everything, e.g. because the core was recreated and holds nothing."""
+        self.setup, self.docs = {}, {}
+        self._append({"reset": True})
+
+    def invalidate(self):
+        """Treat every indexed document as changed, but remember which ids the core holds."""
+        with self._lock:
+            self.docs = dict.fromkeys(self.docs, STALE)
+        self._append({"invalidate": True})
+
+    def mark_setup(self, **steps):
+        """Record completed setup steps, e.g. ``mark_setup(schema={...})``."""
+        self.setup.update(steps)
+        self._append({"setup": steps})
+
+    def changed(self, docs: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield only the documents that are new or changed since they were last indexed."""
+        for doc in docs:
+            doc_id = str(doc[self.id_field])
+            digest = self.hash_fn(doc)
+            self._seen.add(doc_id)
+            if self.docs.get(doc_id) == digest:
+                self.skipped += 1
+                continue
+            with self._lock:
+                self._pending[doc_id] = digest
+            yield doc
+
+    def acknowledge(self, doc_ids: Sequence[str]):
+        """Checkpoint documents Solr has accepted; call once per acknowledged batch."""
+        with self._lock:
+            indexed = {doc_id: self._pending.pop(doc_id) for doc_id in map(str, doc_ids)
+                       if doc_id in self._pending}
+        self._append({"indexed": indexed})
+        with self._lock:
+            self.docs.update(indexed)
+            self.acknowledged += len(indexed)
+
+    def removed(self) -> List[str]:
+        """Indexed ids not seen in the source; only meaningful once changed() was fully consumed."""
+        return [doc_id for doc_id in self.docs if doc_id not in self._seen]
+
+    def forget(self, doc_ids: Sequence[str]):
+        """Record that documents were deleted from the core."""
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return
+        self._append({"deleted": doc_ids})
+        with self._lock:
+            for doc_id in doc_ids:
+                self.docs.pop(doc_id, None)
+            self.deleted += len(doc_ids)
+
+    def save(self):
+        """Fold the journal into the snapshot (atomically) and start a new journal."""
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"setup": self.setup, "docs": self.docs}))
+        os.replace(tmp, self.path)
+        with self._lock:
+            self._journal.close()
+            self._journal = open(self.journal_path, "w", encoding="utf-8")
+
+    def close(self):
+        self._journal.close()
+
+    def report(self) -> str:
+        return (f"{len(self.docs)} documents in manifest: {self.skipped} unchanged and skipped, "
+                f"{self.acknowledged} (re)indexed, {self.deleted} deleted")
@@ -0,0 +1,190 @@
+"""
+Streaming produce -> embed -> serialize -> post pipeline.
+
+Each stage runs in its own thread and hands chunks of documents to the next
+through a bounded queue, so at most ``queue_size`` chunks wait between any two
+stages. Memory stays flat no matter how many documents the source yields, and
+the BERT forward pass overlaps with JSON encoding and HTTP round trips.
+"""
+import queue
+import threading
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence
+
+import numpy as np
+
+from solrir.instrument import record, stage
+
+_DONE = object()
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Yield successive lists of at most ``size`` items."""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def embed_stage(embedder, text_field: str = "text", vector_field: str = "vector",
+                id_field: str = None) -> Callable:
+    """
+    Build a stage that adds ``vector_field`` to every document of a chunk.
+
+    When ``id_field`` is set the embedder is called as ``embed(texts, doc_ids)``,
+    which is what a store-backed ``CachedEmbedder`` expects. Vectors are stored as
+    float32 NumPy rows so an ``UpdateEncoder`` can format them without ``tolist()``.
+    """
+    def embed_chunk(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        texts = [doc[text_field] for doc in docs]
+        if id_field is None:
+            vectors = embedder.embed(texts)
+        else:
+            vectors = embedder.embed(texts, [str(doc[id_field]) for doc in docs])
+        for doc, vector in zip(docs, vectors):
+            doc[vector_field] = vector
+        return docs
+    return embed_chunk
+
+
+def quantize_stage(quantizer, vector_field: str = "vector", on_fit: Callable = None) -> Callable:
+    """
+    Build a stage that replaces ``vector_field`` with its int8 quantization.
+
+    An unfitted quantizer is calibrated on the first chunk it sees, and
+    ``on_fit(quantizer)`` is called so the calibration can be persisted.
+    """
+    def quantize_chunk(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        vectors = np.stack([np.asarray(doc[vector_field], dtype=np.float32) for doc in docs])
+        if not quantizer.fitted:
+            quantizer.fit(vectors)
+            if on_fit is not None:
+                on_fit(quantizer)
+        for doc, codes in zip(docs, quantizer.quantize(vectors)):
+            doc[vector_field] = codes
+        return docs
+    return quantize_chunk
+
+
+def project_stage(projection, vector_field: str = "vector") -> Callable:
+    """Build a stage that replaces ``vector_field`` with its reduced-dimension projection."""
+    def project_chunk(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        vectors = np.stack([np.asarray(doc[vector_field], dtype=np.float32) for doc in docs])
+        for doc, vector in zip(docs, projection.project(vectors)):
+            doc[vector_field] = vector
+        return docs
+    return project_chunk
+
+
+class StreamingPipeline:
+    """
+    Run chunks of documents through a chain of stages into a sink.
+    """
+    def __init__(self, stages: Sequence[Callable], sink: Callable, chunk_size: int = 256,
+                 queue_size: int = 2):
+        """
+        Args:
+            stages: Functions applied in order to each chunk, one thread each
+            sink: Called as ``sink(payload, num_docs)`` with the output of the last
+                stage, e.g. ``BulkIndexer.submit``
+            chunk_size: Documents per chunk
+            queue_size: Maximum chunks buffered between two adjacent stages
+        """
+        self.stages = list(stages)
+        self.sink = sink
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+        self.docs_processed = 0
+        self.chunks_processed = 0
+        self.seconds = 0.0
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+
+    def _put(self, q: queue.Queue, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue) -> Any:
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _worker(self, fn: Callable, inbox: queue.Queue, outbox: queue.Queue = None):
+        name = f"pipeline.{getattr(fn, '__name__', 'stage')}"
+        try:
+            while True:
+                item = self._get(inbox)
+                if item is _DONE:
+                    break
+                size, payload = item
+                if outbox is None:
+                    with stage(name, size):
+                        fn(payload, size)
+                    self.docs_processed += size
+                    self.chunks_processed += 1
+                    continue
+                with stage(name, size):
+                    result = fn(payload)
+                if not self._put(outbox, (size, result)):
+                    return
+        except BaseException as e:
+            self._errors.append(e)
+            self._stop.set()
+            return
+        if outbox is not None:
+            self._put(outbox, _DONE)
+
+    def run(self, docs: Iterable[Dict[str, Any]]) -> int:
+        """
+        Stream documents through all stages and return the number delivered to the sink.
+
+        The first exception raised by any stage stops the pipeline and is re-raised here.
+        """
+        start = time.perf_counter()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [
+            threading.Thread(target=self._worker, args=(fn, queues[i], queues[i + 1]), daemon=True)
+            for i, fn in enumerate(self.stages)
+        ]
+        threads.append(threading.Thread(target=self._worker, args=(self.sink, queues[-1]), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            chunks = chunked(docs, self.chunk_size)
+            while True:
+                # Time spent pulling documents from the source iterator
+                produce_start = time.perf_counter()
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                record("pipeline.produce", time.perf_counter() - produce_start, len(chunk), start=produce_start)
+                if not self._put(queues[0], (len(chunk), chunk)):
+                    break
+            self._put(queues[0], _DONE)
+        except BaseException:
+            self._stop.set()
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+            self.seconds += time.perf_counter() - start
+
+        if self._errors:
+            raise self._errors[0]
+        return self.docs_processed
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.docs_processed / self.seconds if self.seconds else 0.0
@@ -0,0 +1,172 @@
+"""
+Client-side cache of /select responses, invalidated by the index version.
+
+Solr's queryResultCache and filterCache are thrown away with every new
+searcher, and this tutorial's solrconfig.xml soft-commits every second with
+``autowarmCount="0"``, so they are cold after every ingest burst. This cache
+lives in the client instead: responses are keyed by the normalized request
+parameters, and the core's index version (from the Luke handler) is part of
+every key. The version is looked up at most once per ``version_interval``
+seconds; when it changes, every cached response is dropped.
+
+Entries are evicted least-recently-used first when ``max_entries`` or the
+``max_bytes`` memory budget is exceeded, and on lookup once older than
+``ttl`` seconds. Cached responses are shared between callers and must be
+treated as read-only.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional
+
+import requests
+
+
+def normalize_params(params: Dict[str, Any]) -> str:
+    """
+    Canonical form of request parameters.
+
+    Parameter order, runs of whitespace, empty values and the order or
+    repetition of ``fq`` clauses do not change a query's result, so they do not
+    change the key either.
+    """
+    items = []
+    for name, value in params.items():
+        values = list(value) if isinstance(value, (list, tuple)) else [value]
+        values = [" ".join(str(v).split()) for v in values if v is not None]
+        if not values:
+            continue
+        if name == "fq":
+            values = sorted(set(values))
+        items.append((name, values))
+    return json.dumps(sorted(items))
+
+
+class _Entry(NamedTuple):
+    response: Dict[str, Any]
+    size: int
+    created: float
+
+
+class ResultCache:
+    """
+    Bounded LRU + TTL cache of query responses for one index.
+    """
+    def __init__(self, version_fn: Callable[[], Hashable], max_entries: int = 10000,
+                 max_bytes: int = 64 * 1024 * 1024, ttl: float = 300.0, version_interval: float = 1.0):
+        """
+        Args:
+            version_fn: Returns the index's current version, e.g. IndexDocs.index_version
+            max_entries: Responses kept at most
+            max_bytes: Memory budget, measured as the responses' serialized JSON size
+            ttl: Seconds a response stays valid, even if the version did not change
+            version_interval: Seconds between index version lookups; 0 checks on every
+                request. Results may be this much staler than the index.
+        """
+        self.version_fn = version_fn
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version_interval = version_interval
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.bytes = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._version: Optional[Hashable] = None
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+        self._version_lock = threading.Lock()
+
+    def version(self) -> Optional[Hashable]:
+        """Current index version, refreshed at most once per version_interval; None if unknown."""
+        with self._version_lock:
+            now = time.monotonic()
+            if now - self._checked < self.version_interval:
+                return self._version
+            self._checked = now
+            try:
+                version = self.version_fn()
+            except (requests.exceptions.RequestException, KeyError, ValueError):
+                version = None
+            if version != self._version:
+                self.clear()
+                if self._version is not None:
+                    self.invalidations += 1
+                self._version = version
+            return version
+
+    def get_or_fetch(self, params: Dict[str, Any],
+                     fetch: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        """Return the cached response for ``params``, or fetch, cache and return it."""
+        version = self.version()
+        if version is None:
+            # Without a version a cached response could silently be stale
+            with self._lock:
+                self.bypassed += 1
+            return fetch(params)
+        key = hashlib.sha1(f"{version}\n{normalize_params(params)}".encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created > self.ttl:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.response
+            self.misses += 1
+        response = fetch(params)
+        size = len(json.dumps(response))
+        if size > self.max_bytes:
+            return response
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(response, size, time.monotonic())
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return response
+
+    def _remove(self, key: str):
+        self.bytes -= self._entries.pop(key).size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "bytes": self.bytes
+        }
+
+    def report(self) -> str:
+        return (f"{self.hits} hits, {self.misses} misses ({self.hit_rate:.0%} hit rate), "
+                f"{len(self._entries)} entries in {self.bytes / (1024 * 1024):.1f} MiB, "
+                f"{self.evictions} evicted, {self.expirations} expired, "
+                f"{self.invalidations} index version changes, {self.bypassed} bypassed")
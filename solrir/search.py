@@ -0,0 +1,280 @@
+"""
+Query-side client: kNN, BM25 and hybrid search over an indexed core.
+
+The embedding model is loaded once per process and query vectors are kept in
+a bounded LRU cache, so repeated queries skip the BERT forward pass. Hybrid
+search runs the kNN and BM25 queries concurrently and fuses the two rankings
+with reciprocal rank fusion (RRF). With a local ExactIndex over the indexed
+vectors, kNN candidates from Solr can be re-ranked by exact cosine, or small
+corpora can be searched exactly without Solr at all. An optional ResultCache
+keeps Solr's responses on the client until the index version changes.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from solrir.embedding import embed_text, load_model as _load_model
+from solrir.exact import ExactIndex
+from solrir.indexdocs import IndexDocs
+from solrir.resultcache import ResultCache
+from solrir.serialize import format_vectors
+from solrir.vectors import Int8Quantizer, PCAProjection
+
+if TYPE_CHECKING:
+    from solrir.sharding import ShardedIndex
+
+
+MODES = ("knn", "bm25", "hybrid", "knn-rerank", "exact")
+
+_models: Dict[Tuple[str, str], tuple] = {}
+_models_lock = threading.Lock()
+
+
+def load_model(model_name: str, inference: str = "fp32"):
+    """Load a tokenizer and model once per process and inference mode."""
+    with _models_lock:
+        if (model_name, inference) not in _models:
+            _models[model_name, inference] = _load_model(model_name, inference)
+        return _models[model_name, inference]
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache from query text to its embedding.
+    """
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, text: str, compute) -> np.ndarray:
+        key = " ".join(text.split())
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+        vector = np.asarray(compute(key), dtype=np.float32)
+        vector.flags.writeable = False
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return vector
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[Dict[str, Any]]], id_field: str = "id",
+                           k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked result lists: each document scores sum(1 / (k + rank)) over the lists.
+
+    Args:
+        rankings: Result lists, best first
+        id_field: Field identifying the same document across lists
+        k: RRF damping constant; 60 is the value from the original paper
+    """
+    fused: Dict[Any, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            entry = fused.setdefault(doc[id_field], {**doc, "rrf_score": 0.0})
+            entry["rrf_score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda doc: doc["rrf_score"], reverse=True)
+
+
+class SearchClient:
+    """
+    Run kNN, BM25 and hybrid queries against a core created by IndexDocs.
+    """
+    def __init__(self, index: Union[IndexDocs, "ShardedIndex"], model_name: str = "bert-base-uncased",
+                 vector_field: str = "vector", text_fields: Sequence[str] = ("title", "text"),
+                 id_field: str = "id", fl: str = "id,doc_id,title,score",
+                 cache_size: int = 1024, quantizer: Int8Quantizer = None,
+                 exact_index: ExactIndex = None, exact_id_field: str = "doc_id", embedder=None,
+                 result_cache: ResultCache = None, projection: PCAProjection = None,
+                 inference: str = "fp32", concurrency: int = 8):
+        """
+        Args:
+            index: IndexDocs for the core to query, or a ShardedIndex over several cores
+            model_name: Model used to embed queries; must match the indexed vectors
+            vector_field: Dense vector field for kNN queries
+            text_fields: Fields searched by BM25 queries
+            id_field: Unique key used to fuse kNN and BM25 results
+            fl: Fields returned for every hit
+            cache_size: Query embeddings kept in the LRU cache
+            quantizer: Calibration used at index time for byte-encoded vector profiles
+            exact_index: Local index of the document vectors for the knn-rerank and exact modes
+            exact_id_field: Solr field holding the ids used by ``exact_index``
+            embedder: Batch embedder for queries, e.g. an EmbeddingClient for a shared
+                embedding server; by default the model is loaded in this process
+            result_cache: Client-side cache of Solr responses, e.g. from
+                ``ResultCache(index.index_version)``; repeated queries against an
+                unchanged index then skip the round trip
+            projection: Dimensionality reduction the core's vectors were indexed with;
+                kNN query vectors are projected the same way (exact modes keep the
+                full vectors)
+            inference: Inference mode of the in-process model (see solrir.embedding);
+                queries are short, so only the mode matters, not the max length
+            concurrency: Searches expected in flight at once; sizes the hybrid thread
+                pool and the connection pool so concurrent callers do not queue on them
+        """
+        self.index = index
+        self.model_name = model_name
+        self.inference = inference
+        self.vector_field = vector_field
+        self.text_fields = tuple(text_fields)
+        self.id_field = id_field
+        self.fl = fl
+        self.quantizer = quantizer
+        self.projection = projection
+        self.exact_index = exact_index
+        self.exact_id_field = exact_id_field
+        self.embedder = embedder
+        self.result_cache = result_cache
+        self.embedding_cache = QueryEmbeddingCache(cache_size)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=2 * concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # One thread per concurrent hybrid search: its kNN leg runs there, BM25 on the caller's thread
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="hybrid")
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Embedding of a query, from the LRU cache when it was seen before."""
+        def compute(normalized: str) -> List[float]:
+            if self.embedder is not None:
+                return self.embedder.embed([normalized])[0]
+            tokenizer, model = load_model(self.model_name, self.inference)
+            return embed_text(normalized, tokenizer, model)
+        return self.embedding_cache.get_or_compute(text, compute)
+
+    def _select(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        # A ShardedIndex fans the request out and merges the shards' results
+        if self.result_cache is not None:
+            return self.result_cache.get_or_fetch(params, lambda p: self.index.select(p, session=self.session))
+        return self.index.select(params, session=self.session)
+
+    def knn_query(self, query: str, k: int = 10) -> str:
+        """The ``{!knn}`` query string for a text query."""
+        vector = self.embed_query(query)
+        if self.projection is not None:
+            vector = self.projection.project(vector)
+        if self.quantizer is not None:
+            vector = self.quantizer.quantize(vector)
+        return f"{{!knn f={self.vector_field} topK={k}}}{format_vectors(vector)[0]}"
+
+    def knn(self, query: str, k: int = 10, fq: Sequence[str] = ()) -> Dict[str, Any]:
+        """Approximate nearest-neighbour search over the vector field."""
+        return self._select({"q": self.knn_query(query, k), "rows": k, "fl": self.fl, "fq": list(fq)})
+
+    def bm25(self, query: str, k: int = 10, fq: Sequence[str] = ()) -> Dict[str, Any]:
+        """Keyword search with BM25 over the text fields."""
+        return self._select({
+            "q": query,
+            "defType": "edismax",
+            "qf": " ".join(self.text_fields),
+            "rows": k,
+            "fl": self.fl,
+            "fq": list(fq)
+        })
+
+    def hybrid(self, query: str, k: int = 10, candidates: int = None, rrf_k: int = 60,
+               fq: Sequence[str] = ()) -> List[Dict[str, Any]]:
+        """
+        Run kNN and BM25 concurrently and fuse them with reciprocal rank fusion.
+
+        Args:
+            query: Query text
+            k: Results returned
+            candidates: Results fetched from each side before fusion (default 2 x k)
+            rrf_k: RRF damping constant
+            fq: Filter queries applied to both sides
+        """
+        return self._hybrid(query, k, candidates, rrf_k, fq)[0]
+
+    def _hybrid(self, query: str, k: int, candidates: int = None, rrf_k: int = 60,
+                fq: Sequence[str] = ()) -> Tuple[List[Dict[str, Any]], int]:
+        candidates = candidates or 2 * k
+        knn = self._executor.submit(self.knn, query, candidates, fq)
+        bm25 = self.bm25(query, candidates, fq)
+        responses = [knn.result(), bm25]
+        rankings = [response["response"]["docs"] for response in responses]
+        # Both requests run at the same time, so Solr's share is the slower one
+        qtime = max(response["responseHeader"].get("QTime", 0) for response in responses)
+        return reciprocal_rank_fusion(rankings, id_field=self.id_field, k=rrf_k)[:k], qtime
+
+    def _require_exact_index(self) -> ExactIndex:
+        if self.exact_index is None:
+            raise ValueError("knn-rerank and exact modes need an ExactIndex over the document vectors")
+        return self.exact_index
+
+    def knn_rerank(self, query: str, k: int = 10, candidates: int = None,
+                   fq: Sequence[str] = ()) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Fetch kNN candidates from Solr and re-rank them by exact cosine.
+
+        Recovers the HNSW graph's (and int8 quantization's) ranking errors among
+        the candidates; Solr's own score is kept as ``knn_score``.
+
+        Args:
+            query: Query text
+            k: Results returned
+            candidates: Results fetched from Solr before re-ranking (default 4 x k)
+            fq: Filter queries
+        """
+        exact_index = self._require_exact_index()
+        response = self.knn(query, candidates or 4 * k, fq)
+        docs = {str(doc.get(self.exact_id_field)): doc for doc in response["response"]["docs"]}
+        reranked = exact_index.rerank(self.embed_query(query), list(docs), k)
+        hits = [{**docs[doc_id], "knn_score": docs[doc_id].get("score"), "score": score}
+                for doc_id, score in reranked]
+        return hits, response["responseHeader"].get("QTime", 0)
+
+    def exact(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        """Exact cosine top-k from the local index only; no Solr request is made."""
+        ids, scores = self._require_exact_index().search(self.embed_query(query), k)
+        return [{self.exact_id_field: doc_id, "score": float(score)} for doc_id, score in zip(ids[0], scores[0])]
+
+    def search_with_qtime(self, query: str, mode: str = "hybrid", k: int = 10,
+                          **kwargs) -> Tuple[List[Dict[str, Any]], int]:
+        """Like search(), but also return Solr's QTime in milliseconds."""
+        if mode == "hybrid":
+            return self._hybrid(query, k, **kwargs)
+        if mode == "knn-rerank":
+            return self.knn_rerank(query, k, **kwargs)
+        if mode == "exact":
+            return self.exact(query, k), 0
+        if mode == "knn":
+            response = self.knn(query, k, **kwargs)
+        elif mode == "bm25":
+            response = self.bm25(query, k, **kwargs)
+        else:
+            raise ValueError(f"Unknown search mode '{mode}', choose from {', '.join(MODES)}")
+        return response["response"]["docs"], response["responseHeader"].get("QTime", 0)
+
+    def search(self, query: str, mode: str = "hybrid", k: int = 10, **kwargs) -> List[Dict[str, Any]]:
+        """Return the hit list of a knn, bm25, hybrid, knn-rerank or exact query."""
+        return self.search_with_qtime(query, mode, k, **kwargs)[0]
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+        if self.embedder is not None:
+            self.embedder.close()
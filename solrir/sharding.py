@@ -0,0 +1,327 @@
+"""
+Client-side sharding over several independent cores or Solr nodes.
+
+Every document is routed to one shard by a stable hash of its id (CRC32, so
+the same id lands on the same shard in every process and on every run).
+Indexing runs one bulk indexer per shard in parallel; queries fan out to all
+shards concurrently and the per-shard top-k lists are merged by score.
+
+kNN scores are absolute similarities and merge exactly. BM25 scores use each
+shard's own term statistics; with hash routing the shards are statistically
+alike, so the merged keyword ranking is close to that of a single core (the
+same trade-off SolrCloud makes without distributed IDF).
+"""
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, zip_longest
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from solrir.bulk import BulkIndexError
+from solrir.commit import CommitPolicy
+from solrir.indexdocs import IndexDocs
+from solrir.serialize import UpdateEncoder
+from solrir.vectors import Int8Quantizer
+
+
+def shard_for(doc_id: Any, num_shards: int) -> int:
+    """Stable shard number of a document id."""
+    return zlib.crc32(str(doc_id).encode("utf-8")) % num_shards
+
+
+def merge_responses(responses: Sequence[Dict[str, Any]], rows: int, by_score: bool = True) -> Dict[str, Any]:
+    """
+    Merge per-shard /select responses into one.
+
+    Hits are merged by score (or interleaved when the query sorted on something
+    else), numFound and facet counts are summed and QTime is the slowest shard's.
+    """
+    ranked = [response["response"]["docs"] for response in responses]
+    if by_score:
+        docs = sorted(chain.from_iterable(ranked), key=lambda doc: doc.get("score", 0.0), reverse=True)
+    else:
+        docs = [doc for group in zip_longest(*ranked) for doc in group if doc is not None]
+    merged = {
+        "responseHeader": {
+            "QTime": max(response["responseHeader"].get("QTime", 0) for response in responses),
+            "shards": len(responses)
+        },
+        "response": {
+            "numFound": sum(response["response"]["numFound"] for response in responses),
+            "docs": docs[:rows]
+        }
+    }
+    facet_fields: Dict[str, Dict[str, int]] = {}
+    for response in responses:
+        for field, counts in response.get("facet_counts", {}).get("facet_fields", {}).items():
+            totals = facet_fields.setdefault(field, {})
+            for term, count in zip(counts[::2], counts[1::2]):
+                totals[term] = totals.get(term, 0) + count
+    if facet_fields:
+        merged["facet_counts"] = {"facet_fields": {
+            field: list(chain.from_iterable(sorted(totals.items(), key=lambda item: (-item[1], item[0]))))
+            for field, totals in facet_fields.items()
+        }}
+    return merged
+
+
+class ShardedIndex:
+    """
+    A set of cores used as shards of one logical index.
+
+    Offers the parts of the IndexDocs interface that make sense across shards,
+    so it can be passed to SearchClient in place of a single core.
+    """
+    def __init__(self, shards: Sequence[IndexDocs], id_field: str = "id"):
+        """
+        Args:
+            shards: One IndexDocs per shard; order defines the routing and must not change
+            id_field: Field whose value is hashed to pick a document's shard
+        """
+        if not shards:
+            raise ValueError("ShardedIndex needs at least one shard")
+        self.shards = list(shards)
+        self.id_field = id_field
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.shards), pool_maxsize=4 * len(self.shards))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=2 * len(self.shards), thread_name_prefix="shards")
+
+    @classmethod
+    def from_urls(cls, core_urls: Iterable[str], id_field: str = "id") -> "ShardedIndex":
+        """Build from core URLs such as http://node1:8983/solr/docs_shard1."""
+        shards = []
+        for url in core_urls:
+            solr_url, core_name = url.rstrip("/").rsplit("/", 1)
+            shards.append(IndexDocs(solr_url=solr_url, core_name=core_name))
+        return cls(shards, id_field=id_field)
+
+    @property
+    def core_name(self) -> str:
+        return ",".join(shard.core_name for shard in self.shards)
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def _each(self, fn, *args, **kwargs) -> List[Any]:
+        """Call fn(shard, ...) for every shard in parallel; results in shard order."""
+        return list(self._executor.map(lambda shard: fn(shard, *args, **kwargs), self.shards))
+
+    def route(self, docs: Iterable[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Split documents into one list per shard."""
+        routed: List[List[Dict[str, Any]]] = [[] for _ in self.shards]
+        for doc in docs:
+            routed[shard_for(doc[self.id_field], len(self.shards))].append(doc)
+        return routed
+
+    def create_core(self, config_set: str = "_default"):
+        """Create the shard cores that do not exist yet."""
+        return self._each(lambda shard: None if shard.core_exists() else shard.create_core(config_set))
+
+    def core_exists(self) -> bool:
+        return all(self._each(IndexDocs.core_exists))
+
+    def define_schema(self, vector_dimension: int = 768, profile: str = "default") -> bool:
+        return all(self._each(IndexDocs.define_schema, vector_dimension, profile))
+
+    def add_schema(self, field_types: Sequence[Dict[str, Any]] = (), fields: Sequence[Dict[str, Any]] = ()) -> bool:
+        return all(self._each(IndexDocs.add_schema, field_types, fields))
+
+    def commit_policy(self, mode: str = "soft", **kwargs) -> "ShardedCommitPolicy":
+        """
+        Create a commit policy for a bulk load into every shard.
+
+        Args:
+            mode: hard, soft, within or auto (see solrir/commit.py)
+            **kwargs: Passed to each shard's CommitPolicy
+        """
+        return ShardedCommitPolicy([shard.commit_policy(mode, **kwargs) for shard in self.shards],
+                                   self._executor)
+
+    def index_documents(self, documents: List[Dict[str, Any]], batch_size: int = 500,
+                        workers: int = 4, encoder: UpdateEncoder = None,
+                        quantizer: Int8Quantizer = None,
+                        commit_policy: "ShardedCommitPolicy" = None) -> List[Dict[str, float]]:
+        """
+        Route documents and index every shard in parallel, then commit each shard.
+
+        Args:
+            documents: List of documents
+            batch_size: Documents per update request
+            workers: Update requests in flight per shard
+            encoder: Compact vector encoder, shared by all shards
+            quantizer: Int8 quantizer for byte-encoded vector profiles; an unfitted
+                one is calibrated on the first batch before routing, so every shard
+                uses the same scale
+            commit_policy: From commit_policy(); defaults to soft commits per shard
+
+        Returns:
+            Per-shard bulk indexer stats, in shard order (None for a failed shard)
+        """
+        if quantizer is not None and not quantizer.fitted and documents:
+            quantizer.fit(np.stack([np.asarray(doc["vector"], dtype=np.float32)
+                                    for doc in documents[:batch_size]]))
+        policies = (commit_policy or self.commit_policy()).policies
+        with ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard-index") as pool:
+            futures = [
+                pool.submit(shard.index_documents, docs, batch_size=batch_size, workers=workers,
+                            encoder=encoder, quantizer=quantizer, commit_policy=policy)
+                for shard, docs, policy in zip(self.shards, self.route(documents), policies)
+            ]
+            return [future.result() for future in futures]
+
+    def delete_documents(self, ids: List[str], batch_size: int = 1000,
+                         commit_policy: "ShardedCommitPolicy" = None) -> int:
+        """Delete documents by unique key from the shards that hold them."""
+        routed: List[List[str]] = [[] for _ in self.shards]
+        for doc_id in ids:
+            routed[shard_for(doc_id, len(self.shards))].append(doc_id)
+        policies = commit_policy.policies if commit_policy is not None else [None] * len(self.shards)
+        return sum(self._executor.map(
+            lambda shard, shard_ids, policy:
+                shard.delete_documents(shard_ids, batch_size=batch_size, commit_policy=policy)
+                if shard_ids else 0,
+            self.shards, routed, policies
+        ))
+
+    def select(self, params: Dict[str, Any], session: requests.Session = None) -> Dict[str, Any]:
+        """
+        Run a /select request on every shard concurrently and merge the results.
+
+        Each shard returns its own top ``rows``; the merged response keeps the
+        best ``rows`` overall.
+        """
+        params = dict(params)
+        rows = int(params.get("rows", 10))
+        sort = str(params.get("sort", "score desc")).strip()
+        by_score = sort.startswith("score") and sort.endswith("desc")
+        fl = params.get("fl")
+        if by_score and fl and "score" not in fl.split(","):
+            params["fl"] = f"{fl},score"
+
+        def query(shard: IndexDocs) -> Dict[str, Any]:
+            return shard.select(params, session=self.session)
+
+        return merge_responses(self._each(query), rows, by_score=by_score)
+
+    def index_version(self, session: requests.Session = None) -> Tuple[int, ...]:
+        """Index versions of all shards; changes when any shard's does."""
+        return tuple(self._each(IndexDocs.index_version, session or self.session))
+
+    def cache_metrics(self, cache: str = "filterCache", session: requests.Session = None) -> Optional[Dict[str, float]]:
+        """A searcher cache's counters summed over all shards; None if any shard's are unavailable."""
+        metrics = self._each(IndexDocs.cache_metrics, cache, session or self.session)
+        if any(m is None for m in metrics):
+            return None
+        totals = {name: sum(m.get(name, 0) for m in metrics)
+                  for name in metrics[0] if isinstance(metrics[0][name], (int, float))}
+        for prefix in ("", "cumulative_"):
+            lookups = totals.get(f"{prefix}lookups", 0)
+            totals[f"{prefix}hitratio"] = totals.get(f"{prefix}hits", 0) / lookups if lookups else 0.0
+        return totals
+
+    def bulk_indexer(self, encoder: UpdateEncoder = None, commit_policy: "ShardedCommitPolicy" = None,
+                     **kwargs) -> "ShardedBulkIndexer":
+        """Create a bulk indexer that routes every submitted chunk across the shards."""
+        return ShardedBulkIndexer(self, encoder, commit_policy, **kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+
+class ShardedCommitPolicy:
+    """
+    One CommitPolicy per shard, driven together; commits are issued on all shards in parallel.
+    """
+    def __init__(self, policies: Sequence[CommitPolicy], executor: ThreadPoolExecutor = None):
+        self.policies = list(policies)
+        self._executor = executor
+
+    def _each(self, fn):
+        if self._executor is None:
+            return [fn(policy) for policy in self.policies]
+        return list(self._executor.map(fn, self.policies))
+
+    def batch_params(self) -> Dict[str, str]:
+        """Per-batch parameters; the same for every shard."""
+        return self.policies[0].batch_params()
+
+    def tick(self):
+        self._each(CommitPolicy.tick)
+
+    def finish(self):
+        self._each(CommitPolicy.finish)
+
+    def report(self) -> str:
+        return "\n  ".join(f"shard {policy.core_name}: {policy.report()}" for policy in self.policies)
+
+
+class ShardedBulkIndexer:
+    """
+    One BulkIndexer per shard behind a single submit() that takes document lists.
+    """
+    def __init__(self, index: ShardedIndex, encoder: UpdateEncoder = None,
+                 commit_policy: ShardedCommitPolicy = None, **kwargs):
+        """
+        Args:
+            index: The sharded index
+            encoder: Encoder for the per-shard bodies (default: UpdateEncoder())
+            commit_policy: From ShardedIndex.commit_policy(), for per-batch commit parameters
+            **kwargs: Passed to every BulkIndexer (workers is per shard)
+        """
+        self.index = index
+        self.encoder = encoder or UpdateEncoder()
+        policies = commit_policy.policies if commit_policy is not None else [None] * len(index)
+        self.indexers = [shard.bulk_indexer(self.encoder, policy, **kwargs)
+                         for shard, policy in zip(index.shards, policies)]
+
+    def submit(self, docs: List[Dict[str, Any]]):
+        """
+        Route a chunk of documents and queue one batch per non-empty shard.
+
+        Returns the per-shard futures. Raises BulkIndexError if a shard already failed.
+        """
+        return [indexer.submit(self.encoder.encode(shard_docs), len(shard_docs))
+                for indexer, shard_docs in zip(self.indexers, self.index.route(docs)) if shard_docs]
+
+    def flush(self):
+        errors = []
+        for indexer in self.indexers:
+            try:
+                indexer.flush()
+            except BulkIndexError as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def close(self):
+        errors = []
+        for indexer in self.indexers:
+            try:
+                indexer.close()
+            except BulkIndexError as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for indexer in self.indexers:
+                indexer.__exit__(exc_type, exc, tb)
+
+    def stats(self) -> List[Dict[str, float]]:
+        return [indexer.stats() for indexer in self.indexers]
+
+    def report(self) -> str:
+        return "\n  ".join(f"shard {shard.core_name}: {indexer.report()}"
+                         for shard, indexer in zip(self.index.shards, self.indexers))
@@ -0,0 +1,217 @@
+"""
+Persistent, memory-mapped embedding store.
+
+Vectors for one model live in a flat float32 file (``vectors.f32``) that is
+opened with ``np.memmap`` and only ever appended to. A JSON index maps each
+doc_id to its row and the hash of the text it was computed from, so a rerun
+only embeds documents that are new or whose text changed. Superseded rows
+stay in the file until :meth:`EmbeddingStore.compact` rewrites it.
+
+Compaction writes a new generation of the vector file (``vectors.<n>.f32``)
+and switches to it by atomically replacing the index, which names the file
+its rows refer to. A crash at any point leaves an index that matches its
+vector file; at worst an unreferenced generation is left behind, and the next
+compaction removes it.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of a document's text."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Append-only float32 vector matrix plus a doc_id -> (row, content hash) index.
+    """
+    def __init__(self, root: str, model_name: str, dimension: int):
+        """
+        Args:
+            root: Directory holding one sub-directory per model
+            model_name: Embedding model name; vectors of different models never mix
+            dimension: Vector dimension, checked against an existing store
+        """
+        self.model_name = model_name
+        self.dimension = dimension
+        self.dir = Path(root) / model_name.replace("/", "__")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.dir / "index.json"
+        self.generation = 0
+        self.index: Dict[str, List] = {}
+        self._matrix = None
+        self.hits = 0
+        self.misses = 0
+
+        if self.index_path.exists():
+            meta = json.loads(self.index_path.read_text())
+            if meta["dimension"] != dimension:
+                raise ValueError(
+                    f"Store at {self.dir} holds {meta['dimension']}-dim vectors, not {dimension}"
+                )
+            self.index = meta["docs"]
+            # Stores written before compaction kept generations have none: generation 0
+            self.generation = meta.get("generation", 0)
+        self.vectors_path = self._vectors_file(self.generation)
+        self.vectors_path.touch()
+        # Rows appended after the last save() are unreferenced until compact();
+        # a partial trailing row left by a crash is overwritten by the next append.
+        self.rows = self.vectors_path.stat().st_size // self._row_bytes
+
+    def _vectors_file(self, generation: int) -> Path:
+        return self.dir / ("vectors.f32" if generation == 0 else f"vectors.{generation}.f32")
+
+    @property
+    def _row_bytes(self) -> int:
+        return self.dimension * 4
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Read-only memory map over every row written so far."""
+        if self._matrix is None or len(self._matrix) != self.rows:
+            if self.rows == 0:
+                return np.empty((0, self.dimension), dtype=np.float32)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                     shape=(self.rows, self.dimension))
+        return self._matrix
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get(self, doc_id: str, text_hash: str) -> Optional[np.ndarray]:
+        """Return a zero-copy view of the stored vector, or None if missing or stale."""
+        entry = self.index.get(doc_id)
+        if entry is None or entry[1] != text_hash:
+            return None
+        return self.matrix[entry[0]]
+
+    def lookup(self, doc_ids: Sequence[str], hashes: Sequence[str]) -> np.ndarray:
+        """Return the row of each doc, or -1 where it is missing or stale."""
+        rows = np.full(len(doc_ids), -1, dtype=np.int64)
+        for i, (doc_id, text_hash) in enumerate(zip(doc_ids, hashes)):
+            entry = self.index.get(doc_id)
+            if entry is not None and entry[1] == text_hash:
+                rows[i] = entry[0]
+        return rows
+
+    def append(self, doc_ids: Sequence[str], hashes: Sequence[str], vectors: np.ndarray):
+        """Append vectors and point their doc_ids at the new rows."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(doc_ids), self.dimension):
+            raise ValueError(f"Expected shape {(len(doc_ids), self.dimension)}, got {vectors.shape}")
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(self.rows * self._row_bytes)
+            f.write(vectors.tobytes())
+        for i, (doc_id, text_hash) in enumerate(zip(doc_ids, hashes)):
+            self.index[doc_id] = [self.rows + i, text_hash]
+        self.rows += len(doc_ids)
+
+    def embed(self, doc_ids: Sequence[str], texts: Sequence[str],
+              embed_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Return vectors for texts, computing only those not already stored.
+
+        Args:
+            doc_ids: Document ids, parallel to texts
+            texts: Document texts
+            embed_fn: Called with the list of missing texts only; may not be called at all
+        """
+        hashes = [content_hash(text) for text in texts]
+        rows = self.lookup(doc_ids, hashes)
+        hit = rows >= 0
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        if hit.any():
+            vectors[hit] = self.matrix[rows[hit]]
+        missing = np.flatnonzero(~hit)
+        if len(missing):
+            computed = embed_fn([texts[i] for i in missing])
+            vectors[missing] = computed
+            self.append([doc_ids[i] for i in missing], [hashes[i] for i in missing], computed)
+        self.hits += int(hit.sum())
+        self.misses += len(missing)
+        return vectors
+
+    def save(self):
+        """Atomically write the index; vectors are already on disk."""
+        tmp = self.index_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({
+                "model": self.model_name,
+                "dimension": self.dimension,
+                "generation": self.generation,
+                "docs": self.index
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.index_path)
+
+    def compact(self) -> int:
+        """Rewrite the vector file with live rows only; return the number of rows dropped."""
+        old_path = self.vectors_path
+        new_path = self._vectors_file(self.generation + 1)
+        # Generations other than the current one are leftovers of an interrupted compaction
+        for path in self.dir.glob("vectors*.f32"):
+            if path != old_path:
+                path.unlink()
+        entries = sorted(self.index.values(), key=lambda entry: entry[0])
+        old_rows = np.fromiter((entry[0] for entry in entries), dtype=np.int64, count=len(entries))
+        matrix = self.matrix
+        with open(new_path, "wb") as f:
+            for start in range(0, len(old_rows), 65536):
+                f.write(np.ascontiguousarray(matrix[old_rows[start:start + 65536]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self._matrix = None
+        del matrix
+        for new_row, entry in enumerate(entries):
+            entry[0] = new_row
+        dropped = self.rows - len(entries)
+        self.generation += 1
+        self.vectors_path = new_path
+        self.rows = len(entries)
+        # index.json names the old file until this replaces it, so a crash before then
+        # leaves the old index with the old rows; only then is the old file removed
+        self.save()
+        old_path.unlink()
+        return dropped
+
+
+class CachedEmbedder:
+    """
+    Embed documents through an EmbeddingStore, loading the model only on a miss.
+    """
+    def __init__(self, store: EmbeddingStore, load_embedder: Callable):
+        """
+        Args:
+            store: Store to read from and append to
+            load_embedder: Zero-argument factory for the underlying batch embedder
+        """
+        self.store = store
+        self.load_embedder = load_embedder
+        self.embedder = None
+
+    def _embed_missing(self, texts: List[str]) -> np.ndarray:
+        if self.embedder is None:
+            self.embedder = self.load_embedder()
+        return self.embedder.embed(texts)
+
+    def embed(self, texts: Sequence[str], doc_ids: Sequence[str]) -> np.ndarray:
+        """Embed texts; call ``store.save()`` once the run is done to persist the index."""
+        return self.store.embed(doc_ids, texts, self._embed_missing)
+
+    def close(self):
+        """Release the underlying embedder if it was ever loaded."""
+        if self.embedder is not None:
+            self.embedder.close()
+
+    def report(self) -> str:
+        line = f"{self.store.hits} from store, {self.store.misses} computed"
+        if self.embedder is not None:
+            line += f"; {self.embedder.report()}"
+        return line
@@ -0,0 +1,213 @@
+"""
+Vector field profiles and client-side int8 quantization.
+
+A profile bundles everything Solr needs to build the HNSW graph for a dense
+vector field: similarity, float vs. byte encoding and the graph parameters.
+Byte-encoded profiles store one signed byte per dimension instead of four,
+so vectors must be quantized before indexing and at query time with the same
+calibration; ``Int8Quantizer`` does that with one scale per collection.
+
+``PCAProjection`` reduces the vector dimension before indexing. HNSW memory,
+index size and kNN latency grow about linearly with the dimension, so a
+projection fitted on a corpus sample trades a little recall for all three;
+like the quantizer it must be applied identically to documents and queries.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+import numpy as np
+
+
+class VectorProfile(NamedTuple):
+    name: str
+    similarity: str = "cosine"
+    encoding: str = "FLOAT32"
+    max_connections: int = 16
+    beam_width: int = 100
+
+    @property
+    def is_byte(self) -> bool:
+        return self.encoding == "BYTE"
+
+    @property
+    def field_type_name(self) -> str:
+        return "knn_vector" if self.name == "default" else f"knn_vector_{self.name.replace('-', '_')}"
+
+    def field_type(self, dimension: int) -> Dict[str, Any]:
+        """Schema API definition of a DenseVectorField for this profile."""
+        return {
+            "name": self.field_type_name,
+            "class": "solr.DenseVectorField",
+            "vectorDimension": dimension,
+            "similarityFunction": self.similarity,
+            "vectorEncoding": self.encoding,
+            "knnAlgorithm": "hnsw",
+            "hnswMaxConnections": self.max_connections,
+            "hnswBeamWidth": self.beam_width
+        }
+
+
+PROFILES: Dict[str, VectorProfile] = {
+    profile.name: profile for profile in [
+        # Solr's defaults; what define_schema always used
+        VectorProfile("default"),
+        # Cheaper graph: faster indexing and less RAM, lower recall
+        VectorProfile("fast", max_connections=8, beam_width=50),
+        # Denser graph: better recall at the cost of indexing time and RAM
+        VectorProfile("high-recall", max_connections=32, beam_width=200),
+        # One byte per dimension, ~4x smaller vectors; needs Int8Quantizer
+        VectorProfile("byte", encoding="BYTE"),
+        VectorProfile("byte-high-recall", encoding="BYTE", max_connections=32, beam_width=200),
+    ]
+}
+
+
+def get_profile(name: str) -> VectorProfile:
+    """Look up a profile by name."""
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown vector profile '{name}', choose from {', '.join(PROFILES)}") from None
+
+
+class Int8Quantizer:
+    """
+    Symmetric int8 quantization with one scale per collection.
+
+    A single scale (rather than one per dimension) keeps cosine and dot-product
+    rankings of the quantized vectors close to those of the float vectors.
+    """
+    def __init__(self, scale: float = None, percentile: float = 99.9):
+        """
+        Args:
+            scale: Multiplier from float to int8 units; set by fit() when None
+            percentile: Percentile of |x| mapped to 127 during calibration; values
+                beyond it are clipped
+        """
+        self.scale = scale
+        self.percentile = percentile
+
+    @property
+    def fitted(self) -> bool:
+        return self.scale is not None
+
+    def fit(self, sample: np.ndarray) -> "Int8Quantizer":
+        """Calibrate the scale on a sample of the collection's vectors."""
+        limit = float(np.percentile(np.abs(np.asarray(sample, dtype=np.float32)), self.percentile))
+        self.scale = 127.0 / limit if limit > 0 else 1.0
+        return self
+
+    def quantize(self, vectors: np.ndarray) -> np.ndarray:
+        """Map float vectors to int8."""
+        if not self.fitted:
+            raise ValueError("Int8Quantizer must be fitted before quantizing")
+        scaled = np.rint(np.asarray(vectors, dtype=np.float32) * self.scale)
+        return np.clip(scaled, -127, 127).astype(np.int8)
+
+    def dequantize(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate float vectors from int8 codes."""
+        return np.asarray(codes, dtype=np.float32) / self.scale
+
+    def save(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(path).with_suffix(".tmp")
+        tmp.write_text(json.dumps({"scale": self.scale, "percentile": self.percentile}))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path) -> Optional["Int8Quantizer"]:
+        """Load a saved calibration, or return None if there is none yet."""
+        if not Path(path).exists():
+            return None
+        meta = json.loads(Path(path).read_text())
+        return cls(scale=meta["scale"], percentile=meta["percentile"])
+
+
+class PCAProjection:
+    """
+    Projection onto the top principal components of a corpus sample.
+
+    The components come from the SVD of the uncentered sample: kNN ranks by
+    cosine of the raw vectors, and the uncentered subspace keeps those
+    similarities best (centering would drop the shared mean direction that
+    dominates BERT embeddings). Projected vectors are L2-normalized, so cosine
+    and dot-product similarity rank them the same way. ``truncation()`` builds
+    the trivial projection that keeps the first dimensions, for comparison.
+    """
+    def __init__(self, dimension: int, components: np.ndarray = None,
+                 explained_variance_ratio: np.ndarray = None):
+        """
+        Args:
+            dimension: Target dimension
+            components: (dimension, input dimension) projection matrix; set by fit()
+            explained_variance_ratio: Share of the sample's energy per component, for reporting
+        """
+        self.dimension = dimension
+        self.components = components
+        self.explained_variance_ratio = explained_variance_ratio
+
+    @property
+    def fitted(self) -> bool:
+        return self.components is not None
+
+    @property
+    def explained_variance(self) -> Optional[float]:
+        """Share of the sample's (uncentered) variance the projection keeps."""
+        if self.explained_variance_ratio is None:
+            return None
+        return float(self.explained_variance_ratio.sum())
+
+    def fit(self, sample: np.ndarray) -> "PCAProjection":
+        """Fit the components on a (rows, input dimension) sample with at least ``dimension`` rows."""
+        sample = np.asarray(sample, dtype=np.float64)
+        if sample.shape[0] < self.dimension:
+            raise ValueError(f"PCA to {self.dimension} dimensions needs at least {self.dimension} "
+                             f"sample vectors, got {sample.shape[0]}")
+        # Rows are normalized first, as cosine ignores their length
+        sample = sample / np.maximum(np.linalg.norm(sample, axis=1, keepdims=True), 1e-12)
+        _, singular, vt = np.linalg.svd(sample, full_matrices=False)
+        variance = singular ** 2
+        self.components = vt[:self.dimension].astype(np.float32)
+        self.explained_variance_ratio = (variance[:self.dimension] / variance.sum()).astype(np.float32)
+        return self
+
+    def truncated(self, dimension: int) -> "PCAProjection":
+        """The same projection keeping only the first ``dimension`` components (no refit needed)."""
+        if not self.fitted or dimension > self.dimension:
+            raise ValueError(f"Cannot truncate a {self.dimension}-dimension projection to {dimension}")
+        ratio = self.explained_variance_ratio
+        return PCAProjection(dimension, self.components[:dimension], None if ratio is None else ratio[:dimension])
+
+    @classmethod
+    def truncation(cls, input_dimension: int, dimension: int) -> "PCAProjection":
+        """Keep the first ``dimension`` dimensions as they are."""
+        return cls(dimension, np.eye(dimension, input_dimension, dtype=np.float32))
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        """Project one vector or a (rows, input dimension) matrix; returns float32."""
+        if not self.fitted:
+            raise ValueError("PCAProjection must be fitted before projecting")
+        projected = np.asarray(vectors, dtype=np.float32) @ self.components.T
+        norms = np.linalg.norm(projected, axis=-1, keepdims=True)
+        return projected / np.where(norms > 0, norms, 1.0)
+
+    def save(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(path).with_suffix(".tmp.npz")
+        arrays = {"components": self.components}
+        if self.explained_variance_ratio is not None:
+            arrays["explained_variance_ratio"] = self.explained_variance_ratio
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path) -> Optional["PCAProjection"]:
+        """Load a saved projection, or return None if there is none yet."""
+        if not Path(path).exists():
+            return None
+        with np.load(path) as data:
+            components = data["components"]
+            ratio = data["explained_variance_ratio"] if "explained_variance_ratio" in data else None
+            return cls(components.shape[0], components, ratio)
@@ -0,0 +1,22 @@
+import time
+
+import pytest
+
+from solrir.fakesolr import FakeSolr
+
+
+@pytest.fixture
+def solr():
+    """A FakeSolr with one core, "docs"; without auto soft commits updates wait for a commit."""
+    with FakeSolr(cores=["docs"], auto_soft_commit_ms=None, seed=7) as server:
+        yield server
+
+
+def wait_until(condition, timeout: float = 5.0) -> bool:
+    """Poll ``condition`` until it holds or ``timeout`` seconds passed."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
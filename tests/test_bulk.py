@@ -0,0 +1,48 @@
+import pytest
+
+from solrir.bulk import BulkIndexError, BulkIndexer
+
+DOCS = [{"id": str(i), "title": f"doc {i}"} for i in range(200)]
+
+
+def index(solr, docs=DOCS, **kwargs):
+    kwargs.setdefault("max_retries", 20)
+    indexer = BulkIndexer(f"{solr.url}/docs/update/json/docs", workers=4, backoff=0.001,
+                          params={"commit": "true"}, **kwargs)
+    with indexer:
+        for start in range(0, len(docs), 10):
+            indexer.submit(docs[start:start + 10])
+    return indexer
+
+
+@pytest.mark.parametrize("failure_status", [503, 0], ids=["503", "dropped-connection"])
+def test_transient_failures_are_retried(solr, failure_status):
+    solr.failure_rate = 0.3
+    solr.failure_status = failure_status
+    indexer = index(solr)
+
+    assert indexer.retries == solr.failures["update/json/docs"] > 0
+    assert indexer.failures == 0
+    assert indexer.docs == len(DOCS)
+    assert set(solr.core("docs").docs) == {doc["id"] for doc in DOCS}
+
+
+def test_batch_fails_after_max_retries(solr):
+    solr.failure_rate = 1.0
+    with pytest.raises(BulkIndexError):
+        index(solr, DOCS[:10], max_retries=3)
+    assert solr.requests["update/json/docs"] == 4
+    assert not solr.core("docs").docs
+
+
+def test_client_errors_are_not_retried(solr):
+    indexer = BulkIndexer(f"{solr.url}/docs/update/json/docs", backoff=0.001)
+    indexer.submit([{"title": "no id"}])
+    with pytest.raises(BulkIndexError):
+        indexer.close()
+    assert indexer.retries == 0
+    assert solr.requests["update/json/docs"] == 1
+
+    # Once a batch has failed for good, further batches are refused
+    with pytest.raises(BulkIndexError):
+        indexer.submit(DOCS[:1])
@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from conftest import wait_until
+from solrir.commit import CommitPolicy
+from solrir.fakesolr import FakeSolr
+from solrir.indexdocs import IndexDocs
+
+DOCS = [{"id": str(i)} for i in range(50)]
+
+
+def load(solr, policy, docs=DOCS):
+    """Index docs with the policy's batch parameters, ticking after every batch."""
+    index = IndexDocs(solr.url, "docs")
+    with index.bulk_indexer(commit_policy=policy, workers=2) as indexer:
+        for start in range(0, len(docs), 10):
+            indexer.submit(docs[start:start + 10])
+            policy.tick()
+    return index
+
+
+def visible(index) -> int:
+    return index.select({"q": "*:*", "rows": 0})["response"]["numFound"]
+
+
+def kinds(policy):
+    return [timing["kind"] for timing in policy.timings]
+
+
+def test_hard_commits_once_after_the_load(solr):
+    policy = CommitPolicy(f"{solr.url}/docs", mode="hard")
+    assert policy.batch_params() == {"commit": "false"}
+    index = load(solr, policy)
+    assert visible(index) == 0
+
+    policy.finish()
+    assert visible(index) == len(DOCS)
+    assert kinds(policy) == ["hard-commit"]
+
+
+def test_soft_commits_during_the_load_and_hard_commits_at_the_end(solr):
+    policy = CommitPolicy(f"{solr.url}/docs", mode="soft", soft_commit_every=0.01)
+    index = load(solr, policy, DOCS[:10])
+    assert visible(index) == 0
+    time.sleep(0.02)
+    policy.tick()
+    assert visible(index) == 10
+
+    policy.finish()
+    assert kinds(policy) == ["soft-commit", "hard-commit"]
+
+
+def test_soft_commits_can_be_disabled(solr):
+    policy = CommitPolicy(f"{solr.url}/docs", mode="soft", soft_commit_every=0)
+    index = load(solr, policy)
+    assert visible(index) == 0
+    policy.finish()
+    assert kinds(policy) == ["hard-commit"]
+
+
+def test_within_leaves_commits_to_solr(solr):
+    policy = CommitPolicy(f"{solr.url}/docs", mode="within", commit_within_ms=50)
+    assert policy.batch_params() == {"commitWithin": "50"}
+    index = load(solr, policy)
+    assert wait_until(lambda: visible(index) == len(DOCS))
+
+    policy.finish()
+    assert policy.timings == []
+
+
+def test_auto_relies_on_auto_soft_commit():
+    with FakeSolr(cores=["docs"], auto_soft_commit_ms=50) as solr:
+        policy = CommitPolicy(f"{solr.url}/docs", mode="auto")
+        assert policy.batch_params() == {}
+        index = load(solr, policy)
+        assert wait_until(lambda: visible(index) == len(DOCS))
+
+        policy.finish()
+        assert policy.timings == []
+
+
+def test_optimize_after_the_load(solr):
+    policy = CommitPolicy(f"{solr.url}/docs", mode="hard", optimize_segments=1)
+    load(solr, policy)
+    policy.finish()
+    assert kinds(policy) == ["hard-commit", "optimize"]
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        CommitPolicy("http://localhost:8983/solr/docs", mode="sometimes")
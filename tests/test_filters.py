@@ -0,0 +1,101 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from solrir.filters import FilteredKnnSearch, VectorFilter
+from solrir.indexdocs import IndexDocs
+
+FIELD_TYPES = [{"name": "knn_vector_8", "class": "solr.DenseVectorField", "vectorDimension": 8,
+                "similarityFunction": "cosine"}]
+FIELDS = [
+    {"name": "content_vector", "type": "knn_vector_8"},
+    {"name": "category", "type": "string"},
+    {"name": "tags", "type": "strings"},
+    {"name": "created_date", "type": "pdate"},
+]
+CATEGORIES = ["Science", "Sports", "Travel", "Health"]
+
+
+@pytest.fixture
+def index(solr):
+    rng = np.random.default_rng(3)
+    vectors = rng.standard_normal((400, 8)).astype(np.float32)
+    docs = [{
+        "id": f"doc{i}",
+        "content_vector": vector.tolist(),
+        "category": CATEGORIES[i % 4],
+        "tags": ["ai", "data"] if i % 3 == 0 else ["ai"],
+        "created_date": f"2026-{1 + i % 12:02d}-15T12:00:00Z",
+    } for i, vector in enumerate(vectors)]
+    index = IndexDocs(solr.url, "docs")
+    assert index.add_schema(FIELD_TYPES, FIELDS)
+    index.index_documents(docs, commit_policy=index.commit_policy("hard"))
+    return index, docs, vectors
+
+
+def exact_top_k(docs, vectors, query, filters, k):
+    scores = vectors @ query / np.linalg.norm(vectors, axis=1)
+    ranked = [docs[i] for i in np.argsort(-scores)]
+    return [doc["id"] for doc in ranked if filters.matches(doc)][:k]
+
+
+def test_clauses_are_canonical():
+    a = VectorFilter(categories=["Travel", "Science"], tags=["data", "ai"], since="2026-03-01T17:45:00Z")
+    b = VectorFilter(categories=["Science", "Travel", "Science"], tags=["ai", "data"], since=date(2026, 3, 1))
+    assert a.clauses() == b.clauses() == [
+        "{!terms f=category}Science,Travel",
+        "{!term f=tags}ai",
+        "{!term f=tags}data",
+        "created_date:[2026-03-01T00:00:00Z TO *}",
+    ]
+
+
+def test_pre_filtering_returns_the_exact_filtered_neighbours(index):
+    core, docs, vectors = index
+    query = vectors[0]
+    filters = VectorFilter(categories=["Science", "Travel"], tags=["data"], since="2026-06-01")
+    search = FilteredKnnSearch(core, vector_field="content_vector", fl="id,category,tags,created_date,score")
+    hits, _ = search.search(query, filters, k=5, strategy="pre")
+    assert [hit["id"] for hit in hits] == exact_top_k(docs, vectors, query, filters, 5)
+    assert all(filters.matches(hit) for hit in hits)
+
+
+def test_post_filtering_keeps_only_matching_hits(index):
+    core, docs, vectors = index
+    query = vectors[1]
+    filters = VectorFilter(categories=["Sports"])
+    search = FilteredKnnSearch(core, vector_field="content_vector", fl="id,score")
+    pre, _ = search.search(query, filters, k=10, strategy="pre")
+    post, _ = search.search(query, filters, k=10, strategy="post")
+    # A broad filter: the over-fetched candidates hold the same top 10
+    assert [hit["id"] for hit in post] == [hit["id"] for hit in pre]
+    assert all(hit["category"] == "Sports" for hit in post)
+    assert search.stats()["searches"] == {"pre": 1, "post": 1}
+
+
+def test_selective_post_filter_refetches_then_underfills(index):
+    core, docs, vectors = index
+    # 34 of the 400 documents are Health, tagged data and from April
+    filters = VectorFilter(categories=["Health"], tags=["data"], since="2026-04-01", until="2026-04-30")
+    search = FilteredKnnSearch(core, vector_field="content_vector", fl="id,score", overfetch=2, max_overfetch=8)
+    pre, _ = search.search(vectors[2], filters, k=10, strategy="pre")
+    post, _ = search.search(vectors[2], filters, k=10, strategy="post")
+
+    assert sum(filters.matches(doc) for doc in docs) == 34
+    assert len(pre) == 10
+    assert {hit["id"] for hit in post} <= {hit["id"] for hit in pre}
+    assert len(post) < len(pre)
+    assert search.refetches == 2
+    assert search.underfilled == 1
+
+
+def test_repeated_clauses_hit_the_filter_cache(index):
+    core, _, vectors = index
+    search = FilteredKnnSearch(core, vector_field="content_vector")
+    for query in vectors[:5]:
+        search.search(query, VectorFilter(categories=["Science"], tags=["ai"]), k=3)
+    usage = search.filter_cache()
+    assert usage["lookups"] == 10
+    assert usage["hits"] == 8
+    assert search.stats()["distinct_clauses"] == 2
@@ -0,0 +1,35 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).resolve().parents[1] / "1-indexdocs" / "index-docs.py"
+
+
+def load_script():
+    spec = importlib.util.spec_from_file_location("index_docs", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_build_parser_has_no_conflicting_options():
+    parser = load_script().build_parser()
+    assert "--profiler" in parser.format_help()
+
+
+def test_vector_profile_and_profiler_are_separate():
+    args = load_script().build_parser().parse_args(["--profile", "fast", "--profiler", "sample"])
+    assert args.profile == "fast"
+    assert args.profiler == "sample"
+
+
+def test_defaults():
+    args = load_script().build_parser().parse_args([])
+    assert args.profile == "default"
+    assert args.profiler is None
+
+
+def test_unknown_profiler_is_rejected():
+    with pytest.raises(SystemExit):
+        load_script().build_parser().parse_args(["--profiler", "perf"])
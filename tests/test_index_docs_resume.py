@@ -0,0 +1,100 @@
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from solrir.indexdocs import IndexDocs
+from solrir.manifest import IndexManifest
+
+SCRIPT = Path(__file__).resolve().parents[1] / "1-indexdocs" / "index-docs.py"
+
+
+class FakeEmbedder:
+    """Deterministic 8-dim vectors; raises on the call numbered ``crash_on``, like a killed run."""
+    def __init__(self, crash_on: int = None):
+        self.crash_on = crash_on
+        self.calls = 0
+        self.embedded = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        if self.calls == self.crash_on:
+            raise RuntimeError("killed")
+        self.embedded += len(texts)
+        return np.stack([np.random.default_rng(len(text)).standard_normal(8) for text in texts]).astype(np.float32)
+
+    def close(self):
+        pass
+
+    def report(self) -> str:
+        return f"{self.embedded} embedded"
+
+
+@pytest.fixture
+def index_docs():
+    spec = importlib.util.spec_from_file_location("index_docs", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def source(count: int, changed=(), removed=()):
+    return [{"id": str(i), "doc_id": str(i), "title": f"title {i}", "author": "", "bib": "",
+             "text": f"text {i}" + (" revised" if i in changed else "")}
+            for i in range(count) if i not in removed]
+
+
+def run(index_docs, monkeypatch, creator, manifest_path, docs, embedder, full=False):
+    monkeypatch.setattr(index_docs, "iter_cranfield", lambda: iter([dict(doc) for doc in docs]))
+    manifest = IndexManifest(manifest_path)
+    if full:
+        manifest.invalidate()
+    try:
+        index_docs.stream_cranfield(creator, embedder, chunk_size=10, workers=2, manifest=manifest)
+    finally:
+        manifest.close()
+
+
+@pytest.fixture
+def creator(solr):
+    creator = IndexDocs(solr.url, "docs")
+    assert creator.define_schema(vector_dimension=8)
+    return creator
+
+
+def test_resume_after_a_crash_then_index_only_the_delta(index_docs, monkeypatch, tmp_path, solr, creator):
+    manifest_path = tmp_path / "docs.manifest.json"
+    with pytest.raises(RuntimeError):
+        run(index_docs, monkeypatch, creator, manifest_path, source(100), FakeEmbedder(crash_on=4))
+    # Batches already posted when the embedder died are acknowledged and journaled
+    acknowledged = len(IndexManifest(manifest_path))
+    assert acknowledged == solr.docs_added
+    assert 0 < acknowledged <= 30
+
+    # The rerun sends only what the killed run had not got acknowledged
+    embedder = FakeEmbedder()
+    run(index_docs, monkeypatch, creator, manifest_path, source(100), embedder)
+    assert embedder.embedded == 100 - acknowledged
+    assert solr.docs_added == 100
+    assert set(solr.core("docs").docs) == {str(i) for i in range(100)}
+
+    # A nightly refresh: one document changed, two left the source
+    embedder = FakeEmbedder()
+    run(index_docs, monkeypatch, creator, manifest_path, source(100, changed={5}, removed={7, 8}), embedder)
+    assert embedder.embedded == 1
+    assert solr.docs_added == 101
+    assert solr.core("docs").docs["5"]["text"] == "text 5 revised"
+    assert set(solr.core("docs").docs) == {str(i) for i in range(100)} - {"7", "8"}
+    assert len(IndexManifest(manifest_path)) == 98
+
+
+def test_full_run_resends_everything_and_still_deletes(index_docs, monkeypatch, tmp_path, solr, creator):
+    manifest_path = tmp_path / "docs.manifest.json"
+    run(index_docs, monkeypatch, creator, manifest_path, source(40), FakeEmbedder())
+
+    embedder = FakeEmbedder()
+    run(index_docs, monkeypatch, creator, manifest_path, source(40, removed={3}), embedder, full=True)
+    assert embedder.embedded == 39
+    assert "3" not in solr.core("docs").docs
+    assert len(solr.core("docs").docs) == 39
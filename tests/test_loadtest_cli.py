@@ -0,0 +1,38 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SCRIPT_DIR = Path(__file__).resolve().parents[1] / "0-smoketest"
+
+
+@pytest.fixture
+def loadtest(monkeypatch):
+    # loadtest.py imports the corpus generator from smoketest.py next to it
+    monkeypatch.syspath_prepend(str(SCRIPT_DIR))
+    spec = importlib.util.spec_from_file_location("loadtest", SCRIPT_DIR / "loadtest.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_parse_mix(loadtest):
+    assert loadtest.parse_mix("knn=0.7, facet=0.3,write=0") == {"knn": 0.7, "facet": 0.3, "write": 0.0}
+
+
+@pytest.mark.parametrize("mix", ["knn=0.5,facets=0.5", "knn", "knn=lots", "=1", "knn=-1"])
+def test_parse_mix_rejects(loadtest, mix):
+    with pytest.raises(ValueError):
+        loadtest.parse_mix(mix)
+
+
+def test_bad_mix_is_a_usage_error(loadtest, monkeypatch, capsys):
+    monkeypatch.setattr("sys.argv", ["loadtest.py", "--mix", "knn=0.5,facets=0.5"])
+    with pytest.raises(SystemExit) as exc:
+        loadtest.main()
+    assert exc.value.code == 2
+    assert "unknown operation 'facets'" in capsys.readouterr().err
+
+
+def test_mix_names_match_build_operations(loadtest):
+    assert tuple(op.name for op in loadtest.build_operations()) == loadtest.OPERATIONS
@@ -0,0 +1,52 @@
+from solrir.manifest import IndexManifest
+
+
+def docs(*ids, text="text"):
+    return [{"doc_id": doc_id, "text": f"{text} {doc_id}"} for doc_id in ids]
+
+
+def index(manifest, source):
+    sent = list(manifest.changed(source))
+    manifest.acknowledge([doc["doc_id"] for doc in sent])
+    return [doc["doc_id"] for doc in sent]
+
+
+def test_invalidate_resends_everything_and_still_finds_removals(tmp_path):
+    manifest = IndexManifest(tmp_path / "core.manifest.json")
+    index(manifest, docs("1", "2", "3"))
+    manifest.save()
+    manifest.close()
+
+    # A --full rerun after document 3 left the source
+    rerun = IndexManifest(tmp_path / "core.manifest.json")
+    rerun.invalidate()
+    assert index(rerun, docs("1", "2")) == ["1", "2"]
+    assert rerun.removed() == ["3"]
+
+
+def test_invalidate_survives_a_crash(tmp_path):
+    manifest = IndexManifest(tmp_path / "core.manifest.json")
+    index(manifest, docs("1", "2", "3"))
+    manifest.save()
+    manifest.invalidate()
+    index(manifest, docs("1"))
+    manifest.close()
+
+    # Killed before save(): the journal is replayed on top of the snapshot
+    reopened = IndexManifest(tmp_path / "core.manifest.json")
+    assert len(reopened) == 3
+    assert index(reopened, docs("1", "2")) == ["2"]
+    assert reopened.removed() == ["3"]
+
+
+def test_reset_forgets_the_core(tmp_path):
+    manifest = IndexManifest(tmp_path / "core.manifest.json")
+    index(manifest, docs("1", "2"))
+    manifest.mark_setup(schema={"dimension": 768})
+    manifest.reset()
+    manifest.close()
+
+    reopened = IndexManifest(tmp_path / "core.manifest.json")
+    assert reopened.setup == {}
+    assert index(reopened, docs("1")) == ["1"]
+    assert reopened.removed() == []
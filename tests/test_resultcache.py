@@ -0,0 +1,88 @@
+import requests
+
+from solrir.indexdocs import IndexDocs
+from solrir.resultcache import ResultCache, normalize_params
+
+
+def counting_select(index):
+    calls = []
+
+    def fetch(params):
+        calls.append(params)
+        return index.select(params)
+    return fetch, calls
+
+
+def num_found(response) -> int:
+    return response["response"]["numFound"]
+
+
+def test_cached_until_the_index_version_changes(solr):
+    index = IndexDocs(solr.url, "docs")
+    policy = index.commit_policy("hard")
+    index.index_documents([{"id": "1"}, {"id": "2"}], commit_policy=policy)
+    cache = ResultCache(index.index_version, version_interval=0)
+    fetch, calls = counting_select(index)
+    query = {"q": "*:*", "rows": 0}
+
+    assert num_found(cache.get_or_fetch(query, fetch)) == 2
+    assert num_found(cache.get_or_fetch({"rows": 0, "q": " *:* "}, fetch)) == 2
+    assert len(calls) == 1 and cache.hits == 1
+
+    # Uncommitted updates do not change the searcher's version, so the entry stays valid
+    index.index_documents([{"id": "3"}], commit_policy=index.commit_policy("within", commit_within_ms=60000))
+    assert num_found(cache.get_or_fetch(query, fetch)) == 2
+    assert len(calls) == 1
+
+    policy.commit()
+    assert num_found(cache.get_or_fetch(query, fetch)) == 3
+    assert len(calls) == 2
+    assert cache.invalidations == 1
+
+
+def test_version_is_checked_at_most_once_per_interval(solr):
+    index = IndexDocs(solr.url, "docs")
+    lookups = []
+
+    def version():
+        lookups.append(1)
+        return index.index_version()
+    cache = ResultCache(version, version_interval=60)
+    fetch, _ = counting_select(index)
+    for _ in range(5):
+        cache.get_or_fetch({"q": "*:*"}, fetch)
+    assert len(lookups) == 1
+
+
+def test_unknown_version_bypasses_the_cache(solr):
+    index = IndexDocs(solr.url, "missing")
+    cache = ResultCache(index.index_version, version_interval=0)
+    fetch, calls = counting_select(IndexDocs(solr.url, "docs"))
+    cache.get_or_fetch({"q": "*:*"}, fetch)
+    cache.get_or_fetch({"q": "*:*"}, fetch)
+    assert len(calls) == 2
+    assert cache.bypassed == 2 and len(cache) == 0
+
+
+def test_fq_order_and_repetition_do_not_change_the_key():
+    assert normalize_params({"q": "x", "fq": ["b", "a", "b"]}) == normalize_params({"fq": ["a", "b"], "q": "x"})
+    assert normalize_params({"q": "x", "fq": ["a"]}) != normalize_params({"q": "x"})
+
+
+def test_lru_eviction_by_entries(solr):
+    cache = ResultCache(lambda: 1, max_entries=2)
+    fetch, calls = counting_select(IndexDocs(solr.url, "docs"))
+    for q in ("a:1", "a:2", "a:1", "a:3", "a:2"):
+        cache.get_or_fetch({"q": q}, fetch)
+    # a:2 was the least recently used when a:3 arrived
+    assert [params["q"] for params in calls] == ["a:1", "a:2", "a:3", "a:2"]
+    assert cache.evictions == 2
+
+
+def test_requests_errors_from_the_version_lookup_bypass(solr):
+    def broken():
+        raise requests.exceptions.ConnectionError("down")
+    cache = ResultCache(broken, version_interval=0)
+    fetch, calls = counting_select(IndexDocs(solr.url, "docs"))
+    cache.get_or_fetch({"q": "*:*"}, fetch)
+    assert cache.bypassed == 1 and len(calls) == 1
@@ -0,0 +1,97 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from solrir.fakesolr import FakeSolr
+from solrir.indexdocs import IndexDocs
+from solrir.sharding import ShardedIndex, merge_responses, shard_for
+
+VECTOR_TYPE = {"name": "knn_vector_4", "class": "solr.DenseVectorField", "vectorDimension": 4,
+               "similarityFunction": "cosine"}
+FIELDS = [{"name": "vector", "type": "knn_vector_4"}, {"name": "tags", "type": "strings"}]
+
+
+def make_docs(count: int):
+    vectors = np.random.default_rng(0).standard_normal((count, 4)).astype(np.float32)
+    return [{"id": f"doc{i}", "vector": vector.tolist(), "tags": ["even" if i % 2 == 0 else "odd"]}
+            for i, vector in enumerate(vectors)]
+
+
+@pytest.fixture
+def cluster():
+    """Three shard cores and one core holding every document, for comparison."""
+    with FakeSolr(cores=["s0", "s1", "s2", "all"], auto_soft_commit_ms=None) as solr:
+        shards = ShardedIndex.from_urls(f"{solr.url}/s{i}" for i in range(3))
+        single = IndexDocs(solr.url, "all")
+        assert shards.add_schema([VECTOR_TYPE], FIELDS) and single.add_schema([VECTOR_TYPE], FIELDS)
+        docs = make_docs(120)
+        shards.index_documents(docs, batch_size=25, commit_policy=shards.commit_policy("hard"))
+        single.index_documents(docs, batch_size=25, commit_policy=single.commit_policy("hard"))
+        yield solr, shards, single
+        shards.close()
+
+
+def test_shard_for_is_crc32_of_the_id():
+    assert shard_for("doc7", 3) == zlib.crc32(b"doc7") % 3
+    assert shard_for(42, 5) == zlib.crc32(b"42") % 5
+
+
+def test_documents_are_routed_by_id_hash(cluster):
+    solr, shards, _ = cluster
+    for number in range(3):
+        held = solr.core(f"s{number}").docs
+        assert held
+        assert all(shard_for(doc_id, 3) == number for doc_id in held)
+    assert sum(len(solr.core(f"s{number}").docs) for number in range(3)) == 120
+
+
+def test_knn_over_shards_matches_one_core(cluster):
+    _, shards, single = cluster
+    query = {"q": "{!knn f=vector topK=10}[0.5,-0.1,0.3,0.9]", "rows": 10, "fl": "id,score"}
+    merged = shards.select(query)
+    expected = single.select(query)
+    assert [doc["id"] for doc in merged["response"]["docs"]] == [doc["id"] for doc in expected["response"]["docs"]]
+    assert merged["responseHeader"]["shards"] == 3
+
+
+def test_counts_and_facets_are_summed(cluster):
+    _, shards, single = cluster
+    query = {"q": "*:*", "rows": 0, "facet": "true", "facet.field": "tags"}
+    merged = shards.select(query)
+    expected = single.select(query)
+    assert merged["response"]["numFound"] == 120
+    assert merged["facet_counts"]["facet_fields"] == expected["facet_counts"]["facet_fields"]
+
+
+def test_deletes_go_to_the_owning_shard(cluster):
+    solr, shards, _ = cluster
+    assert shards.delete_documents(["doc1", "doc2"], commit_policy=shards.commit_policy("hard")) == 2
+    shards.commit_policy("hard").finish()
+    assert shards.select({"q": "*:*", "rows": 0})["response"]["numFound"] == 118
+
+
+def response(docs, num_found, qtime=0, facets=None):
+    result = {"responseHeader": {"QTime": qtime}, "response": {"numFound": num_found, "docs": docs}}
+    if facets is not None:
+        result["facet_counts"] = {"facet_fields": facets}
+    return result
+
+
+def test_merge_responses_by_score():
+    merged = merge_responses([
+        response([{"id": "a", "score": 0.9}, {"id": "b", "score": 0.5}], 10, qtime=3, facets={"tags": ["x", 2, "y", 1]}),
+        response([{"id": "c", "score": 0.7}, {"id": "d", "score": 0.1}], 5, qtime=8, facets={"tags": ["y", 4]}),
+    ], rows=3)
+    assert [doc["id"] for doc in merged["response"]["docs"]] == ["a", "c", "b"]
+    assert merged["response"]["numFound"] == 15
+    assert merged["responseHeader"]["QTime"] == 8
+    assert merged["facet_counts"]["facet_fields"] == {"tags": ["y", 5, "x", 2]}
+
+
+def test_merge_responses_interleaves_other_sorts():
+    merged = merge_responses([
+        response([{"id": "a"}, {"id": "b"}, {"id": "c"}], 3),
+        response([{"id": "d"}], 1),
+    ], rows=10, by_score=False)
+    assert [doc["id"] for doc in merged["response"]["docs"]] == ["a", "d", "b", "c"]
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from solrir.store import EmbeddingStore, content_hash
+
+
+def fill(store, doc_ids, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((len(doc_ids), store.dimension)).astype(np.float32)
+    store.append(doc_ids, [content_hash(doc_id) for doc_id in doc_ids], vectors)
+    return dict(zip(doc_ids, vectors))
+
+
+def assert_vectors(store, expected):
+    for doc_id, vector in expected.items():
+        np.testing.assert_array_equal(store.get(doc_id, content_hash(doc_id)), vector)
+
+
+def test_compact_drops_superseded_rows(tmp_path):
+    store = EmbeddingStore(tmp_path, "model", 4)
+    fill(store, ["a", "b", "c"])
+    expected = fill(store, ["a", "b", "c"], seed=1)
+    store.save()
+
+    assert store.compact() == 3
+    assert store.rows == 3
+    assert_vectors(store, expected)
+    assert [path.name for path in tmp_path.joinpath("model").glob("vectors*.f32")] == ["vectors.1.f32"]
+    assert_vectors(EmbeddingStore(tmp_path, "model", 4), expected)
+
+
+def test_crash_before_index_is_replaced_keeps_old_rows(tmp_path, monkeypatch):
+    store = EmbeddingStore(tmp_path, "model", 4)
+    fill(store, ["a", "b"])
+    expected = fill(store, ["b", "c"], seed=1)
+    expected["a"] = store.get("a", content_hash("a")).copy()
+    store.save()
+
+    def crash():
+        raise KeyboardInterrupt
+    monkeypatch.setattr(store, "save", crash)
+    with pytest.raises(KeyboardInterrupt):
+        store.compact()
+
+    reopened = EmbeddingStore(tmp_path, "model", 4)
+    assert reopened.generation == 0
+    assert_vectors(reopened, expected)
+    # The next compaction removes the orphaned generation and still succeeds
+    assert reopened.compact() == 1
+    assert_vectors(EmbeddingStore(tmp_path, "model", 4), expected)
+    assert [path.name for path in tmp_path.joinpath("model").glob("vectors*.f32")] == ["vectors.1.f32"]